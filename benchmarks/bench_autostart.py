@@ -0,0 +1,99 @@
+# Time to leader from cold start when nobody presses [Enter] (myleprocess.py --auto-elect)
+#
+# Every run is one task2/launcher.py run on a generated double ring, the clock starts when the first node process is
+# started. Modes:
+#   elect-all   the launcher sends elect to every node once all of them are ready: naive all-initiator Chang-Roberts
+#   immediate   --auto-elect 0: every node starts the election itself the moment it is ready
+#   random      --auto-elect W --auto-order random: every node starts after a uniform jitter in [0, W]
+#   ranked      --auto-elect W: larger uuids start earlier (plus a little jitter), a node that already forwarded a
+#               candidate doesn't start - usually only the largest node does
+# Reported per mode and number of nodes (median of --runs): seconds from cold start until every node knows the leader,
+# the same from the moment the last node was ready, messages sent by all nodes, and how many nodes started the
+# election on their own (--auto-elect modes).
+#
+# usage: python3 benchmarks/bench_autostart.py --nodes 8 20 50 --hosts 0 --runs 3 --json autostart.json
+#        (--hosts 1: all nodes in one process, takes the interpreter startups out of the cold start)
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from common import TASK2_DIR
+
+LAUNCHER = os.path.join(TASK2_DIR, "launcher.py")
+
+
+def mode_arguments(mode, window):
+    if mode == "elect-all":
+        return ["--initiators", "all"], []
+    if mode == "immediate":
+        return ["--initiators", "none"], ["--auto-elect", "0"]
+    return ["--initiators", "none"], ["--auto-elect", str(window), "--auto-order", mode]
+
+
+def run_once(nodes, mode, args, base_port):
+    launcher_args, node_args = mode_arguments(mode, args.window)
+    with tempfile.TemporaryDirectory() as workdir:
+        result_file = os.path.join(workdir, "result.json")
+        subprocess.run([sys.executable, LAUNCHER, "--nodes", str(nodes), "--hosts", str(args.hosts),
+                        "--engine", args.engine, "--base-port", str(base_port), "--timeout", str(args.timeout),
+                        "--workdir", workdir, "--json", result_file] + launcher_args
+                       + ["--", "--log-level", "none"] + node_args,
+                       stdout=subprocess.DEVNULL, check=False)
+        with open(result_file) as result:
+            return json.load(result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="time to leader from cold start, elect on every node vs --auto-elect")
+    parser.add_argument("--nodes", type=int, nargs="+", default=[8, 20, 50])
+    parser.add_argument("--mode", nargs="+", choices=["elect-all", "immediate", "random", "ranked"],
+                        default=["elect-all", "immediate", "random", "ranked"])
+    parser.add_argument("--window", type=float, default=0.5, help="--auto-elect window in seconds (random / ranked)")
+    parser.add_argument("--hosts", type=int, default=0, help="processes to spread the nodes over, 0 = one per node")
+    parser.add_argument("--engine", choices=["threads", "asyncio"], default="threads")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--base-port", type=int, default=13000)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--json", help="write all results to this file")
+    args = parser.parse_args()
+
+    results = []
+    port = args.base_port
+    print(f"double ring, {'one process per node' if args.hosts == 0 else f'{args.hosts} process(es)'}, {args.engine}, "
+          f"window {args.window} s")
+    print(f"{'nodes':>5s} {'mode':10s} {'ok':>5s} {'cold start s':>12s} {'after ready ms':>14s} {'messages':>8s} "
+          f"{'started':>7s}")
+    for nodes in args.nodes:
+        for mode in args.mode:
+            runs = []
+            for run in range(args.runs):
+                result = run_once(nodes, mode, args, port)
+                port += nodes + 1  # the previous run's connections may still be in TIME_WAIT
+                if result.get("agreed"):
+                    runs.append(result)
+                else:
+                    print(f"  {nodes} nodes {mode} run {run}: {result.get('error', 'no agreement')}")
+            if not runs:
+                continue
+            summary = {"nodes": nodes, "mode": mode, "window": args.window, "hosts": args.hosts, "engine": args.engine,
+                       "runs": len(runs), "of": args.runs,
+                       "cold_start_s": statistics.median(r["cold_start_seconds"] for r in runs),
+                       "after_ready_ms": statistics.median(r["election_seconds"] for r in runs) * 1000,
+                       "messages": statistics.median(r["messages"] for r in runs),
+                       "auto_started": statistics.median(r.get("auto_started", 0) for r in runs)}
+            results.append(summary)
+            print(f"{nodes:5d} {mode:10s} {len(runs):>2d}/{args.runs:<2d} {summary['cold_start_s']:12.2f} "
+                  f"{summary['after_ready_ms']:14.1f} {summary['messages']:8.0f} {summary['auto_started']:7.0f}")
+
+    if args.json:
+        with open(args.json, "w") as out:
+            json.dump(results, out, indent=2)
+
+
+if __name__ == "__main__":
+    main()
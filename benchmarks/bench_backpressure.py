@@ -0,0 +1,175 @@
+# A stalled neighbour next to a healthy one (myleprocess.py --send-queue / --queue-policy, task2/outbound.py)
+#
+# One real node (node 1 of a 3-node topology) forwards every candidate to two peers that are played by this script:
+#   stalled    accepts the connection, sends the greeting and never reads
+#   collector  reads everything and notes when each candidate arrives
+# A feeder connects to the node and sends --messages increasing candidates (all larger than the node's uuid, so every
+# one is forwarded to both peers). The peers listen on AF_UNIX sockets (--transport auto): a unix stream socket holds
+# only ~200 KB, so the stalled peer's connection is full after a few hundred frames.
+# Reported per configuration:
+#   delivered   candidates the collector got within --timeout (the node must not stop serving it)
+#   ms          time until the collector had all of them (or the timeout)
+#   max gap     longest pause between two candidates at the collector
+#   stalled     frames the stalled peer finds in its socket once it starts reading at the end
+#   coalesced / dropped   the node's myle_messages_coalesced_total / myle_messages_dropped_total{reason="queue_full"}
+#
+# usage: python3 benchmarks/bench_backpressure.py --messages 5000 --engine threads asyncio --json backpressure.json
+
+import argparse
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+from common import TASK2_SCRIPT, load_task2
+
+myle = load_task2()
+import transports  # noqa: E402 (task2 is on sys.path after load_task2)
+
+CONFIGURATIONS = {  # name -> node arguments
+    "sendall": ["--send-queue", "0"],
+    "block": ["--queue-policy", "block"],
+    "drop-oldest": ["--queue-policy", "drop-oldest"],
+    "coalesce": ["--queue-policy", "coalesce"],
+}
+NODE_UUID = uuid.UUID(int=1)  # smaller than every fed candidate
+
+
+# a peer of the node: listens on the unix socket the node connects to, greets it, then reads (or not)
+class FakePeer:
+    def __init__(self, directory, port, reading):
+        self.listener = transports.listen_unix(transports.socket_path(directory, "127.0.0.1", port))
+        self.reading = reading
+        self.conn = None
+        self.arrivals = []  # time.perf_counter() of every candidate
+        self.reader = myle.FrameReader()
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def run(self):
+        self.conn, _ = self.listener.accept()
+        self.conn.sendall(myle.handshake_greeting(uuid.uuid4(), []))
+        if self.reading:
+            self.read_all()
+
+    def read_all(self):
+        while True:
+            messages = self.reader.recv_from(self.conn)
+            if messages is None:
+                return
+            now = time.perf_counter()
+            self.arrivals += [now for message in messages if message.flag == 0]
+
+    # stalled peer: read what is in the socket now
+    def drain(self, seconds=1.0):
+        if self.conn is None:
+            return 0
+        self.conn.settimeout(seconds)
+        try:
+            self.read_all()
+        except OSError:
+            pass
+        return len(self.arrivals)
+
+
+def scrape(path):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(path)
+    sock.sendall(b"GET /metrics HTTP/1.0\r\nHost: node\r\n\r\n")
+    data = b""
+    while True:
+        chunk = sock.recv(65536)
+        if not chunk:
+            break
+        data += chunk
+    sock.close()
+    return data.decode()
+
+def metric(text, pattern):
+    return sum(float(value) for value in re.findall(pattern + r"\s+([0-9.e+]+)", text))
+
+
+def run_once(name, engine, messages, base_port, timeout):
+    with tempfile.TemporaryDirectory() as workdir:
+        topology = os.path.join(workdir, "topology.txt")
+        with open(topology, "w") as out:
+            out.write(f"1,127.0.0.1,{base_port + 1},2 3\n2,127.0.0.1,{base_port + 2},1\n3,127.0.0.1,{base_port + 3},1\n")
+        stalled = FakePeer(workdir, base_port + 2, reading=False)
+        collector = FakePeer(workdir, base_port + 3, reading=True)
+        metrics_path = os.path.join(workdir, "metrics.sock")
+        node = subprocess.Popen([sys.executable, TASK2_SCRIPT, "--topology", topology, "--id", "1", "--no-prompt",
+                                 "--engine", engine, "--socket-dir", workdir, "--uuid", str(NODE_UUID),
+                                 "--metrics-socket", metrics_path, "--log-level", "none", "--console", "none"]
+                                + CONFIGURATIONS[name],
+                                cwd=workdir, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT)
+        try:
+            deadline = time.monotonic() + 10
+            while True:
+                try:
+                    feeder = socket.create_connection(("127.0.0.1", base_port + 1))
+                    break
+                except OSError:
+                    if time.monotonic() > deadline:
+                        raise
+                    time.sleep(0.02)
+            feeder.makefile("rb").readline()  # greeting
+            feeder.sendall(myle.handshake_ack("binary", uuid.uuid4()))
+            while stalled.conn is None or collector.conn is None:
+                time.sleep(0.01)  # the node is connected to both peers
+            time.sleep(0.2)
+
+            frames = [myle.Message(uuid.UUID(int=2 + i), 0).encode("binary") for i in range(messages)]
+            # the node may stop reading (sendall), so the feeder must not block this thread
+            threading.Thread(target=feeder.sendall, args=(b"".join(frames),), daemon=True).start()
+            started = time.perf_counter()
+            end = time.monotonic() + timeout
+            while len(collector.arrivals) < messages and time.monotonic() < end:
+                time.sleep(0.01)
+            arrivals = list(collector.arrivals)
+            text = scrape(metrics_path)
+            result = {"configuration": name, "engine": engine, "messages": messages, "delivered": len(arrivals),
+                      "ms": ((arrivals[-1] if len(arrivals) == messages else time.perf_counter()) - started) * 1000,
+                      "max_gap_ms": max((b - a for a, b in zip([started] + arrivals, arrivals)), default=0) * 1000,
+                      "coalesced": metric(text, r"myle_messages_coalesced_total"),
+                      "dropped": metric(text, r'myle_messages_dropped_total\{reason="queue_full"\}')}
+            result["stalled"] = stalled.drain()
+            return result
+        finally:
+            node.kill()
+            node.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="a stalled peer next to a healthy one, per --queue-policy")
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--configuration", nargs="+", choices=list(CONFIGURATIONS), default=list(CONFIGURATIONS))
+    parser.add_argument("--engine", nargs="+", choices=["threads", "asyncio"], default=["threads", "asyncio"])
+    parser.add_argument("--timeout", type=float, default=5.0, help="seconds to wait for the collector")
+    parser.add_argument("--base-port", type=int, default=9700)
+    parser.add_argument("--json", help="write all results to this file")
+    args = parser.parse_args()
+
+    results = []
+    port = args.base_port
+    print(f"{'engine':8s} {'config':12s} {'delivered':>9s} {'ms':>8s} {'max gap ms':>10s} {'stalled':>7s} "
+          f"{'coalesced':>9s} {'dropped':>7s}")
+    for engine in args.engine:
+        for name in args.configuration:
+            result = run_once(name, engine, args.messages, port, args.timeout)
+            port += 4
+            results.append(result)
+            print(f"{engine:8s} {name:12s} {result['delivered']:9d} {result['ms']:8.0f} {result['max_gap_ms']:10.1f} "
+                  f"{result['stalled']:7d} {result['coalesced']:9.0f} {result['dropped']:7.0f}")
+
+    if args.json:
+        with open(args.json, "w") as out:
+            json.dump(results, out, indent=2)
+
+
+if __name__ == "__main__":
+    main()
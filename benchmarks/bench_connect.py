@@ -0,0 +1,106 @@
+# Startup time of a node with many outgoing peers (task2, fan-out k)
+#
+# One real node connects to k peers that are stand-ins run by this script:
+#   silent  peers accept the connection but never send the greeting (like nodes from before the handshake),
+#           every connection costs the full greeting timeout (HANDSHAKE_TIMEOUT)
+#   dead    nothing listens on the peer ports, the node gives up after --connect-timeout
+#   mixed   half silent, half dead
+# and reports the time from "The server is ready to receive" to the [Enter] prompt.
+# Connections are opened in parallel, so the time should stay flat as k grows
+# (one greeting timeout / one connect timeout), not grow with k.
+#
+# usage: python3 benchmarks/bench_connect.py --peers 1 2 4 8 16 --mode silent dead mixed [--engine asyncio]
+
+import argparse
+import json
+import os
+import socket
+import tempfile
+import threading
+
+from common import TASK2_SCRIPT, PROMPT_MARKER, NodeProcess, load_task2, stop_all
+
+
+# accepts connections and keeps them open without ever sending anything
+class SilentPeer:
+    def __init__(self, port):
+        self.server = socket.create_server(("127.0.0.1", port))
+        self.connections = []
+        threading.Thread(target=self.accept, daemon=True).start()
+
+    def accept(self):
+        while True:
+            try:
+                connection, _ = self.server.accept()
+            except OSError:
+                return
+            self.connections.append(connection)
+
+    def close(self):
+        self.server.close()
+        for connection in self.connections:
+            connection.close()
+
+
+# topology file: node 1 connects to nodes 2 .. k+1, which link back to node 1 (only to make the file valid)
+def write_topology(path, base_port, peers):
+    with open(path, "w") as topology:
+        topology.write(f"1,127.0.0.1,{base_port + 1},{' '.join(str(n) for n in range(2, peers + 2))}\n")
+        for number in range(2, peers + 2):
+            topology.write(f"{number},127.0.0.1,{base_port + number},1\n")
+
+
+def run_once(peers, mode, base_port, args):
+    stand_ins = []
+    node = None
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, "topology.txt")
+        write_topology(path, base_port, peers)
+        try:
+            for index, number in enumerate(range(2, peers + 2)):
+                if mode == "silent" or (mode == "mixed" and index % 2 == 0):
+                    stand_ins.append(SilentPeer(base_port + number))
+            node = NodeProcess([TASK2_SCRIPT, "--topology", path, "--id", "1", "--engine", args.engine,
+                                "--connect-timeout", str(args.connect_timeout)], cwd=workdir, name="node1")
+            listening = node.wait_for(["The server is ready to receive"], args.timeout)
+            ready = node.wait_for([PROMPT_MARKER], args.timeout)
+            connected = node.ready_peers()
+        finally:
+            if node:
+                stop_all([node])
+            for stand_in in stand_ins:
+                stand_in.close()
+    return {"peers": peers, "mode": mode, "engine": args.engine, "connected": connected,
+            "startup_s": ready - listening}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="startup time of a node with k outgoing peers")
+    parser.add_argument("--peers", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--mode", nargs="+", choices=["silent", "dead", "mixed"], default=["silent", "dead", "mixed"])
+    parser.add_argument("--engine", choices=["threads", "asyncio"], default="threads")
+    parser.add_argument("--connect-timeout", type=float, default=1.0, help="passed to the node")
+    parser.add_argument("--base-port", type=int, default=8000)
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--json", help="write raw results to this file")
+    args = parser.parse_args()
+
+    handshake = load_task2().HANDSHAKE_TIMEOUT
+    print(f"greeting timeout {handshake}s, connect timeout {args.connect_timeout}s "
+          f"(one at a time would take k x that)")
+    port = args.base_port
+    results = []
+    for mode in args.mode:
+        for peers in args.peers:
+            result = run_once(peers, mode, port, args)
+            port += peers + 2  # fresh ports every run
+            results.append(result)
+            print(f"{mode:6s} k={peers:3d} connected={result['connected']:3d} startup={result['startup_s']:.2f} s")
+
+    if args.json:
+        with open(args.json, "w") as out:
+            json.dump(results, out, indent=2)
+
+
+if __name__ == "__main__":
+    main()
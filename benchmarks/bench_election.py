@@ -0,0 +1,177 @@
+# Election latency and message complexity benchmark for task1 and task2 (real processes, localhost sockets)
+#
+# For every combination of task / ring size / uuid order / initiators it
+#   - starts N node processes with scratch config files and fixed uuids (--uuid)
+#   - waits until every node is connected, then starts the election ([Enter] on stdin)
+#   - records time-to-leader on every node, total messages sent and bytes sent
+#   - and the announcement latency: from the leader declaring itself until the last node knows it
+#     (one hop per node on the ring, one datagram with --announce)
+#
+# uuid orders (in the direction messages travel):
+#   best    ascending  - every candidate is swallowed by the next node
+#   worst   descending - the Chang-Roberts O(n^2) case when every node initiates
+#   random
+#
+# usage: python3 benchmarks/bench_election.py --task task1 task2 --nodes 5 10 --order best worst random \
+#            --initiators one all --json election.json --csv election.csv
+
+import argparse
+import csv
+import json
+import random
+import secrets
+import statistics
+import tempfile
+import time
+import uuid
+
+from common import (TASK1_SCRIPT, TASK2_SCRIPT, LEADER_MARKERS, PROMPT_MARKER,
+                    NodeProcess, load_task1, load_task2, write_task1_ring_configs, write_task2_ring_configs,
+                    stop_all)
+
+
+# uuids for the nodes in ring order
+def ordered_uuids(count, order, rng):
+    ids = sorted(uuid.UUID(int=rng.getrandbits(128), version=4) for _ in range(count))
+    if order == "worst":
+        ids.reverse()
+    elif order == "random":
+        rng.shuffle(ids)
+    return ids
+
+
+# bytes of one election message on the wire (all messages of a format / algorithm have the same size)
+def frame_size(task, wire, algorithm):
+    if task == "task1":
+        return len(load_task1().Message(uuid.uuid4(), 0).msg_to_json().encode())
+    myle = load_task2()
+    if algorithm == "hs":
+        return len(myle.Message(uuid.uuid4(), 0, myle.HS_PROBE, 0, 1).encode(wire))
+    return len(myle.Message(uuid.uuid4(), 0).encode(wire))
+
+
+def start_task1(workdir, base_port, ids, timeout):
+    node_dirs = write_task1_ring_configs(workdir, base_port, len(ids))
+    nodes = [NodeProcess([TASK1_SCRIPT, str(i + 1), "--uuid", str(node_uuid)], cwd=node_dir, name=f"node{i + 1}")
+             for i, (node_dir, node_uuid) in enumerate(zip(node_dirs, ids))]
+    for node in nodes:
+        node.wait_for(["Connected to"], timeout)
+    return nodes
+
+
+def start_task2(workdir, base_port, ids, timeout, extra_args):
+    types = write_task2_ring_configs(workdir, base_port, len(ids))
+    nodes = [NodeProcess([TASK2_SCRIPT, types[i + 1], str(i + 1), "--uuid", str(node_uuid)] + extra_args,
+                         cwd=workdir, name=f"node{i + 1}")
+             for i, node_uuid in enumerate(ids)]
+    for node in nodes:
+        node.wait_for([PROMPT_MARKER], timeout)
+    return nodes
+
+
+def run_once(task, count, order, initiators, base_port, rng, args):
+    ids = ordered_uuids(count, order, rng)
+    with tempfile.TemporaryDirectory() as workdir:
+        nodes = []
+        try:
+            if task == "task1":
+                nodes = start_task1(workdir, base_port, ids, args.timeout)
+            else:
+                nodes = start_task2(workdir, base_port, ids, args.timeout,
+                                    ["--wire", args.wire, "--algorithm", args.algorithm, "--engine", args.engine]
+                                    + ["--log-writer", args.log_writer]
+                                    + (["--no-suppression"] if args.no_suppression else [])
+                                    + (["--announce", args.announce, "--announce-key", secrets.token_hex(8)]
+                                       if args.announce else []))
+
+            starters = nodes if initiators == "all" else nodes[:1]
+            triggered = time.time()
+            for node in nodes:
+                if node in starters:
+                    node.send("\n")
+                elif task == "task2":
+                    node.send("no\n")
+
+            done = [node.wait_for(LEADER_MARKERS, args.timeout, since=triggered) for node in nodes]
+            declared = min((ts for ts in (node.first_match(LEADER_MARKERS[:1], since=triggered) for node in nodes)
+                            if ts is not None), default=min(done))
+            time.sleep(args.settle)  # messages still in flight after the last node learned the leader
+            sent = sum(node.count("Sent:") for node in nodes)
+            ignored = sum(node.count("Ignored:") for node in nodes)
+        finally:
+            stop_all(nodes)
+
+    latencies = [(ts - triggered) * 1000 for ts in done]
+    return {
+        "task": task,
+        "nodes": count,
+        "order": order,
+        "initiators": initiators,
+        "wire": "json" if task == "task1" else args.wire,
+        "algorithm": "cr" if task == "task1" else args.algorithm,
+        "suppression": task == "task2" and not args.no_suppression,
+        "announce": "udp" if task == "task2" and args.announce else "ring",
+        "messages": sent,
+        "ignored": ignored,
+        "bytes": sent * frame_size(task, args.wire, args.algorithm),
+        "messages_per_node": sent / count,
+        "time_to_leader_ms": latencies,
+        "time_to_leader_max_ms": max(latencies),
+        "time_to_leader_median_ms": statistics.median(latencies),
+        "announce_ms": (max(done) - declared) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="election latency / message complexity benchmark")
+    parser.add_argument("--task", nargs="+", choices=["task1", "task2"], default=["task1", "task2"])
+    parser.add_argument("--nodes", nargs="+", type=int, default=[5])
+    parser.add_argument("--order", nargs="+", choices=["best", "worst", "random"], default=["best", "worst", "random"])
+    parser.add_argument("--initiators", nargs="+", choices=["one", "all"], default=["one", "all"])
+    parser.add_argument("--runs", type=int, default=1)
+    parser.add_argument("--wire", choices=["binary", "json"], default="binary", help="task2 wire format")
+    parser.add_argument("--algorithm", choices=["cr", "hs"], default="cr", help="task2 election algorithm")
+    parser.add_argument("--engine", choices=["threads", "asyncio"], default="threads", help="task2 engine")
+    parser.add_argument("--log-writer", choices=["queue", "sync"], default="queue", help="task2 log writer")
+    parser.add_argument("--no-suppression", action="store_true", help="task2: forward every candidate (cr)")
+    parser.add_argument("--announce", metavar="ADDR:PORT",
+                        help="task2 cr: announce the leader with a UDP datagram to this group (e.g. 239.255.77.77:5099)")
+    parser.add_argument("--base-port", type=int, default=7000)
+    parser.add_argument("--timeout", type=float, default=180)
+    parser.add_argument("--settle", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="write all results to this file")
+    parser.add_argument("--csv", help="write one row per run to this file")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    port = args.base_port
+    results = []
+    for task in args.task:
+        for count in args.nodes:
+            for order in args.order:
+                for initiators in args.initiators:
+                    for run in range(args.runs):
+                        result = run_once(task, count, order, initiators, port, rng, args)
+                        port += count + 1  # fresh ports every run (no SO_REUSEADDR on the node servers)
+                        results.append(result)
+                        print(f"{task} {result['algorithm']} n={count} order={order:6s} initiators={initiators:3s} "
+                              f"messages={result['messages']:5d} ({result['messages_per_node']:.1f}/node, "
+                              f"n^2/2={count * count // 2}) bytes={result['bytes']} "
+                              f"time-to-leader max={result['time_to_leader_max_ms']:.1f} ms "
+                              f"median={result['time_to_leader_median_ms']:.1f} ms "
+                              f"announce ({result['announce']})={result['announce_ms']:.1f} ms")
+
+    if args.json:
+        with open(args.json, "w") as out:
+            json.dump(results, out, indent=2)
+    if args.csv:
+        fields = [key for key in results[0] if key != "time_to_leader_ms"]
+        with open(args.csv, "w", newline="") as out:
+            writer = csv.DictWriter(out, fieldnames=fields, extrasaction="ignore")
+            writer.writeheader()
+            writer.writerows(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# Compare the threaded and asyncio engines of task2/myleprocess.py
+# Starts the 5-node example topology on localhost for each engine and reports
+#   - threads per process (after connections are up, and after the election)
+#   - resident memory per process
+#   - startup time: first process started -> every node shows its [Enter] prompt (all peers connected)
+#   - election latency: [Enter] on node 1 -> last node knows the leader
+#
+# usage: python3 benchmarks/bench_engines.py [--runs 3] [--base-port 6000] [--json results.json]
+
+import argparse
+import json
+import statistics
+import tempfile
+import time
+
+from common import (TASK2_SCRIPT, TASK2_EXAMPLE_TOPOLOGY, LEADER_MARKERS, PROMPT_MARKER,
+                    NodeProcess, process_stats, write_task2_configs, stop_all)
+
+
+def run_once(engine, base_port, timeout):
+    with tempfile.TemporaryDirectory() as workdir:
+        write_task2_configs(workdir, base_port)
+        nodes = {}
+        try:
+            started = time.time()
+            for number, (node_type, _) in TASK2_EXAMPLE_TOPOLOGY.items():
+                nodes[number] = NodeProcess([TASK2_SCRIPT, "--engine", engine, node_type, str(number)],
+                                            cwd=workdir, name=f"node{number}")
+            prompts = [node.wait_for([PROMPT_MARKER], timeout) for node in nodes.values()]
+
+            ready = [process_stats(node.proc.pid) for node in nodes.values()]
+
+            # node 1 initiates, everybody else skips
+            for number, node in nodes.items():
+                if number != 1:
+                    node.send("no\n")
+            triggered = time.time()
+            nodes[1].send("\n")
+
+            done = [node.wait_for(LEADER_MARKERS, timeout, since=triggered) for node in nodes.values()]
+            time.sleep(0.2)  # let stray messages settle before sampling again
+            after = [process_stats(node.proc.pid) for node in nodes.values()]
+        finally:
+            stop_all(nodes.values())
+
+    return {
+        "engine": engine,
+        "startup_s": max(prompts) - started,
+        "threads_ready": sum(s["threads"] or 0 for s in ready),
+        "threads_after": sum(s["threads"] or 0 for s in after),
+        "rss_kb_ready": sum(s["rss_kb"] or 0 for s in ready),
+        "rss_kb_after": sum(s["rss_kb"] or 0 for s in after),
+        "election_latency_ms": (max(done) - triggered) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="threaded vs asyncio engine benchmark (task2, 5 nodes)")
+    parser.add_argument("--runs", type=int, default=1)
+    parser.add_argument("--base-port", type=int, default=6000)
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--json", help="write raw results to this file")
+    args = parser.parse_args()
+
+    results = []
+    for run in range(args.runs):
+        for i, engine in enumerate(["threads", "asyncio"]):
+            # fresh ports per run so TIME_WAIT sockets from the previous run don't get in the way
+            port = args.base_port + (run * 2 + i) * 10
+            result = run_once(engine, port, args.timeout)
+            print(f"run {run + 1} {engine:8s} threads={result['threads_ready']}/{result['threads_after']} "
+                  f"rss={result['rss_kb_ready']}/{result['rss_kb_after']} kB "
+                  f"latency={result['election_latency_ms']:.1f} ms startup={result['startup_s']:.2f} s")
+            results.append(result)
+
+    print("\nengine    threads(ready/after)  rss kB(ready/after)  latency ms (median)  startup s (median)")
+    for engine in ["threads", "asyncio"]:
+        rows = [r for r in results if r["engine"] == engine]
+        print(f"{engine:8s}  {statistics.median(r['threads_ready'] for r in rows):>6.0f}/"
+              f"{statistics.median(r['threads_after'] for r in rows):<6.0f}        "
+              f"{statistics.median(r['rss_kb_ready'] for r in rows):>8.0f}/"
+              f"{statistics.median(r['rss_kb_after'] for r in rows):<8.0f}  "
+              f"{statistics.median(r['election_latency_ms'] for r in rows):>8.1f}             "
+              f"{statistics.median(r['startup_s'] for r in rows):>6.2f}")
+
+    if args.json:
+        with open(args.json, "w") as out:
+            json.dump(results, out, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+# Leader failover time for task2 with heartbeats (--heartbeat-interval)
+#
+# For every run:
+#   - starts an N-node double ring with fixed uuids, the largest one on the node given by --leader-at
+#   - elects a leader ([Enter] on node 1), waits until every node knows it
+#   - kills the leader process and measures the time until every remaining node knows the new leader
+#     (suspicion timeout + re-connecting around the dead node + the new election)
+#
+# --leader-at picks the node type that dies: 1 = x, N = y, anything else an n node
+# --check exits with status 1 if any run did not finish, for repeating the failover many times.
+#
+# usage: python3 benchmarks/bench_failover.py --nodes 5 10 --leader-at 1 2 5 --heartbeat-interval 0.1 --runs 3
+#        python3 benchmarks/bench_failover.py --nodes 5 --engine asyncio --runs 30 --check
+
+import argparse
+import json
+import random
+import secrets
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+
+from common import (TASK2_SCRIPT, LEADER_MARKERS, PROMPT_MARKER, NodeProcess, write_task2_ring_configs, stop_all)
+
+
+# uuids for nodes 1..count, the largest one on node leader_at
+def failover_uuids(count, leader_at, rng):
+    ids = sorted(uuid.UUID(int=rng.getrandbits(128), version=4) for _ in range(count))
+    largest, rest = ids[-1], ids[:-1]
+    rng.shuffle(rest)
+    rest.insert(leader_at - 1, largest)
+    return rest
+
+
+def run_once(count, leader_at, base_port, rng, args):
+    ids = failover_uuids(count, leader_at, rng)
+    new_leader = max(node_uuid for number, node_uuid in enumerate(ids, 1) if number != leader_at)
+    key = secrets.token_hex(8)
+    with tempfile.TemporaryDirectory() as workdir:
+        types = write_task2_ring_configs(workdir, base_port, count)
+        nodes = []
+        try:
+            for number, node_uuid in enumerate(ids, 1):
+                nodes.append(NodeProcess([TASK2_SCRIPT, types[number], str(number), "--uuid", str(node_uuid),
+                                          "--engine", args.engine, "--heartbeat-interval", str(args.heartbeat_interval)]
+                                         + (["--suspicion-timeout", str(args.suspicion_timeout)] if args.suspicion_timeout else [])
+                                         + (["--announce", args.announce, "--announce-key", key] if args.announce else [])
+                                         + ["--transport", args.transport],
+                                         cwd=workdir, name=f"node{number}"))
+            for node in nodes:
+                node.wait_for([PROMPT_MARKER], args.timeout)
+            triggered = time.time()
+            nodes[0].send("\n")
+            for node in nodes[1:]:
+                node.send("no\n")
+            for node in nodes:
+                node.wait_for(LEADER_MARKERS, args.timeout, since=triggered)
+            time.sleep(args.steady)  # a few heartbeats go around
+
+            leader = nodes[leader_at - 1]
+            killed = time.time()
+            leader.stop()
+            survivors = [node for node in nodes if node is not leader]
+            markers = [f"Leader is decided to {new_leader}", f"uuid={new_leader}, flag=1"]
+            known = [node.wait_for(markers, args.timeout, since=killed) for node in survivors]
+            sent = sum(node.count("Sent:") for node in survivors)
+        except TimeoutError as error:
+            return {"nodes": count, "leader_at": leader_at, "leader_type": types[leader_at], "error": str(error)}
+        finally:
+            stop_all(nodes)
+
+    return {
+        "nodes": count,
+        "leader_at": leader_at,
+        "leader_type": types[leader_at],
+        "engine": args.engine,
+        "heartbeat_interval": args.heartbeat_interval,
+        "announce": "udp" if args.announce else "ring",
+        "transport": args.transport,
+        "failover_ms": (max(known) - killed) * 1000,
+        "failover_first_ms": (min(known) - killed) * 1000,
+        "messages": sent,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="leader failover time with heartbeats (task2)")
+    parser.add_argument("--nodes", type=int, nargs="+", default=[5])
+    parser.add_argument("--leader-at", type=int, nargs="+", help="node numbers that hold the largest uuid (default 1, 2, N)")
+    parser.add_argument("--heartbeat-interval", type=float, default=0.1)
+    parser.add_argument("--suspicion-timeout", type=float, help="default: 3 heartbeat intervals")
+    parser.add_argument("--engine", choices=["threads", "asyncio"], default="threads")
+    parser.add_argument("--runs", type=int, default=1)
+    parser.add_argument("--announce", metavar="ADDR:PORT", help="announce the leaders with UDP datagrams (e.g. 239.255.77.77:5099)")
+    parser.add_argument("--transport", choices=["auto", "shm", "tcp"], default="auto", help="--transport of the nodes")
+    parser.add_argument("--steady", type=float, default=0.5, help="seconds of heartbeats before the leader is killed")
+    parser.add_argument("--base-port", type=int, default=9000)
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="write all results to this file")
+    parser.add_argument("--check", action="store_true", help="exit with status 1 if any run did not finish")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    port = args.base_port
+    results = []
+    failed = 0
+    for count in args.nodes:
+        for leader_at in args.leader_at or [1, 2, count]:
+            rows = []
+            for run in range(args.runs):
+                result = run_once(count, leader_at, port, rng, args)
+                port += count + 1  # fresh ports every run
+                if "error" in result:
+                    failed += 1
+                    print(f"  n={count} leader=node{leader_at}: {result['error']}")
+                    continue
+                rows.append(result)
+                results.append(result)
+            if not rows:
+                continue
+            print(f"n={count} leader=node{leader_at} ({rows[0]['leader_type']}) "
+                  f"failover median={statistics.median(r['failover_ms'] for r in rows):.0f} ms "
+                  f"max={max(r['failover_ms'] for r in rows):.0f} ms "
+                  f"(first node {statistics.median(r['failover_first_ms'] for r in rows):.0f} ms, "
+                  f"{statistics.median(r['messages'] for r in rows):.0f} messages)")
+
+    if args.json:
+        with open(args.json, "w") as out:
+            json.dump(results, out, indent=2)
+    if args.check and failed:
+        print(f"{failed} run(s) did not finish")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+# Elections per second with many election groups on one ring (myleprocess.py --groups)
+#
+# Every run starts a generated double ring of --nodes nodes (the task2/launcher.py helpers) with --groups G, so each
+# node takes part in G Chang-Roberts elections over the same connections (one leader per group / shard), starts the
+# election on the --initiators and waits until every node knows the leader of every group.
+#   batched     the cr messages a node sends while handling one received batch share one batch frame per link
+#   unbatched   --no-batch: one frame per group message, for comparison. A node sends up to G frames per link in one
+#               go then, more than the default --send-queue holds (the queue would drop them), so it gets a queue
+#               of 4 G frames
+# Reported per number of groups (median of --runs): ms until every node knows all G leaders, elections completed per
+# second (G / that time), messages sent (and per election), and how many groups the busiest node leads.
+# Every run checks that all nodes agree on every group's leader (status groups_digest).
+#
+# usage: python3 benchmarks/bench_groups.py --nodes 8 --groups 1 10 100 1000 10000 --json groups.json
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import load_task2
+
+myle = load_task2()
+from launcher import SCRIPT, ControlClient, stop_nodes, wait_for, write_double_ring  # noqa: E402
+
+MODES = {"batched": [], "unbatched": ["--no-batch"]}
+
+
+def run_once(groups, mode, args, base_port):
+    with tempfile.TemporaryDirectory() as workdir:
+        topology_file = os.path.join(workdir, "topology.txt")
+        write_double_ring(topology_file, args.nodes, base_port)
+        node_args = ["--log-level", "none", "--engine", args.engine, "--transport", args.transport,
+                     "--groups", str(groups)] + MODES[mode]
+        if mode == "unbatched":
+            node_args += ["--send-queue", str(max(myle.SEND_QUEUE, 4 * groups))]
+        processes, clients = {}, {}
+        result = {"nodes": args.nodes, "groups": groups, "mode": mode, "engine": args.engine}
+        try:
+            for node in range(1, args.nodes + 1):
+                control_path = os.path.join(workdir, f"node_{node}.sock")
+                with open(os.path.join(workdir, f"node_{node}.out"), "w") as out:
+                    processes[node] = subprocess.Popen(
+                        [sys.executable, SCRIPT, "--topology", topology_file, "--id", str(node), "--no-prompt",
+                         "--control-socket", control_path, "--console", "none"] + node_args,
+                        cwd=workdir, stdin=subprocess.DEVNULL, stdout=out, stderr=subprocess.STDOUT)
+                clients[node] = ControlClient(control_path)
+            wait_for(processes, clients, lambda status: status["ready"], time.monotonic() + args.timeout, "ready")
+
+            started = time.monotonic()
+            for node in (clients if args.initiators == "all" else [1]):
+                clients[node].command("elect")
+            statuses = wait_for(processes, clients, lambda status: status["groups_elected"] >= groups,
+                                started + args.timeout, "every group's leader")
+            result["election_seconds"] = time.monotonic() - started
+            # digest of all group leaders (groups > 1), group 0's leader otherwise
+            result["agreed"] = len({status.get("groups_digest", status["leader"]) for status in statuses.values()}) == 1
+            result["messages"] = sum(status["sent"] for status in statuses.values())
+            result["max_led"] = max(status.get("groups_led", 1 if status["leader"] == status["uuid"] else 0)
+                                    for status in statuses.values())
+        except RuntimeError as error:
+            result["error"] = str(error)
+        finally:
+            stop_nodes(processes, clients, grace=5.0)
+        return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="elections per second as the number of --groups grows")
+    parser.add_argument("--nodes", type=int, default=8)
+    parser.add_argument("--groups", type=int, nargs="+", default=[1, 10, 100, 1000, 10000])
+    parser.add_argument("--mode", nargs="+", choices=list(MODES), default=list(MODES))
+    parser.add_argument("--initiators", choices=["1", "all"], default="1",
+                        help="node 1 starts every group's election, or every node does")
+    parser.add_argument("--engine", choices=["threads", "asyncio"], default="threads")
+    parser.add_argument("--transport", choices=["auto", "shm", "tcp"], default="auto")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--base-port", type=int, default=10400)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--json", help="write all results to this file")
+    args = parser.parse_args()
+
+    results = []
+    port = args.base_port
+    print(f"{args.nodes} node double ring, initiators {args.initiators}, {args.engine}, {args.transport}")
+    print(f"{'mode':9s} {'groups':>6s} {'ok':>5s} {'ms':>9s} {'elections/s':>11s} {'messages':>9s} "
+          f"{'msgs/elect':>10s} {'max led':>7s}")
+    for mode in args.mode:
+        for groups in args.groups:
+            runs = []
+            for _ in range(args.runs):
+                result = run_once(groups, mode, args, port)
+                port += args.nodes + 1  # the previous run's ports may still be in TIME_WAIT
+                if result.get("agreed"):
+                    runs.append(result)
+                else:
+                    print(f"  {mode} {groups}: {result.get('error', 'nodes disagree on a leader')}")
+            if not runs:
+                continue
+            seconds = statistics.median(r["election_seconds"] for r in runs)
+            summary = {"mode": mode, "groups": groups, "nodes": args.nodes, "initiators": args.initiators,
+                       "engine": args.engine, "transport": args.transport, "runs": len(runs), "of": args.runs,
+                       "election_ms": seconds * 1000, "elections_per_second": groups / seconds,
+                       "messages": statistics.median(r["messages"] for r in runs),
+                       "max_led": max(r["max_led"] for r in runs)}
+            results.append(summary)
+            print(f"{mode:9s} {groups:6d} {len(runs):>2d}/{args.runs:<2d} {summary['election_ms']:9.1f} "
+                  f"{summary['elections_per_second']:11.0f} {summary['messages']:9.0f} "
+                  f"{summary['messages'] / groups:10.1f} {summary['max_led']:7d}")
+
+    if args.json:
+        with open(args.json, "w") as out:
+            json.dump(results, out, indent=2)
+
+
+if __name__ == "__main__":
+    main()
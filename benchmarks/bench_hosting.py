@@ -0,0 +1,93 @@
+# One process per node vs many nodes in one process (myleprocess.py --ids, in-memory links between co-hosted nodes)
+#
+# Every configuration is one task2/launcher.py run on a generated double ring: start, wait until every node is ready,
+# one election, stop. Reported per run:
+#   startup        seconds until every node is ready
+#   rss/node       resident memory of all node processes after the election, divided by the number of nodes
+#   election       seconds from the elect command until every node knows the leader
+#   msgs/s         messages sent by all nodes during the election / election time
+# --initiators all --no-suppression (the defaults here) makes the election O(n^2) messages, so msgs/s measures how
+# fast the nodes pass messages on rather than the launcher's status polling.
+#
+# usage: python3 benchmarks/bench_hosting.py --nodes 20 50 --hosts 0 1 4 --runs 3 --json hosting.json
+#        (--hosts 0 = one process per node)
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from common import TASK2_DIR
+
+LAUNCHER = os.path.join(TASK2_DIR, "launcher.py")
+
+
+def run_once(nodes, hosts, engine, base_port, node_args, timeout):
+    with tempfile.TemporaryDirectory() as workdir:
+        result_file = os.path.join(workdir, "result.json")
+        subprocess.run([sys.executable, LAUNCHER, "--nodes", str(nodes), "--hosts", str(hosts), "--engine", engine,
+                        "--base-port", str(base_port), "--initiators", "all", "--timeout", str(timeout),
+                        "--workdir", workdir, "--json", result_file, "--", "--log-level", "none"] + node_args,
+                       stdout=subprocess.DEVNULL, check=False)
+        with open(result_file) as result:
+            return json.load(result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="memory and message rate, one process per node vs co-hosted nodes")
+    parser.add_argument("--nodes", type=int, nargs="+", default=[20, 50])
+    parser.add_argument("--hosts", type=int, nargs="+", default=[0, 1],
+                        help="processes to spread the nodes over, 0 = one process per node")
+    parser.add_argument("--engine", choices=["threads", "asyncio"], default="threads",
+                        help="engine of the one-process-per-node runs (co-hosted nodes always use asyncio)")
+    parser.add_argument("--suppression", action="store_true", help="keep candidate suppression on (fewer messages)")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--base-port", type=int, default=9000)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--json", help="write all results to this file")
+    args = parser.parse_args()
+    node_args = [] if args.suppression else ["--no-suppression"]
+
+    results = []
+    print(f"{'nodes':>5s} {'procs':>5s} {'startup s':>9s} {'rss/node MB':>11s} {'rss MB':>8s} "
+          f"{'election ms':>11s} {'messages':>8s} {'msgs/s':>8s}")
+    for nodes in args.nodes:
+        for hosts in args.hosts:
+            runs = []
+            for run in range(args.runs):
+                # a fresh port range per run, the previous run's connections may still be in TIME_WAIT
+                base_port = args.base_port + (len(results) * args.runs + run) * (max(args.nodes) + 1)
+                result = run_once(nodes, hosts, args.engine, base_port, node_args, args.timeout)
+                if not result.get("agreed"):
+                    print(f"  {nodes} nodes / {hosts} hosts run {run}: {result.get('error', 'no agreement')}")
+                    continue
+                runs.append(result)
+            if not runs:
+                continue
+            summary = {
+                "nodes": nodes,
+                "processes": runs[0]["processes"],
+                "engine": runs[0]["engine"],
+                "runs": len(runs),
+                "startup_s": statistics.median(r["startup_seconds"] for r in runs),
+                "rss_mb": statistics.median(r["rss_mb"] for r in runs),
+                "election_ms": statistics.median(r["election_seconds"] for r in runs) * 1000,
+                "messages": statistics.median(r["messages"] for r in runs),
+                "messages_per_second": statistics.median(r["messages_per_second"] for r in runs),
+            }
+            summary["rss_per_node_mb"] = summary["rss_mb"] / nodes
+            results.append(summary)
+            print(f"{nodes:5d} {summary['processes']:5d} {summary['startup_s']:9.2f} {summary['rss_per_node_mb']:11.2f} "
+                  f"{summary['rss_mb']:8.1f} {summary['election_ms']:11.1f} {summary['messages']:8.0f} "
+                  f"{summary['messages_per_second']:8.0f}")
+
+    if args.json:
+        with open(args.json, "w") as out:
+            json.dump(results, out, indent=2)
+
+
+if __name__ == "__main__":
+    main()
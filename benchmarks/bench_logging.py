@@ -0,0 +1,155 @@
+# Per-hop cost of logging in task2 (--log-writer sync vs queue), no sockets
+#
+# One NodeState with a stand-in outgoing socket forwards --hops candidates through the real leader_election_logic
+# (each hop logs a Received and a Sent line), and the time of every call is recorded. The console is replaced by a
+# sink that takes --console-delay ms per write call, to stand in for a slow terminal / pipe; the log file is a real file.
+# --path read feeds the same candidates to the threaded read_connection instead, one binary frame per read from a
+# stand-in connection: every hop also logs the receive-path console lines (waiting, raw received, received message),
+# and the time between two reads is recorded.
+#   sync   print + logging.info on the election thread (the old behaviour)
+#   queue  the election thread only queues a record, a background thread writes the lines in batches
+#   none   --console none --log-level none, the cost of the election logic itself
+# For queue, "drain" is the time the writer needed afterwards to get every line out.
+#
+# usage: python3 benchmarks/bench_logging.py --hops 20000 --console-delay 0 0.05 0.2 --path elect read
+
+import argparse
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+
+from common import load_task2
+
+
+# stands in for stdout, every write call takes delay seconds
+class SlowConsole:
+    def __init__(self, delay):
+        self.delay = delay
+        self.writes = 0
+
+    def write(self, text):
+        self.writes += 1
+        if self.delay:
+            time.sleep(self.delay)
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+# accepts and discards what the node sends (sendall with --send-queue 0, send / close from the PeerSender)
+class NullSocket:
+    def sendall(self, data):
+        pass
+
+    def send(self, data, flags=0):
+        return len(data)
+
+    def close(self):
+        pass
+
+
+# an accepted connection that delivers one frame per read, then EOF; times the gaps between reads (one hop each)
+class FrameSocket(NullSocket):
+    def __init__(self, frames):
+        self.frames = iter(frames)
+        self.reads = []
+
+    def recv_into(self, buffer):
+        self.reads.append(time.perf_counter())
+        frame = next(self.frames, b"")
+        buffer[:len(frame)] = frame
+        return len(frame)
+
+
+def run_once(mode, hops, console_delay, workdir, path="elect"):
+    for handler in logging.root.handlers[:]:  # logging.basicConfig only configures the root logger once per process
+        logging.root.removeHandler(handler)
+        handler.close()
+    myle = load_task2()
+    level = myle.LOG_VERBOSITY['none' if mode == 'none' else 'messages']
+    os.chdir(workdir)
+    myle.setup_log_for_node(1, 'sync' if mode == 'none' else mode, level, level)
+
+    node = myle.NodeState()
+    node.local_node_uuid = uuid.UUID(int=0)  # every candidate is greater, so every one of them is forwarded
+    node.clientSockets = [NullSocket()]
+    messages = [myle.Message(uuid.UUID(int=index + 1), 0) for index in range(hops)]
+
+    connection = FrameSocket([message.encode("binary") for message in messages])
+
+    console = SlowConsole(console_delay)
+    stdout, sys.stdout = sys.stdout, console
+    try:
+        per_hop = []
+        if path == "read":
+            node.read_connection(connection)
+            per_hop = [later - earlier for earlier, later in zip(connection.reads, connection.reads[1:])]
+        else:
+            for message in messages:
+                start = time.perf_counter()
+                node.leader_election_logic(message)
+                per_hop.append(time.perf_counter() - start)
+        finished = time.perf_counter()
+        myle.log_writer.stop()
+        drained = time.perf_counter()
+    finally:
+        sys.stdout = stdout
+
+    per_hop.sort()
+    with open(os.path.join(workdir, "node_1_log.txt")) as log_file:
+        log_lines = sum(1 for _ in log_file)
+    return {
+        "mode": mode,
+        "path": path,
+        "console_delay_ms": console_delay * 1000,
+        "hops": hops,
+        "per_hop_mean_us": statistics.mean(per_hop) * 1e6,
+        "per_hop_median_us": per_hop[len(per_hop) // 2] * 1e6,
+        "per_hop_p99_us": per_hop[int(len(per_hop) * 0.99)] * 1e6,
+        "drain_ms": (drained - finished) * 1000,
+        "console_writes": console.writes,
+        "log_lines": log_lines,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="per-hop logging overhead, sync vs queued log writer")
+    parser.add_argument("--hops", type=int, default=20000)
+    parser.add_argument("--console-delay", type=float, nargs="+", default=[0.0, 0.05, 0.2],
+                        help="milliseconds per console write call")
+    parser.add_argument("--mode", nargs="+", choices=["none", "sync", "queue"], default=["none", "sync", "queue"])
+    parser.add_argument("--path", nargs="+", choices=["elect", "read"], default=["elect", "read"],
+                        help="elect: leader_election_logic per hop, read: read_connection with one frame per read")
+    parser.add_argument("--json", help="write all results to this file")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'path':5s} {'mode':6s} {'console ms':>10s} {'mean us':>9s} {'median us':>9s} {'p99 us':>9s} "
+          f"{'drain ms':>9s} {'writes':>7s} {'log lines':>9s}")
+    for path in args.path:
+        for delay in args.console_delay:
+            for mode in args.mode:
+                with tempfile.TemporaryDirectory() as workdir:
+                    cwd = os.getcwd()
+                    try:
+                        result = run_once(mode, args.hops, delay / 1000, workdir, path)
+                    finally:
+                        os.chdir(cwd)
+                results.append(result)
+                print(f"{path:5s} {mode:6s} {result['console_delay_ms']:10.2f} {result['per_hop_mean_us']:9.1f} "
+                      f"{result['per_hop_median_us']:9.1f} {result['per_hop_p99_us']:9.1f} {result['drain_ms']:9.1f} "
+                      f"{result['console_writes']:7d} {result['log_lines']:9d}")
+
+    if args.json:
+        with open(args.json, "w") as out:
+            json.dump(results, out, indent=2)
+
+
+if __name__ == "__main__":
+    main()
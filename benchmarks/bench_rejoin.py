@@ -0,0 +1,176 @@
+# A node restarts after the election: rejoin with --state-dir vs a node without memory (myleprocess.py --state-dir)
+#
+# Every run starts a generated double ring of --nodes nodes (the task2/launcher.py helpers), elects a leader from
+# node 1 and waits until every node knows it. Then node --restart is killed (SIGKILL, nothing is flushed or closed)
+# and started again with the same arguments. Modes:
+#   state      --state-dir: the node comes back with its uuid, epoch and last leader and asks its peers (one
+#              LEADER_QUERY per outgoing link) - reported: ms from the restart until it knows the leader, whether the
+#              uuid is the one from before, and the messages all nodes sent for it (queries + answers)
+#   no-state   the node comes back with a new uuid and no leader. The others finished their election and closed their
+#              connections, so it does not learn the leader (checked for --no-state-wait seconds); a new election
+#              around the whole ring would cost the messages of the first election (reported for comparison)
+# The restart time includes starting the interpreter; "ready" is when the restarted node reports its connections up.
+#
+# --fsync also times StateFile.save() for every --state-fsync policy (--records records into a temporary directory).
+#
+# usage: python3 benchmarks/bench_rejoin.py --nodes 8 20 --restart 3 --runs 3 --fsync --json rejoin.json
+
+import argparse
+import json
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+from common import load_task2
+
+myle = load_task2()
+from launcher import SCRIPT, ControlClient, stop_nodes, wait_for, write_double_ring  # noqa: E402
+from statefile import FSYNC_POLICIES, StateFile  # noqa: E402
+
+MODES = ["state", "no-state"]
+
+
+def start_node(node, topology_file, workdir, node_args):
+    control_path = os.path.join(workdir, f"node_{node}.sock")
+    with open(os.path.join(workdir, f"node_{node}.out"), "a") as out:
+        process = subprocess.Popen(
+            [sys.executable, SCRIPT, "--topology", topology_file, "--id", str(node), "--no-prompt",
+             "--control-socket", control_path, "--console", "none", "--log-level", "none"] + node_args,
+            cwd=workdir, stdin=subprocess.DEVNULL, stdout=out, stderr=subprocess.STDOUT)
+    return process, ControlClient(control_path)
+
+
+def run_once(nodes, mode, args, base_port):
+    with tempfile.TemporaryDirectory() as workdir:
+        topology_file = os.path.join(workdir, "topology.txt")
+        write_double_ring(topology_file, nodes, base_port)
+        node_args = ["--engine", args.engine]
+        if mode == "state":
+            node_args += ["--state-dir", os.path.join(workdir, "state"), "--state-fsync", args.state_fsync]
+        processes, clients = {}, {}
+        result = {"nodes": nodes, "mode": mode, "engine": args.engine, "restart": args.restart}
+        try:
+            for node in range(1, nodes + 1):
+                processes[node], clients[node] = start_node(node, topology_file, workdir, node_args)
+            wait_for(processes, clients, lambda status: status["ready"], time.monotonic() + args.timeout, "ready")
+            started = time.monotonic()
+            clients[1].command("elect")
+            statuses = wait_for(processes, clients, lambda status: status["leader"] is not None,
+                                started + args.timeout, "the leader")
+            result["election_ms"] = (time.monotonic() - started) * 1000
+            result["election_messages"] = sum(status["sent"] for status in statuses.values())
+            leader = statuses[1]["leader"]
+            old_uuid = statuses[args.restart]["uuid"]
+            others = {node: status["sent"] for node, status in statuses.items() if node != args.restart}
+
+            # restart: SIGKILL (no shutdown path), then the same command line again
+            processes[args.restart].send_signal(signal.SIGKILL)
+            processes[args.restart].wait()
+            clients[args.restart].close()
+            restarted = time.monotonic()
+            processes[args.restart], clients[args.restart] = start_node(args.restart, topology_file, workdir, node_args)
+            restart = {args.restart: processes[args.restart]}
+            restart_client = {args.restart: clients[args.restart]}
+            status = wait_for(restart, restart_client, lambda status: status["ready"],
+                              restarted + args.timeout, "ready after the restart")[args.restart]
+            result["ready_ms"] = (time.monotonic() - restarted) * 1000
+            result["same_uuid"] = status["uuid"] == old_uuid
+            wait = args.timeout if mode == "state" else args.no_state_wait
+            try:
+                status = wait_for(restart, restart_client, lambda status: status["leader"] is not None,
+                                  time.monotonic() + wait, "the leader after the restart")[args.restart]
+                result["rejoin_ms"] = (time.monotonic() - restarted) * 1000
+                result["rejoined"] = status["leader"] == leader
+            except RuntimeError:
+                result["rejoined"] = False
+            statuses = wait_for(processes, clients, lambda status: True, time.monotonic() + args.timeout, "status")
+            result["rejoin_messages"] = (statuses[args.restart]["sent"]
+                                         + sum(statuses[node]["sent"] - sent for node, sent in others.items()))
+        except RuntimeError as error:
+            result["error"] = str(error)
+        finally:
+            stop_nodes(processes, clients, grace=5.0)
+        return result
+
+
+# seconds per StateFile.save() for one fsync policy
+def time_saves(policy, records):
+    with tempfile.TemporaryDirectory() as directory:
+        state = StateFile(os.path.join(directory, "node_1.state"), policy)
+        state.load()
+        node_uuid, leader = uuid.uuid4(), uuid.uuid4()
+        started = time.perf_counter()
+        for epoch in range(records):
+            state.save(node_uuid, epoch, leader)
+        seconds = time.perf_counter() - started
+        state.close()
+        return seconds / records
+
+
+def main():
+    parser = argparse.ArgumentParser(description="restart a node after the election, with and without --state-dir")
+    parser.add_argument("--nodes", type=int, nargs="+", default=[8, 20])
+    parser.add_argument("--mode", nargs="+", choices=MODES, default=MODES)
+    parser.add_argument("--restart", type=int, default=3, help="node that is killed and started again")
+    parser.add_argument("--engine", choices=["threads", "asyncio"], default="threads")
+    parser.add_argument("--state-fsync", choices=FSYNC_POLICIES, default="always")
+    parser.add_argument("--no-state-wait", type=float, default=2.0,
+                        help="seconds to wait for a restarted node without state to learn the leader")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--base-port", type=int, default=10900)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--fsync", action="store_true", help="also time StateFile.save() per --state-fsync policy")
+    parser.add_argument("--records", type=int, default=2000)
+    parser.add_argument("--json", help="write all results to this file")
+    args = parser.parse_args()
+
+    results = []
+    port = args.base_port
+    print(f"double ring, node {args.restart} restarted after the election, {args.engine}, fsync {args.state_fsync}")
+    print(f"{'nodes':>5s} {'mode':8s} {'rejoined':>8s} {'same uuid':>9s} {'ready ms':>8s} {'leader ms':>9s} "
+          f"{'messages':>8s} {'election ms':>11s} {'election msgs':>13s}")
+    for nodes in args.nodes:
+        for mode in args.mode:
+            runs = []
+            for run in range(args.runs):
+                result = run_once(nodes, mode, args, port)
+                port += nodes + 1  # the previous run's connections may still be in TIME_WAIT
+                if "error" in result:
+                    print(f"  {nodes} nodes {mode} run {run}: {result['error']}")
+                else:
+                    runs.append(result)
+            if not runs:
+                continue
+            rejoined = [r for r in runs if r["rejoined"]]
+            summary = {"nodes": nodes, "mode": mode, "engine": args.engine, "runs": len(runs), "of": args.runs,
+                       "rejoined": len(rejoined), "same_uuid": sum(r["same_uuid"] for r in runs),
+                       "ready_ms": statistics.median(r["ready_ms"] for r in runs),
+                       "rejoin_ms": statistics.median(r["rejoin_ms"] for r in rejoined) if rejoined else None,
+                       "rejoin_messages": statistics.median(r["rejoin_messages"] for r in runs),
+                       "election_ms": statistics.median(r["election_ms"] for r in runs),
+                       "election_messages": statistics.median(r["election_messages"] for r in runs)}
+            results.append(summary)
+            leader_ms = f"{summary['rejoin_ms']:9.0f}" if rejoined else f"{'-':>9s}"
+            print(f"{nodes:5d} {mode:8s} {len(rejoined):>4d}/{len(runs):<3d} {summary['same_uuid']:>5d}/{len(runs):<3d} "
+                  f"{summary['ready_ms']:8.0f} {leader_ms} {summary['rejoin_messages']:8.0f} "
+                  f"{summary['election_ms']:11.1f} {summary['election_messages']:13.0f}")
+
+    if args.fsync:
+        print(f"\n{'fsync':8s} {'µs per save':>11s}")
+        for policy in FSYNC_POLICIES:
+            seconds = time_saves(policy, args.records)
+            results.append({"fsync": policy, "records": args.records, "save_us": seconds * 1e6})
+            print(f"{policy:8s} {seconds * 1e6:11.1f}")
+
+    if args.json:
+        with open(args.json, "w") as out:
+            json.dump(results, out, indent=2)
+
+
+if __name__ == "__main__":
+    main()
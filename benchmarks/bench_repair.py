@@ -0,0 +1,148 @@
+# Election latency with dead nodes on the ring (myleprocess.py --successors, cr)
+#
+# Every run starts a generated double ring of --nodes nodes (the task2/launcher.py helpers), waits until every node is
+# ready, kills --failures of them with SIGKILL and lets node 1 start an election. Without repair the election never
+# finishes (the successor of a dead node is never reached); with --successors k the predecessor of a dead node
+# connects to the next live node instead, so up to k - 1 dead nodes in a row are skipped.
+#   --when before   the nodes die right before the elect command (their peers see the connections close first)
+#   --when during   the nodes die right after it, the election restarts in the next epoch where a message got lost
+#   --pattern consecutive   dead nodes next to each other on one branch (3, 4, 5, ...: the worst case for k)
+#   --pattern spread        dead nodes spread over both branches
+# Reported per number of failures (median of --runs): ms from the elect command until every surviving node knows the
+# leader, messages sent, the highest epoch reached, and whether the leader is a surviving node.
+# --check exits with status 1 if any run did not finish, for repeating the racy "during" runs many times.
+#
+# usage: python3 benchmarks/bench_repair.py --nodes 12 --failures 0 1 2 3 --when before during --runs 5 --json repair.json
+#        python3 benchmarks/bench_repair.py --nodes 12 --failures 1 2 3 --when during --runs 30 --check
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import load_task2
+
+load_task2()
+from launcher import SCRIPT, ControlClient, stop_nodes, wait_for, write_double_ring  # noqa: E402
+
+
+# the nodes to kill: never node 1 (the initiator) or the last node (y, the only way back to node 1)
+def victims(nodes, failures, pattern):
+    split = 2 + (nodes - 2) // 2  # first node of branch B, as in write_double_ring
+    if pattern == "consecutive":
+        return list(range(3, 3 + failures))
+    candidates = [node for pair in zip(range(3, split), range(split + 1, nodes)) for node in pair]
+    return sorted(candidates[:failures])
+
+
+def run_once(nodes, failures, args, base_port):
+    with tempfile.TemporaryDirectory() as workdir:
+        topology_file = os.path.join(workdir, "topology.txt")
+        write_double_ring(topology_file, nodes, base_port)
+        node_args = ["--log-level", "none", "--engine", args.engine, "--transport", args.transport,
+                     "--successors", str(args.successors)]
+        processes, clients = {}, {}
+        result = {"nodes": nodes, "failures": failures, "when": args.when, "engine": args.engine}
+        try:
+            for node in range(1, nodes + 1):
+                control_path = os.path.join(workdir, f"node_{node}.sock")
+                with open(os.path.join(workdir, f"node_{node}.out"), "w") as out:
+                    processes[node] = subprocess.Popen(
+                        [sys.executable, SCRIPT, "--topology", topology_file, "--id", str(node), "--no-prompt",
+                         "--control-socket", control_path, "--console", "none"] + node_args,
+                        cwd=workdir, stdin=subprocess.DEVNULL, stdout=out, stderr=subprocess.STDOUT)
+                clients[node] = ControlClient(control_path)
+            wait_for(processes, clients, lambda status: status["ready"], time.monotonic() + args.timeout, "ready")
+
+            dead = victims(nodes, failures, args.pattern)
+            if args.when == "before":
+                kill(processes, clients, dead)
+            started = time.monotonic()
+            clients[1].command("elect")
+            if args.when == "during":
+                kill(processes, clients, dead)
+            survivors = {node: client for node, client in clients.items() if node not in dead}
+            statuses = wait_for(processes, survivors, lambda status: status["leader"] is not None,
+                                started + args.timeout, "the leader")
+            result["election_seconds"] = time.monotonic() - started
+            leaders = {status["leader"] for status in statuses.values()}
+            result["agreed"] = len(leaders) == 1
+            result["leader_alive"] = leaders <= {status["uuid"] for status in statuses.values()}
+            result["epoch"] = max(status["epoch"] for status in statuses.values())
+            result["messages"] = sum(status["sent"] for status in statuses.values())
+        except RuntimeError as error:
+            result["error"] = str(error)
+        finally:
+            stop_nodes(processes, clients, grace=5.0)
+        return result
+
+
+def kill(processes, clients, dead):
+    for node in dead:
+        processes[node].kill()
+        processes[node].wait()
+        clients.pop(node).close()
+        processes.pop(node)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="election latency with dead nodes, --successors repair")
+    parser.add_argument("--nodes", type=int, default=12)
+    parser.add_argument("--failures", type=int, nargs="+", default=[0, 1, 2, 3])
+    parser.add_argument("--successors", type=int, default=4, help="--successors of every node (k)")
+    parser.add_argument("--pattern", choices=["consecutive", "spread"], default="consecutive")
+    parser.add_argument("--when", nargs="+", choices=["before", "during"], default=["before", "during"])
+    parser.add_argument("--engine", choices=["threads", "asyncio"], default="threads")
+    parser.add_argument("--transport", choices=["auto", "shm", "tcp"], default="tcp")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--base-port", type=int, default=9800)
+    parser.add_argument("--timeout", type=float, default=20.0)
+    parser.add_argument("--json", help="write all results to this file")
+    parser.add_argument("--check", action="store_true", help="exit with status 1 if any run did not finish")
+    args = parser.parse_args()
+    if max(args.failures) > (args.nodes - 3) // 2 and args.pattern == "consecutive":
+        parser.error("not enough nodes on branch A for that many consecutive failures")
+
+    results = []
+    failed = 0
+    port = args.base_port
+    print(f"{args.nodes} node double ring, k={args.successors}, {args.pattern} failures, {args.engine}, {args.transport}")
+    print(f"{'when':6s} {'failures':>8s} {'ok':>5s} {'election ms':>11s} {'max ms':>8s} {'messages':>8s} {'epoch':>5s}")
+    for when in args.when:
+        args.when = when
+        for failures in args.failures:
+            runs = []
+            for _ in range(args.runs):
+                result = run_once(args.nodes, failures, args, port)
+                port += args.nodes + 1  # the previous run's ports may still be in TIME_WAIT
+                if result.get("agreed") and result.get("leader_alive"):
+                    runs.append(result)
+                else:
+                    failed += 1
+                    print(f"  {when} {failures}: {result.get('error', 'wrong leader')}")
+            if not runs:
+                continue
+            latencies = [r["election_seconds"] * 1000 for r in runs]
+            summary = {"when": when, "failures": failures, "successors": args.successors, "pattern": args.pattern,
+                       "engine": args.engine, "transport": args.transport, "runs": len(runs), "of": args.runs,
+                       "election_ms": statistics.median(latencies), "election_max_ms": max(latencies),
+                       "messages": statistics.median(r["messages"] for r in runs),
+                       "epoch": max(r["epoch"] for r in runs)}
+            results.append(summary)
+            print(f"{when:6s} {failures:8d} {len(runs):>2d}/{args.runs:<2d} {summary['election_ms']:11.1f} "
+                  f"{summary['election_max_ms']:8.1f} {summary['messages']:8.0f} {summary['epoch']:5d}")
+
+    if args.json:
+        with open(args.json, "w") as out:
+            json.dump(results, out, indent=2)
+    if args.check and failed:
+        print(f"{failed} run(s) did not finish")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
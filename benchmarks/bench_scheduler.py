@@ -0,0 +1,140 @@
+# Pending timers of a threaded task2 node: one threading.Timer per delay vs the node's Scheduler (task2/scheduler.py)
+#
+# For every number of timers (in this process, no sockets):
+#   - schedules them with deadlines spread over [--delay, 2 --delay] seconds
+#   - reads threads / RSS of the process while they are pending (/proc, like the other benchmarks); with many
+#     threading.Timers the first ones may have run before the last one is scheduled
+#   - waits until all of them ran and reports how late they ran (p50 / p99 after the deadline)
+#   - schedules the same number again and cancels them all (µs per cancel)
+# threading.Timer starts one thread per timer, so it is only run up to --max-timer-threads timers.
+#
+# --retries also runs a NodeState without peers through leader_election_logic: the "no outgoing client socket"
+# retries must stop after max_retries (5 retries, 1 s apart) without leaving timers or threads behind.
+#
+# usage: python3 benchmarks/bench_scheduler.py --timers 100 1000 10000 100000 --retries --json scheduler.json
+
+import argparse
+import gc
+import json
+import os
+import threading
+import time
+
+from common import load_task2, process_stats
+
+myle = load_task2()
+from scheduler import Scheduler  # noqa: E402 (task2 is on sys.path after load_task2)
+
+
+# threading.Timer with the call_later() / cancel() interface of the Scheduler
+class TimerThreads:
+    def call_later(self, delay, function, *args):
+        timer = threading.Timer(delay, function, args=args)
+        timer.daemon = True
+        timer.start()
+        return timer
+
+    def stop(self):
+        pass
+
+MODES = {"timer": TimerThreads, "scheduler": Scheduler}
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def run_once(mode, count, delay):
+    threads = threading.active_count()
+    timers = MODES[mode]()
+    before = process_stats(os.getpid())
+    lateness = []
+    done = threading.Event()
+
+    def fired(deadline):
+        lateness.append(time.monotonic() - deadline)  # list.append is atomic, the timer threads may run at once
+        if len(lateness) == count:
+            done.set()
+
+    started = time.perf_counter()
+    for i in range(count):
+        timer_delay = delay * (1 + i / count)
+        timers.call_later(timer_delay, fired, time.monotonic() + timer_delay)
+    schedule_seconds = time.perf_counter() - started
+    pending = process_stats(os.getpid())
+    if not done.wait(2 * delay + 60):
+        raise RuntimeError(f"{mode}: only {len(lateness)} of {count} timers ran")
+
+    handles = [timers.call_later(3600, fired, 0) for _ in range(count)]
+    started = time.perf_counter()
+    for handle in handles:
+        handle.cancel()
+    cancel_seconds = time.perf_counter() - started
+    del handles
+    timers.stop()
+    gc.collect()
+    deadline = time.monotonic() + 30
+    while threading.active_count() > threads and time.monotonic() < deadline:
+        time.sleep(0.05)  # the next run starts without the threads of this one (cancelled Timers end on their own)
+    return {"mode": mode, "timers": count,
+            "schedule_us": schedule_seconds / count * 1e6, "cancel_us": cancel_seconds / count * 1e6,
+            "threads": pending["threads"] - before["threads"],
+            "rss_mb": (pending["rss_kb"] - before["rss_kb"]) / 1024,
+            "late_p50_ms": percentile(lateness, 0.5) * 1000, "late_p99_ms": percentile(lateness, 0.99) * 1000}
+
+
+# a node without peers: every leader_election_logic call schedules a retry, until max_retries
+def check_retries():
+    state = myle.NodeState()
+    threads = threading.active_count()
+    started = time.monotonic()
+    state.leader_election_logic(myle.Message(state.local_node_uuid, 0))
+    while state.retries and time.monotonic() - started < 30:
+        time.sleep(0.1)
+    time.sleep(1.5)  # a retry past the last one would be due by now
+    return {"retries": state.metrics.total('myle_retries_total'), "seconds": time.monotonic() - started,
+            "pending_timers": state.scheduler.pending(), "extra_threads": threading.active_count() - threads}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="threading.Timer vs the task2 Scheduler with many pending timers")
+    parser.add_argument("--timers", type=int, nargs="+", default=[100, 1000, 10000, 100000])
+    parser.add_argument("--mode", nargs="+", choices=list(MODES), default=list(MODES))
+    parser.add_argument("--delay", type=float, default=1.0, help="first deadline in seconds (the last one is twice that)")
+    parser.add_argument("--max-timer-threads", type=int, default=10000,
+                        help="skip threading.Timer runs with more timers (one thread each)")
+    parser.add_argument("--retries", action="store_true", help="also check that election retries stop after max_retries")
+    parser.add_argument("--json", help="write all results to this file")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'mode':9s} {'timers':>7s} {'threads':>7s} {'RSS MB':>7s} {'sched µs':>8s} {'cancel µs':>9s} "
+          f"{'late p50 ms':>11s} {'late p99 ms':>11s}")
+    for count in args.timers:
+        for mode in args.mode:
+            if mode == "timer" and count > args.max_timer_threads:
+                print(f"{mode:9s} {count:7d}  skipped (more than --max-timer-threads)")
+                continue
+            try:
+                result = run_once(mode, count, args.delay)
+            except (RuntimeError, MemoryError) as error:  # RuntimeError: can't start new thread
+                print(f"{mode:9s} {count:7d}  failed: {error}")
+                continue
+            results.append(result)
+            print(f"{mode:9s} {count:7d} {result['threads']:7d} {result['rss_mb']:7.1f} {result['schedule_us']:8.1f} "
+                  f"{result['cancel_us']:9.2f} {result['late_p50_ms']:11.2f} {result['late_p99_ms']:11.2f}")
+
+    if args.retries:
+        result = check_retries()
+        results.append({"mode": "retries", **result})
+        print(f"retries: {result['retries']:.0f} in {result['seconds']:.1f} s, {result['pending_timers']} timers pending "
+              f"afterwards, {result['extra_threads']} extra threads")
+
+    if args.json:
+        with open(args.json, "w") as out:
+            json.dump(results, out, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+# Hop latency of the task2 transports (myleprocess.py --transport, task2/transports.py)
+#
+# An echo node in a second process sends every message it receives straight back, over
+#   tcp    TCP on 127.0.0.1
+#   unix   an AF_UNIX stream socket (--transport auto between nodes on one host)
+#   shm    the shared-memory rings (--transport shm)
+# using the same links, binary frames and FrameReader as the nodes. Reported per transport and engine:
+#   hop        one message from node to node: median / p99 of the round trip / 2
+#   burst      messages per second when --burst messages are sent before reading the replies (the echo node
+#              is busy, so shm writes need no wake-up byte)
+# With --ring N it also runs one launcher.py election on an N node double ring per transport (--initiators all).
+#
+# usage: python3 benchmarks/bench_transport.py --messages 20000 --engine threads asyncio --ring 20 --json transport.json
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+from common import TASK2_DIR, load_task2
+
+myle = load_task2()
+import transports  # noqa: E402 (task2 is on sys.path after load_task2)
+
+TRANSPORTS = {"tcp": "tcp", "unix": "auto", "shm": "shm"}  # name -> --transport that picks it
+LAUNCHER = os.path.join(TASK2_DIR, "launcher.py")
+
+
+# --- echo node -----------------------------------------------------------------------------------------------------
+
+def echo_threads(transport, port, directory):
+    if transport == "tcp":
+        listener = socket.create_server(("127.0.0.1", port))
+    else:
+        listener = transports.listen_unix(transports.socket_path(directory, "127.0.0.1", port,
+                                                                 "shm" if transport == "shm" else "sock"))
+    conn, _ = listener.accept()
+    if transport == "tcp":
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)  # as the nodes' accept loop does
+    if transport == "shm":
+        conn = transports.accept_shm(conn, transports.HELLO_TIMEOUT)
+    reader = myle.FrameReader()
+    while True:
+        messages = reader.recv_from(conn)
+        if messages is None:
+            return
+        for message in messages:
+            conn.sendall(message.encode("binary"))
+
+async def echo_asyncio(transport, port, directory):
+    done = asyncio.Event()
+
+    async def echo(reader, writer):
+        frame_reader = myle.FrameReader()
+        while True:
+            data = await reader.read(65536)
+            if not data:
+                break
+            for message in frame_reader.feed(data):
+                writer.write(message.encode("binary"))
+        writer.close()
+        done.set()
+
+    if transport == "tcp":
+        server = await asyncio.start_server(echo, "127.0.0.1", port)
+    else:
+        listener = transports.listen_unix(transports.socket_path(directory, "127.0.0.1", port,
+                                                                 "shm" if transport == "shm" else "sock"))
+        if transport == "shm":
+            server = await transports.start_shm_server(echo, listener)
+        else:
+            server = await asyncio.start_unix_server(echo, sock=listener)
+    await done.wait()
+    if isinstance(server, asyncio.Task):
+        server.cancel()  # start_shm_server's accept task
+    else:
+        server.close()
+
+def echo_node(engine, transport, port, directory):
+    if engine == "threads":
+        echo_threads(transport, port, directory)
+    else:
+        asyncio.run(echo_asyncio(transport, port, directory))
+
+
+# --- measuring node ------------------------------------------------------------------------------------------------
+
+def measure_threads(transport, port, directory, messages, burst):
+    deadline = time.monotonic() + 10
+    while True:
+        try:
+            link, used = transports.connect_link("127.0.0.1", port, TRANSPORTS[transport], directory)
+            break
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.01)
+    assert used == transport, f"connected over {used}, not {transport}"
+    link.settimeout(None)
+    frame = myle.Message(uuid.uuid4(), 0).encode("binary")
+    reader = myle.FrameReader()
+
+    def receive(count):
+        while count > 0:
+            count -= len(reader.recv_from(link))
+
+    hops = []
+    for _ in range(messages):
+        start = time.perf_counter()
+        link.sendall(frame)
+        receive(1)
+        hops.append((time.perf_counter() - start) / 2)
+
+    start = time.perf_counter()
+    for _ in range(messages // burst):
+        for _ in range(burst):
+            link.sendall(frame)
+        receive(burst)
+    rate = (messages // burst) * burst / (time.perf_counter() - start)
+    link.close()
+    return hops, rate
+
+async def measure_asyncio(transport, port, directory, messages, burst):
+    deadline = time.monotonic() + 10
+    while True:
+        try:
+            reader, writer, used = await transports.open_link("127.0.0.1", port, TRANSPORTS[transport], directory)
+            break
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.01)
+    assert used == transport, f"connected over {used}, not {transport}"
+    frame = myle.Message(uuid.uuid4(), 0).encode("binary")
+    frame_reader = myle.FrameReader()
+
+    async def receive(count):
+        while count > 0:
+            count -= len(frame_reader.feed(await reader.read(65536)))
+
+    hops = []
+    for _ in range(messages):
+        start = time.perf_counter()
+        writer.write(frame)
+        await receive(1)
+        hops.append((time.perf_counter() - start) / 2)
+
+    start = time.perf_counter()
+    for _ in range(messages // burst):
+        for _ in range(burst):
+            writer.write(frame)
+        await receive(burst)
+    rate = (messages // burst) * burst / (time.perf_counter() - start)
+    writer.close()
+    return hops, rate
+
+def run_pair(engine, transport, port, messages, burst):
+    with tempfile.TemporaryDirectory() as directory:
+        echo = multiprocessing.get_context("fork").Process(target=echo_node, args=(engine, transport, port, directory))
+        echo.start()
+        try:
+            if engine == "threads":
+                hops, rate = measure_threads(transport, port, directory, messages, burst)
+            else:
+                hops, rate = asyncio.run(measure_asyncio(transport, port, directory, messages, burst))
+        finally:
+            echo.join(5)
+            if echo.is_alive():
+                echo.kill()
+    hops.sort()
+    return {"engine": engine, "transport": transport, "messages": messages,
+            "hop_us": statistics.median(hops) * 1e6, "hop_p99_us": hops[int(len(hops) * 0.99)] * 1e6,
+            "burst": burst, "burst_msgs_per_second": rate}
+
+
+# one launcher.py election over each transport
+def run_ring(nodes, transport, engine, base_port):
+    with tempfile.TemporaryDirectory() as workdir:
+        result_file = os.path.join(workdir, "result.json")
+        subprocess.run([sys.executable, LAUNCHER, "--nodes", str(nodes), "--engine", engine, "--initiators", "all",
+                        "--base-port", str(base_port), "--workdir", workdir, "--json", result_file,
+                        "--", "--log-level", "none", "--no-suppression", "--transport", TRANSPORTS[transport]],
+                       stdout=subprocess.DEVNULL, check=False)
+        with open(result_file) as result:
+            return json.load(result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="hop latency of the tcp / unix / shm transports")
+    parser.add_argument("--transport", nargs="+", choices=list(TRANSPORTS), default=list(TRANSPORTS))
+    parser.add_argument("--engine", nargs="+", choices=["threads", "asyncio"], default=["threads", "asyncio"])
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--burst", type=int, default=64, help="messages in flight for the burst rate")
+    parser.add_argument("--ring", type=int, help="also run an election on a double ring of this many nodes per transport")
+    parser.add_argument("--runs", type=int, default=3, help="--ring: elections per transport (median)")
+    parser.add_argument("--base-port", type=int, default=9600)
+    parser.add_argument("--json", help="write all results to this file")
+    args = parser.parse_args()
+
+    results = []
+    port = args.base_port
+    print(f"{'engine':8s} {'transport':9s} {'hop us':>8s} {'p99 us':>8s} {'burst msg/s':>12s}")
+    for engine in args.engine:
+        for transport in args.transport:
+            result = run_pair(engine, transport, port, args.messages, args.burst)
+            port += 1
+            results.append(result)
+            print(f"{engine:8s} {transport:9s} {result['hop_us']:8.1f} {result['hop_p99_us']:8.1f} "
+                  f"{result['burst_msgs_per_second']:12,.0f}")
+
+    if args.ring:
+        print(f"\n{args.ring} node ring, --initiators all --no-suppression, median of {args.runs}")
+        print(f"{'engine':8s} {'transport':9s} {'election ms':>11s} {'messages':>8s} {'msgs/s':>8s}")
+        for engine in args.engine:
+            for transport in args.transport:
+                runs = []
+                for _ in range(args.runs):
+                    result = run_ring(args.ring, transport, engine, port)
+                    port += args.ring + 1
+                    if result.get("agreed"):
+                        runs.append(result)
+                if not runs:
+                    print(f"{engine:8s} {transport:9s} no agreement")
+                    continue
+                summary = {"engine": engine, "transport": transport, "ring": args.ring, "runs": len(runs),
+                           "election_ms": statistics.median(r["election_seconds"] for r in runs) * 1000,
+                           "messages": statistics.median(r["messages"] for r in runs),
+                           "messages_per_second": statistics.median(r["messages_per_second"] for r in runs)}
+                results.append(summary)
+                print(f"{engine:8s} {transport:9s} {summary['election_ms']:11.1f} {summary['messages']:8.0f} "
+                      f"{summary['messages_per_second']:8.0f}")
+
+    if args.json:
+        with open(args.json, "w") as out:
+            json.dump(results, out, indent=2)
+
+
+if __name__ == "__main__":
+    main()
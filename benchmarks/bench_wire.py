@@ -0,0 +1,51 @@
+# Micro-benchmark of the task2 wire formats: json lines vs binary frames
+# measures encode and decode throughput (messages per second) and bytes per message
+#
+# usage: python3 benchmarks/bench_wire.py [--messages 200000]
+
+import argparse
+import time
+import uuid
+
+from common import load_task2
+
+myle = load_task2()
+
+
+def throughput(function, items):
+    start = time.perf_counter()
+    for item in items:
+        function(item)
+    return len(items) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="json vs binary Message encode/decode throughput")
+    parser.add_argument("--messages", type=int, default=200000)
+    args = parser.parse_args()
+
+    messages = [myle.Message(uuid.uuid4(), i % 2) for i in range(args.messages)]
+
+    print(f"{'format':8s} {'bytes/msg':>9s} {'encode msg/s':>14s} {'decode msg/s':>14s} {'stream decode msg/s':>20s}")
+    for wire_format, decode in [("json", lambda frame: myle.Message.json_to_msg(frame)),
+                                ("binary", myle.Message.bytes_to_msg)]:
+        frames = [message.encode(wire_format) for message in messages]
+        encode_rate = throughput(lambda message: message.encode(wire_format), messages)
+        decode_rate = throughput(decode, frames)
+
+        # decoding a whole stream the way the server does (frames glued together, split by FrameReader)
+        stream = b"".join(frames)
+        chunks = [stream[i:i + 1024] for i in range(0, len(stream), 1024)]
+        start = time.perf_counter()
+        reader = myle.FrameReader()
+        decoded = 0
+        for chunk in chunks:
+            decoded += len(reader.feed(chunk))
+        stream_rate = decoded / (time.perf_counter() - start)
+        assert decoded == len(messages)
+
+        print(f"{wire_format:8s} {len(frames[0]):>9d} {encode_rate:>14,.0f} {decode_rate:>14,.0f} {stream_rate:>20,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+# shared helpers for the benchmark scripts
+# - spawning node processes (myleprocess.py) and watching their stdout
+# - reading thread count / memory of a process from /proc
+# - writing config files into a scratch directory so benchmarks don't touch the repo configs
+
+import importlib.util
+import os
+import subprocess
+import sys
+import threading
+import time
+
+REPO_DIR  = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TASK1_DIR = os.path.join(REPO_DIR, "task1")
+TASK2_DIR = os.path.join(REPO_DIR, "task2")
+
+TASK1_SCRIPT = os.path.join(TASK1_DIR, "node1", "myleprocess.py")
+TASK2_SCRIPT = os.path.join(TASK2_DIR, "myleprocess.py")
+
+# lines printed by myleprocess.py once a node knows the leader
+LEADER_MARKERS = ("Leader is decided to", "Leader Elected")
+PROMPT_MARKER  = "Press [Enter]"
+
+
+# imports a myleprocess.py file as a module (they are scripts, not packages)
+def load_module(path, name):
+    directory = os.path.dirname(path)
+    if directory not in sys.path:
+        sys.path.insert(0, directory)  # so the script can import its sibling modules
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def load_task1():
+    return load_module(TASK1_SCRIPT, "task1_myleprocess")
+
+def load_task2():
+    return load_module(TASK2_SCRIPT, "task2_myleprocess")
+
+
+# one node process, stdout is collected by a background thread with a timestamp per line
+class NodeProcess:
+    def __init__(self, args, cwd, name=None):
+        self.name  = name or " ".join(args)
+        self.lines = []              # list of (timestamp, line)
+        self.partial = ""            # output without a newline yet (e.g. the input() prompt)
+        self.cond  = threading.Condition()
+        self.proc  = subprocess.Popen([sys.executable, "-u"] + args, cwd=cwd,
+                                      stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                      stderr=subprocess.STDOUT)
+        self.reader = threading.Thread(target=self._read_output, daemon=True)
+        self.reader.start()
+
+    def _read_output(self):
+        fd = self.proc.stdout.fileno()
+        while True:
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                break
+            now = time.time()
+            with self.cond:
+                text = self.partial + chunk.decode(errors="replace")
+                *complete, self.partial = text.split("\n")
+                for line in complete:
+                    self.lines.append((now, line))
+                self.cond.notify_all()
+        with self.cond:
+            self.cond.notify_all()
+
+    # first timestamp at which any of the markers showed up (or None)
+    def first_match(self, markers, since=0.0):
+        with self.cond:
+            for ts, line in self.lines:
+                if ts >= since and any(m in line for m in markers):
+                    return ts
+            if any(m in self.partial for m in markers):
+                return time.time()
+        return None
+
+    # block until one of the markers is printed, returns its timestamp
+    def wait_for(self, markers, timeout, since=0.0):
+        deadline = time.time() + timeout
+        while True:
+            ts = self.first_match(markers, since)
+            if ts is not None:
+                return ts
+            remaining = deadline - time.time()
+            if remaining <= 0 or self.proc.poll() is not None:
+                raise TimeoutError(f"{self.name}: none of {markers} within {timeout}s")
+            with self.cond:
+                self.cond.wait(min(remaining, 0.2))
+
+    def count(self, marker):
+        with self.cond:
+            return sum(1 for _, line in self.lines if marker in line)
+
+    # number of connected peers from the node's "Ready: <n> of <k> peers connected" line (None if not printed)
+    def ready_peers(self):
+        with self.cond:
+            for _, line in self.lines:
+                if "Ready: " in line:
+                    return int(line.split("Ready: ", 1)[1].split()[0])
+        return None
+
+    def send(self, text):
+        self.proc.stdin.write(text.encode())
+        self.proc.stdin.flush()
+
+    def stop(self):
+        if self.proc.poll() is None:
+            self.proc.kill()
+        self.proc.wait()
+
+
+# number of threads and resident memory (kB) of a running process, read from /proc (linux only)
+def process_stats(pid):
+    stats = {"threads": None, "rss_kb": None}
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("Threads:"):
+                    stats["threads"] = int(line.split()[1])
+                elif line.startswith("VmRSS:"):
+                    stats["rss_kb"] = int(line.split()[1])
+    except OSError:
+        pass
+    return stats
+
+
+# task2 example topology (x -> two peers, n -> one, y closes the ring), same as config1.txt .. config5.txt
+# node number -> (node type, [successor node numbers])
+TASK2_EXAMPLE_TOPOLOGY = {
+    1: ("x", [2, 3]),
+    2: ("n", [4]),
+    3: ("n", [5]),
+    4: ("n", [5]),
+    5: ("y", [1]),
+}
+
+
+# writes config<number>.txt files for the task2 example topology into directory, using base_port + number
+def write_task2_configs(directory, base_port, host="127.0.0.1"):
+    for number, (_, successors) in TASK2_EXAMPLE_TOPOLOGY.items():
+        with open(os.path.join(directory, f"config{number}.txt"), "w") as config:
+            config.write(f"{host},{base_port + number}\n")
+            for successor in successors:
+                config.write(f"{host},{base_port + successor}\n")
+
+
+# task2 partial double ring generalised to any size (0-based node indexes):
+# x=0 -> (branch A, branch B) -> y=n-1 -> x, returns {index: [successor indexes]}
+def double_ring_edges(count):
+    if count < 4:
+        raise ValueError("the double ring needs at least 4 nodes")
+    y = count - 1
+    split = 1 + (count - 2) // 2  # first node of branch B
+    edges = {0: [1, split], y: [0]}
+    for branch_start, branch_end in [(1, split - 1), (split, y - 1)]:
+        for node in range(branch_start, branch_end):
+            edges[node] = [node + 1]
+        edges[branch_end] = [y]
+    return edges
+
+
+# writes config1.txt .. config<count>.txt for a double ring of count nodes, returns {number: node type}
+def write_task2_ring_configs(directory, base_port, count, host="127.0.0.1"):
+    types = {}
+    for index, successors in double_ring_edges(count).items():
+        number = index + 1
+        types[number] = "x" if index == 0 else "y" if index == count - 1 else "n"
+        with open(os.path.join(directory, f"config{number}.txt"), "w") as config:
+            config.write(f"{host},{base_port + number}\n")
+            for successor in successors:
+                config.write(f"{host},{base_port + successor + 1}\n")
+    return types
+
+
+# writes node<i>/config.txt directories for a task1 ring of count nodes, returns the directories in ring order
+def write_task1_ring_configs(directory, base_port, count, host="127.0.0.1"):
+    node_dirs = []
+    for index in range(count):
+        node_dir = os.path.join(directory, f"node{index + 1}")
+        os.makedirs(node_dir, exist_ok=True)
+        with open(os.path.join(node_dir, "config.txt"), "w") as config:
+            config.write(f"{host},{base_port + index + 1}\n")
+            config.write(f"{host},{base_port + (index + 1) % count + 1}\n")
+        node_dirs.append(node_dir)
+    return node_dirs
+
+
+def stop_all(nodes):
+    for node in nodes:
+        node.stop()
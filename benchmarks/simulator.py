@@ -0,0 +1,372 @@
+# Discrete-event cluster simulator for the leader election code in task1/ and task2/
+#
+# Runs the real NodeState.leader_election_logic of myleprocess.py for thousands of nodes in one process:
+# - a virtual clock and a priority queue of delivery events replace real time and sockets
+# - SimNode subclasses the real NodeState and only replaces the transport (send_node_message / schedule),
+#   the same way the asyncio engine does
+# - every link delivers in FIFO order (like TCP), with a configurable latency and drop model
+#
+# Variants:
+#   task1  single ring,  node i -> node i+1
+#   task2  partial double ring, generalised from the 5-node example:
+#          x (node 0) -> two branches -> y (node n-1) -> x
+#          (--topology ring: plain ring of n-type nodes, for --algorithm hs)
+#          (--topology grid / random / a topology file: general networks, for --algorithm floodmax)
+#
+# Algorithms (task2): cr = Chang-Roberts (leader_election_logic), hs = Hirschberg-Sinclair (hs_election_logic),
+# floodmax = FloodMax (floodmax_logic), runs diameter rounds over every link
+# links work in both directions like the TCP connections, so HS can answer over the link a probe came from
+#
+# usage: python3 benchmarks/simulator.py --variant task1 --nodes 100000 --order random
+#        python3 benchmarks/simulator.py --variant task2 --nodes 10000 --latency uniform:0.5,1.5 --drop 0.001
+#        python3 benchmarks/simulator.py --variant task2 --algorithm floodmax --topology random --nodes 10000
+
+import argparse
+import heapq
+import json
+import random
+import time
+import uuid
+
+from common import load_task1, load_task2, double_ring_edges
+
+
+# latency models, all return a function rng -> delay (virtual time units)
+def parse_latency(spec):
+    kind, _, params = spec.partition(":")
+    values = [float(v) for v in params.split(",")] if params else []
+    if kind == "const":
+        delay = values[0] if values else 1.0
+        return lambda rng: delay
+    if kind == "uniform":
+        low, high = values if values else (0.5, 1.5)
+        return lambda rng: rng.uniform(low, high)
+    if kind == "exp":
+        mean = values[0] if values else 1.0
+        return lambda rng: rng.expovariate(1.0 / mean)
+    raise ValueError(f"unknown latency model '{spec}' (const:D, uniform:LOW,HIGH, exp:MEAN)")
+
+
+# one direction of a connection between two simulated nodes, stands in for a socket
+# reverse is the other direction of the same connection (what the receiver sees as the arrival link)
+class SimLink:
+    def __init__(self, sim, src, dst, scale):
+        self.sim   = sim
+        self.src   = src
+        self.dst   = dst
+        self.scale = scale  # per-link latency factor (heterogeneous links)
+        self.reverse = None
+        self.last_delivery = 0.0
+        self.closed = False
+
+    def send(self, message):
+        if self.closed:
+            self.sim.send_errors += 1
+            return
+        self.sim.transmit(self, message)
+
+    def close(self):
+        self.closed = True
+
+
+class Simulator:
+    def __init__(self, latency, drop=0.0, link_spread=0.0, seed=None):
+        self.rng     = random.Random(seed)
+        self.latency = latency
+        self.drop    = drop
+        self.link_spread = link_spread
+        self.now     = 0.0
+        self.events  = []  # heap of (time, sequence, kind, target, payload)
+        self.sequence = 0
+        self.nodes   = []
+
+        # statistics
+        self.sent = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.send_errors = 0
+        self.sent_by_flag = {0: 0, 1: 0}
+        self.sent_by_kind = {}
+        self.leader_known_at = {}  # node index -> (virtual time, leader uuid)
+
+    # a connection src -> dst, returns (link used by src, link used by dst to send back)
+    def connect(self, src, dst):
+        scale = self.rng.uniform(1 - self.link_spread, 1 + self.link_spread) if self.link_spread else 1.0
+        forward, backward = SimLink(self, src, dst, scale), SimLink(self, dst, src, scale)
+        forward.reverse, backward.reverse = backward, forward
+        return forward, backward
+
+    def push(self, at, kind, target, payload):
+        self.sequence += 1
+        heapq.heappush(self.events, (at, self.sequence, kind, target, payload))
+
+    # schedules the delivery of a message over a link - FIFO per link, like a TCP connection
+    def transmit(self, link, message):
+        self.sent += 1
+        self.sent_by_flag[message.flag] = self.sent_by_flag.get(message.flag, 0) + 1
+        kind = getattr(message, "kind", None)
+        self.sent_by_kind[kind] = self.sent_by_kind.get(kind, 0) + 1
+        if self.drop and self.rng.random() < self.drop:
+            self.dropped += 1
+            return
+        at = max(self.now + self.latency(self.rng) * link.scale, link.last_delivery)
+        link.last_delivery = at
+        self.push(at, "deliver", link, message)
+
+    def schedule(self, delay, function, args):
+        self.push(self.now + delay, "call", function, args)
+
+    def run(self, max_events):
+        processed = 0
+        while self.events and processed < max_events:
+            self.now, _, kind, target, payload = heapq.heappop(self.events)
+            processed += 1
+            if kind == "call":
+                target(*payload)
+                continue
+            self.delivered += 1
+            index = target.dst
+            node = self.nodes[index]
+            node.receive(payload, target.reverse)
+            if index not in self.leader_known_at:
+                if payload.flag == 1:
+                    self.leader_known_at[index] = (self.now, payload.received_uuid)
+                elif node.leader_uuid is not None:
+                    self.leader_known_at[index] = (self.now, node.leader_uuid)
+        return processed
+
+
+# builds a SimNode class on top of the real NodeState of the given myleprocess module
+def sim_node_class(module, variant):
+    class SimNode(module.NodeState):
+        def __init__(self, sim, index, node_uuid):
+            super().__init__()
+            self.sim = sim
+            self.index = index
+            self.local_node_uuid = node_uuid
+
+        # delayed work (task2 retries) runs on the virtual clock
+        def schedule(self, delay, function, *args):
+            self.sim.schedule(delay, function, args)
+
+        if variant == "task1":
+            def send_node_message(self, message):
+                self.clientSocket.send(message)
+
+            def receive(self, message, link):
+                self.leader_election_logic(message)
+
+            def trigger(self):
+                self.trigger_election()
+        else:
+            def send_node_message(self, message, current_Socket=None):
+                current_Socket.send(message)
+
+            def receive(self, message, link):
+                self.handle_message(message, link)
+
+            def close_client_sockets(self):
+                for link in self.clientSockets:
+                    link.close()
+                self.clientSockets = []
+
+            def trigger(self):
+                self.manual_trigger_election()
+
+    return SimNode
+
+
+# uuids in ring order: random, ascending (best case) or descending (worst case) in the direction messages travel
+def make_uuids(count, order, rng):
+    ids = sorted(uuid.UUID(int=rng.getrandbits(128), version=4) for _ in range(count))
+    if order == "descending":
+        ids.reverse()
+    elif order == "random":
+        rng.shuffle(ids)
+    return ids
+
+
+# general networks for FloodMax (0-based indexes, every link in both directions), returns {index: [successors]}
+#   grid    rows of int(sqrt(n)) nodes, linked to the left/right and up/down neighbours
+#   random  bidirectional ring plus one random chord per node (average degree ~4, small diameter)
+#   <file>  a task2 topology file (--nodes is ignored)
+def graph_edges(topology, count, rng):
+    edges = {index: set() for index in range(count)}
+    def link(a, b):
+        if a != b:
+            edges[a].add(b)
+            edges[b].add(a)
+    if topology == "grid":
+        width = max(1, int(count ** 0.5))
+        for index in range(count):
+            if (index + 1) % width and index + 1 < count:
+                link(index, index + 1)
+            if index + width < count:
+                link(index, index + width)
+    elif topology == "random":
+        for index in range(count):
+            link(index, (index + 1) % count)
+            link(index, rng.randrange(count))
+    return {index: sorted(successors) for index, successors in edges.items()}
+
+
+# topology file -> {index: [successors]} in file order
+def file_edges(module, path):
+    topology = module.read_topology_file(path)
+    index_of = {node_id: index for index, node_id in enumerate(topology)}
+    return {index_of[node_id]: [index_of[n] for n in neighbours]
+            for node_id, (_, _, neighbours) in topology.items()}
+
+
+# silence the per-hop console/log output of the real code (it would dominate the run time)
+def silence(module):
+    module.log_message = lambda *args, **kwargs: None
+    module.print = lambda *args, **kwargs: None
+
+
+def build(variant, count, order, initiators, sim, algorithm="cr", topology="double", suppression=True):
+    module = load_task1() if variant == "task1" else load_task2()
+    silence(module)
+    SimNode = sim_node_class(module, variant)
+
+    edges = None
+    if variant == "task2":
+        if topology == "double":
+            edges = double_ring_edges(count)
+        elif topology == "ring":
+            edges = {index: [(index + 1) % count] for index in range(count)}
+        elif topology in ("grid", "random"):
+            edges = graph_edges(topology, count, sim.rng)
+        else:
+            edges = file_edges(module, topology)
+            count = len(edges)
+
+    ids = make_uuids(count, order, sim.rng)
+    sim.nodes = [SimNode(sim, index, node_uuid) for index, node_uuid in enumerate(ids)]
+    if variant == "task1":
+        for index, node in enumerate(sim.nodes):
+            node.clientSocket, _ = sim.connect(index, (index + 1) % count)
+    else:
+        # the node types main() derives from a topology file (they decide the HS ring neighbours)
+        shape = {index: (None, None, successors) for index, successors in edges.items()}
+        for index, node in enumerate(sim.nodes):
+            node.node_type = module.topology_node_type(shape, index)
+        for index, successors in sorted(edges.items()):
+            for dst in successors:
+                forward, backward = sim.connect(index, dst)
+                sim.nodes[index].clientSockets.append(forward)
+                sim.nodes[dst].inboundSockets.append(backward)
+        if algorithm == "floodmax":
+            # the same round count / in-degree main() takes from the topology file
+            rounds = module.topology_diameter(shape)
+            for node in sim.nodes:
+                node.flood_rounds = rounds
+                node.flood_in_degree = len(node.inboundSockets)
+        for node in sim.nodes:
+            node.algorithm = algorithm
+            node.suppression = suppression
+            for link in node.inboundSockets:
+                node.hs_link_added(link)  # HS: the simulated links need no handshake to join the ring
+
+    if initiators == "all":
+        starters = list(range(count))
+    elif initiators == "one":
+        starters = [0]
+    else:
+        starters = sim.rng.sample(range(count), min(int(initiators), count))  # a topology file may have fewer nodes
+    for index in starters:
+        sim.schedule(0.0, sim.nodes[index].trigger, ())
+    return max(ids), len(starters)
+
+
+# default event limit: 200 per node, FloodMax sends one message per link per round
+def default_max_events(sim):
+    count = len(sim.nodes)
+    if sim.nodes and getattr(sim.nodes[0], "algorithm", "cr") == "floodmax":  # task1 nodes have no algorithm
+        links = sum(len(node.clientSockets) for node in sim.nodes)
+        return max(200 * count, links * (sim.nodes[0].flood_rounds + 1)) + 1000
+    return 200 * count + 1000
+
+
+def simulate(variant, count, order="random", initiators="one", latency="const:1", drop=0.0,
+             link_spread=0.0, seed=None, max_events=None, algorithm="cr", topology="double", suppression=True):
+    sim = Simulator(parse_latency(latency), drop, link_spread, seed)
+    started = time.perf_counter()
+    expected_leader, starters = build(variant, count, order, initiators, sim, algorithm, topology, suppression)
+    built = time.perf_counter()
+    processed = sim.run(max_events or default_max_events(sim))
+    count = len(sim.nodes)  # a topology file decides the number of nodes
+    finished = time.perf_counter()
+
+    leaders = {leader for _, leader in sim.leader_known_at.values()}
+    known = len(sim.leader_known_at)
+    return {
+        "variant": variant,
+        "algorithm": algorithm if variant == "task2" else "cr",
+        "topology": topology if variant == "task2" else "ring",
+        "nodes": count,
+        "order": order,
+        "initiators": starters,
+        "latency": latency,
+        "drop": drop,
+        "suppression": suppression if variant == "task2" else False,
+        "messages": sim.sent,
+        "candidate_messages": sim.sent_by_flag.get(0, 0),
+        "announcement_messages": sim.sent_by_flag.get(1, 0),
+        "messages_per_node": sim.sent / count,
+        "dropped": sim.dropped,
+        "send_errors": sim.send_errors,
+        "events": processed,
+        "unfinished_events": len(sim.events),
+        "nodes_knowing_leader": known,
+        "completed": known == count and leaders == {expected_leader},
+        "correct_leader": leaders <= {expected_leader},
+        # with const:1 latency one time unit is one hop, so this is the number of rounds
+        "virtual_time": max((t for t, _ in sim.leader_known_at.values()), default=None),
+        "build_seconds": built - started,
+        "run_seconds": finished - built,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="discrete-event simulation of the ring leader election")
+    parser.add_argument("--variant", choices=["task1", "task2"], default="task1")
+    parser.add_argument("--algorithm", choices=["cr", "hs", "floodmax"], default="cr", help="task2 only")
+    parser.add_argument("--topology", default="double",
+                        help="task2 only: double, ring, grid, random or the path of a topology file")
+    parser.add_argument("--nodes", type=int, nargs="+", default=[10000])
+    parser.add_argument("--order", choices=["random", "ascending", "descending"], default="random")
+    parser.add_argument("--initiators", default="one", help="one, all, or a number of random initiators")
+    parser.add_argument("--latency", default="const:1", help="const:D, uniform:LOW,HIGH or exp:MEAN")
+    parser.add_argument("--link-spread", type=float, default=0.0,
+                        help="per-link latency factor drawn from [1-s, 1+s] once per link")
+    parser.add_argument("--drop", type=float, default=0.0, help="probability that a message is lost")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--max-events", type=int, help="stop after this many events (default 200 per node, more for floodmax)")
+    parser.add_argument("--no-suppression", action="store_true",
+                        help="task2 cr: forward every candidate (no dominated / duplicate filtering)")
+    parser.add_argument("--json", help="append results to this file (one json object per line)")
+    args = parser.parse_args()
+    if args.initiators not in ("one", "all"):
+        if not args.initiators.isdigit() or int(args.initiators) < 1:
+            parser.error(f"--initiators must be one, all or a positive number, not {args.initiators!r}")
+        if int(args.initiators) > min(args.nodes):
+            parser.error(f"--initiators {args.initiators} is more than --nodes {min(args.nodes)}")
+
+    for count in args.nodes:
+        result = simulate(args.variant, count, args.order, args.initiators, args.latency, args.drop,
+                          args.link_spread, args.seed, args.max_events, args.algorithm, args.topology,
+                          not args.no_suppression)
+        print(f"{result['variant']} {result['algorithm']} {result['topology']} n={result['nodes']} order={result['order']} initiators={result['initiators']} "
+              f"messages={result['messages']} ({result['messages_per_node']:.2f}/node, "
+              f"announce={result['announcement_messages']}) "
+              f"time={result['virtual_time']} completed={result['completed']} "
+              f"dropped={result['dropped']} run={result['run_seconds']:.2f}s"
+              + (" (event limit reached, see --max-events)" if result["unfinished_events"] else ""))
+        if args.json:
+            with open(args.json, "a") as out:
+                out.write(json.dumps(result) + "\n")
+
+
+if __name__ == "__main__":
+    main()
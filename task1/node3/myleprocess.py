@@ -9,10 +9,12 @@
 
 import threading
 import time
+import random
 import uuid
 from socket import *
 import json
 import logging
+import argparse
 
 # Function to log messages received and sent
 '''
@@ -60,6 +62,56 @@ class Message:
         return Message(received_uuid, msgDict['flag'])
 
 
+# reads newline separated json messages from a stream connection
+# - data is received with recv_into() straight into one preallocated buffer that is reused for every read
+# - an incomplete message at the end of a read stays in the buffer until the rest arrives
+#   (a message split across recv() calls / TCP segments is not lost or corrupted)
+# - every read returns all complete messages it contains as one batch
+class FrameReader:
+    def __init__(self, size=65536):
+        self.buffer = bytearray(size)
+        self.view   = memoryview(self.buffer)
+        self.start  = 0  # first byte not parsed yet
+        self.end    = 0  # end of the received data
+
+    # receives from a socket, returns the batch of complete messages (None once the peer closed the connection)
+    def recv_from(self, connectionSocket):
+        self.make_room()
+        received = connectionSocket.recv_into(self.view[self.end:])
+        if received == 0:
+            return None
+        self.end += received
+        return self.frames()
+
+    # moves a leftover partial message to the front, grows the buffer only if one message doesn't fit
+    def make_room(self):
+        if self.start == self.end:
+            self.start = self.end = 0
+        if self.end < len(self.buffer):
+            return
+        pending = self.end - self.start
+        self.buffer[:pending] = self.view[self.start:self.end]
+        self.start, self.end = 0, pending
+        if self.end == len(self.buffer):
+            self.view.release()  # a bytearray can't be resized while a memoryview of it exists
+            self.buffer.extend(bytes(len(self.buffer)))
+            self.view = memoryview(self.buffer)
+
+    # parses every complete line between start and end
+    def frames(self):
+        messages = []
+        offset = self.start
+        while True:
+            newline = self.buffer.find(b"\n", offset, self.end)
+            if newline == -1:
+                break  # line not complete yet
+            if newline > offset:
+                messages.append(Message.json_to_msg(bytes(self.view[offset:newline])))
+            offset = newline + 1
+        self.start = offset
+        return messages
+
+
 # function to read config.txt to retrieve (server & client) IP and PORT numbers
 def read_config_file():
     with open("config.txt", "r") as file:
@@ -74,6 +126,16 @@ def read_config_file():
         return server_ip, int(server_port), client_ip, int(client_port)
 
 
+# reconnect delays: capped exponential backoff with jitter - connects as soon as the peer is listening,
+# without all nodes retrying in lockstep when they are started at the same time
+CONNECT_BACKOFF_INITIAL = 0.05  # seconds
+CONNECT_BACKOFF_MAX     = 2.0
+
+def backoff_delay(attempt):
+    delay = min(CONNECT_BACKOFF_MAX, CONNECT_BACKOFF_INITIAL * 2 ** min(attempt, 16))
+    return random.uniform(delay / 2, delay)
+
+
 # Shared state class for client & server thread
 # Note. client is the initiator of the election process (first transmission) (transmitter)
 #       server is the receiver of the election process (first reception) (receiver & subseq comms transmitter)
@@ -87,6 +149,8 @@ class NodeState:
         # client needs to make first connection
         # server needs to send subsequent messages to that socket
         self.clientSocket = None  # client socket needs to be accessible to both functions since
+        self.ready = threading.Event()  # set once the connection to the next node is up
+        self.participating = False      # a candidate (ours or a larger one) went out from here
 
         #self.current_message = None  # initalize message variable to hold message object (of Message class)
 
@@ -106,17 +170,15 @@ class NodeState:
             connectionSocket, addr = serverSocket.accept() 
             #print("I just connected to: ", addr, connectionSocket)
 
+            reader = FrameReader()  # keeps partial messages between reads
             while True:
-                # receive message from incoming connection
-                sentence = connectionSocket.recv(1024).decode()
-                if not sentence:
-                    break  # no empty strings
-
-                # convert to message object - split by newline to handle stream of messages
-                for msg_str in sentence.strip().split('\n'):
-                    if msg_str:
-                        message = Message.json_to_msg(data=msg_str)
-                        self.leader_election_logic(message) # call leader election process
+                # receive the next batch of messages from incoming connection
+                messages = reader.recv_from(connectionSocket)
+                if messages is None:
+                    break  # connection closed
+
+                for message in messages:
+                    self.leader_election_logic(message) # call leader election process
             connectionSocket.close()
 
     # function that handles the leader election logic
@@ -142,6 +204,7 @@ class NodeState:
             elif self.local_node_uuid < message.received_uuid:
                 #print(f"(unmodified) Forwarding message along: {message.received_uuid}, with leader: {message.flag}")
                 log_message("Received", message, "greater", "Not Leader")
+                self.participating = True
                 self.send_node_message(message)     # send unmodified message
                 log_message("Sent", message, "", "")
 
@@ -150,6 +213,7 @@ class NodeState:
             else: # message.received_uuid < self.local_node_uuid:
                 log_message("Received", message, "less", "Not Leader")
                 self.leader_flag = False
+                self.participating = True
                 self.send_node_message(Message(received_uuid=self.local_node_uuid, flag=0))     # send updated message
                 log_message("Sent", Message(self.local_node_uuid, 0), "", "")
 
@@ -178,27 +242,26 @@ class NodeState:
 
         print("I am the Client---------- This is my ID:", self.local_node_uuid)
 
-        # identify socket to connect to
-        self.clientSocket = socket(AF_INET, SOCK_STREAM)
-
-        # wait a bit for server to come online
-        time.sleep(5)
-
         # establish connection with external server (external node)
-        # keep trying until successful
-        connectionEstablished = False
-        while not connectionEstablished:
+        # keep trying until successful - the peer may not be listening yet, back off between attempts
+        attempt = 0
+        while True:
             try:
-                self.clientSocket.connect((client_ip, client_port))
-                connectionEstablished = True
-            except ConnectionRefusedError:
-                print("Connection refused, retrying...")
-                time.sleep(1)  # Wait before retrying
+                self.clientSocket = create_connection((client_ip, client_port))
+                break
+            except OSError:
+                delay = backoff_delay(attempt)
+                print(f"Connection refused, retrying in {delay:.2f}s...")
+                time.sleep(delay)  # Wait before retrying
+                attempt += 1
         # process blocked until connection made...
+        print(f"Connected to {client_ip}:{client_port}")
+        self.ready.set()
 
     # sends out first message to trigger election process
     def trigger_election(self):
         # Initalize first message in chain of election process (start of node chain)
+        self.participating = True
         message = Message(received_uuid=self.local_node_uuid, flag=0)
 
         # call helper function to send message
@@ -207,6 +270,18 @@ class NodeState:
         # log first message sent
         log_message("Sent", message, "", "")
 
+    # --auto-elect: start the election without [Enter], after a delay that is shorter the larger our uuid is
+    # (plus a little jitter), so the node with the largest uuid usually goes first and the others have forwarded its
+    # candidate by the time their turn comes - they don't start, their candidates could only cost messages
+    def auto_trigger_election(self, window):
+        rank = self.local_node_uuid.int / (1 << 128)
+        time.sleep(window * (1 - rank) + random.uniform(0, window * 0.05))
+        if self.participating or self.leader_uuid is not None:
+            print("Election already running, not starting it")
+            return
+        print("Starting the election (--auto-elect)")
+        self.trigger_election()
+
     # Helper function to send messages
     # Initalize first message in chain of election process (start of node chain)
     # Send subsequent messages in chain of election process
@@ -221,6 +296,15 @@ class NodeState:
 
 def main():
 
+    # optional arguments - nodes normally run without any
+    parser = argparse.ArgumentParser(description='Start the node process')
+    parser.add_argument('node_number', nargs='?', help='Node number (optional, only printed)')
+    parser.add_argument('--uuid', type=uuid.UUID, help='use this UUID instead of a random one (benchmarks)')
+    parser.add_argument('--auto-elect', type=float, nargs='?', const=0.5, metavar='SECONDS',
+                        help='no [Enter]: start the election within SECONDS of being ready (default 0.5), '
+                             'unless a candidate already came through')
+    args = parser.parse_args()
+
     # rewrite new log.txt file on each process run
     logging.basicConfig(filename='log3.txt', level=logging.INFO, filemode='w')
 
@@ -232,6 +316,10 @@ def main():
     print(f"Client IP: {client_ip}, Client Port: {client_port}") # this is external node
 
     sharedState = NodeState()
+    if args.uuid:
+        sharedState.local_node_uuid = args.uuid
+    if args.node_number:
+        print(f"Node {args.node_number}")
 
     # Start server and client threads for Node 1, Node 2, and Node 3
     server_thread = threading.Thread(target=sharedState.server, args=(server_ip, server_port))
@@ -241,9 +329,15 @@ def main():
     server_thread.start()
     client_thread.start()
 
+    # the election can only start once the next node is reachable
+    sharedState.ready.wait()
+
     # Wait for user input to trigger the election (only on the initiator node)
-    input("Press [Enter] to initiate the leader election on this node...")
-    sharedState.trigger_election()
+    if args.auto_elect is not None:
+        sharedState.auto_trigger_election(args.auto_elect)
+    else:
+        input("Press [Enter] to initiate the leader election on this node...")
+        sharedState.trigger_election()
 
     # Wait for all threads to finish
     server_thread.join()
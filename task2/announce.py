@@ -0,0 +1,130 @@
+# UDP fast path for the leader announcement of myleprocess.py (--announce ADDR:PORT, cr only)
+# the ring announcement (flag=1) takes one hop per node, a datagram to the whole group takes one
+#
+#   ANNOUNCE  leader -> group    "u is the leader of epoch e"
+#   ACK       node   -> leader   unicast, to the address the announcement came from
+#   ROLL      leader -> group    the uuids that acked, sent --announce-timeout after the announcement
+# After the roll every node sends the ring announcement only to its successors that did not ack, so nodes that
+# missed the datagram still learn the leader the old way. Nothing is sent on the ring when every node acked.
+#
+# Every datagram is signed: HMAC-SHA256 (truncated to 16 bytes) with a key derived from the shared
+# --announce-key and the epoch, so a datagram can't be replayed into another epoch or forged without the key.
+# Clusters sharing a group / port need different keys (launcher.py picks a random one per run).
+#
+# ADDR is a multicast group (e.g. 239.255.77.77, joined on the node's listen address) or a broadcast address
+# (e.g. 127.255.255.255 on localhost, 255.255.255.255 on the local segment).
+
+import functools
+import hashlib
+import hmac
+import ipaddress
+import select
+import socket
+import struct
+import threading
+import uuid
+
+ANNOUNCE = 1
+ACK      = 2
+ROLL     = 3
+DATAGRAM_KIND_NAMES = {ANNOUNCE: "announce", ACK: "ack", ROLL: "roll"}
+
+# magic, version, kind, epoch, sender uuid, number of uuids that follow (ROLL)
+DATAGRAM_HEADER = struct.Struct('!4sBBQ16sH')
+DATAGRAM_MAGIC   = b'MYLA'
+DATAGRAM_VERSION = 1
+MAC_SIZE = 16
+MAX_ROLL = (65507 - DATAGRAM_HEADER.size - MAC_SIZE) // 16  # uuids that fit in one datagram, the rest use the ring
+
+
+@functools.lru_cache(maxsize=16)  # every datagram of an epoch is signed with the same key
+def epoch_key(key, epoch):
+    return hmac.new(key, b'epoch' + struct.pack('!Q', epoch), hashlib.sha256).digest()
+
+def sign(key, epoch, body):
+    return hmac.new(epoch_key(key, epoch), body, hashlib.sha256).digest()[:MAC_SIZE]
+
+
+def pack_datagram(key, kind, epoch, node_uuid, uuids=()):
+    uuids = list(uuids)[:MAX_ROLL]
+    body = (DATAGRAM_HEADER.pack(DATAGRAM_MAGIC, DATAGRAM_VERSION, kind, epoch, node_uuid.bytes, len(uuids))
+            + b''.join(member.bytes for member in uuids))
+    return body + sign(key, epoch, body)
+
+# (kind, epoch, sender uuid, [uuids]), or None for anything that is not a datagram signed with key
+def unpack_datagram(key, data):
+    if len(data) < DATAGRAM_HEADER.size + MAC_SIZE:
+        return None
+    body, mac = data[:-MAC_SIZE], data[-MAC_SIZE:]
+    magic, version, kind, epoch, raw_uuid, count = DATAGRAM_HEADER.unpack_from(body)
+    if magic != DATAGRAM_MAGIC or version != DATAGRAM_VERSION or len(body) != DATAGRAM_HEADER.size + 16 * count:
+        return None
+    if not hmac.compare_digest(mac, sign(key, epoch, body)):
+        return None
+    uuids = [uuid.UUID(bytes=body[offset:offset + 16]) for offset in range(DATAGRAM_HEADER.size, len(body), 16)]
+    return kind, epoch, uuid.UUID(bytes=raw_uuid), uuids
+
+
+# the two sockets of a node: listener (bound to the group port, gets ANNOUNCE / ROLL)
+# and sender (own port, sends everything and gets the ACKs for our announcements)
+class Announcer:
+    def __init__(self, group, port, key, interface='0.0.0.0'):
+        self.group = (group, port)
+        self.key = key
+        interface = interface or '0.0.0.0'
+
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if hasattr(socket, 'SO_REUSEPORT'):
+            self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)  # every node on the host gets a copy
+        self.listener.bind(('', port))
+
+        self.sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        if ipaddress.ip_address(group).is_multicast:
+            membership = struct.pack('4s4s', socket.inet_aton(group), socket.inet_aton(interface))
+            self.listener.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, membership)
+            self.sender.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF, socket.inet_aton(interface))
+            self.sender.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1)
+            self.sender.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 1)  # local segment only
+        else:
+            self.sender.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        self.sender.bind((interface, 0))
+        self.sockets = (self.listener, self.sender)
+
+    # to the group, or to address (ACK); returns the size of the datagram
+    def send(self, kind, epoch, node_uuid, uuids=(), address=None):
+        data = pack_datagram(self.key, kind, epoch, node_uuid, uuids)
+        self.sender.sendto(data, address or self.group)
+        return len(data)
+
+    # one datagram from sock -> (parsed datagram or None, sender address)
+    def receive(self, sock):
+        data, address = sock.recvfrom(65535)
+        return unpack_datagram(self.key, data), address
+
+    # threaded engine: a daemon thread passes every signed datagram to handler(datagram, address)
+    def serve(self, handler):
+        def run():
+            while True:
+                readable, _, _ = select.select(self.sockets, [], [])
+                for sock in readable:
+                    try:
+                        datagram, address = self.receive(sock)
+                    except OSError:
+                        continue
+                    if datagram is not None:
+                        handler(datagram, address)
+        threading.Thread(target=run, daemon=True).start()
+
+    # asyncio engine: the same, as readers on the event loop
+    def attach(self, loop, handler):
+        def readable(sock):
+            try:
+                datagram, address = self.receive(sock)
+            except OSError:
+                return
+            if datagram is not None:
+                handler(datagram, address)
+        for sock in self.sockets:
+            sock.setblocking(False)
+            loop.add_reader(sock, readable, sock)
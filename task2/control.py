@@ -0,0 +1,62 @@
+# Control socket for myleprocess.py (--control-port / --control-socket), used by launcher.py
+# one command per line, one json reply per line:
+#   status   {"node", "uuid", "ready", "peers", "leader", "epoch", "algorithm"} - leader is null until it is known
+#   elect    starts an election on this node, like pressing [Enter]
+#   quit     the node writes its remaining log lines and exits
+#
+#   printf 'status\nelect\n' | nc 127.0.0.1 7701
+#   printf 'status\n' | nc -U /tmp/node1.ctl
+
+import json
+import os
+import socketserver
+import threading
+
+
+class ControlHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        node = self.server.node
+        for line in self.rfile:
+            command = line.decode(errors="replace").strip().lower()
+            if not command:
+                continue
+            if command == "status":
+                self.reply(node.control_status())
+            elif command == "elect":
+                node.run_soon(node.manual_trigger_election)
+                self.reply({"ok": True})
+            elif command == "quit":
+                self.reply({"ok": True})
+                node.shutdown()
+                return
+            else:
+                self.reply({"error": f"unknown command {command!r} (status, elect, quit)"})
+
+    def reply(self, data):
+        self.wfile.write((json.dumps(data) + "\n").encode())
+        self.wfile.flush()
+
+
+class ControlTCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class ControlUnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def start_server(server, node):
+    server.node = node
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+# TCP on host:port (port 0 picks a free port, see server.server_address)
+def serve_control_tcp(node, host, port):
+    return start_server(ControlTCPServer((host, port), ControlHandler), node)
+
+# Unix socket at path (a stale socket file from an earlier run is replaced)
+def serve_control_unix(node, path):
+    if os.path.exists(path):
+        os.remove(path)
+    return start_server(ControlUnixServer(path, ControlHandler), node)
@@ -0,0 +1,273 @@
+# Starts a whole cluster of myleprocess.py nodes with one command, runs an election and tears everything down
+#
+#   1. spawns one node per entry of a topology file (or a generated double ring of --nodes N)
+#      with --no-prompt and a control socket (control.py) in the work directory
+#   2. waits until every node reports ready (its outgoing connections are done)
+#   3. sends "elect" to the initiators, waits until every node knows the leader and checks they agree
+#      (--initiators none: the nodes start it themselves, with --auto-elect unless given after --)
+#   4. sends "quit" to every node, kills the ones that don't exit, and collects the exit codes
+# The node logs (node_<N>_log.txt, stdout in node_<N>.out) stay in the work directory.
+# With --hosts K the nodes run in K processes instead of one each (myleprocess.py --ids, links inside a process skip TCP),
+# the control socket / output / log of a process are then named after its first node (node_host_<N>...).
+#
+# usage: python3 launcher.py --topology topology.txt
+#        python3 launcher.py --nodes 50 --engine asyncio --initiators all --json result.json
+#        python3 launcher.py --nodes 200 --hosts 1 --initiators all
+#        python3 launcher.py --nodes 10 -- --trace --log-level leader     (arguments after -- go to every node)
+#        python3 launcher.py --nodes 20 -- --announce 239.255.77.77:5099   (a random --announce-key per run)
+#        python3 launcher.py --nodes 20 --initiators none  (time to leader from cold start)
+
+import argparse
+import json
+import os
+import secrets
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from myleprocess import format_ids, read_topology_file
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "myleprocess.py")
+POLL_INTERVAL = 0.02  # seconds between status rounds
+
+
+# topology file for the task2 double ring generalised to count nodes:
+# x = 1 -> (branch A, branch B) -> y = count -> x
+def write_double_ring(filename, count, base_port, host="127.0.0.1"):
+    if count < 4:
+        raise ValueError("the double ring needs at least 4 nodes")
+    split = 2 + (count - 2) // 2  # first node of branch B
+    successors = {1: [2, split], count: [1]}
+    for first, last in [(2, split - 1), (split, count - 1)]:
+        for node in range(first, last):
+            successors[node] = [node + 1]
+        successors[last] = [count]
+    with open(filename, "w") as topology:
+        topology.write(f"# double ring of {count} nodes (written by launcher.py)\n")
+        for node in range(1, count + 1):
+            topology.write(f"{node},{host},{base_port + node},{' '.join(map(str, successors[node]))}\n")
+
+
+# one control connection to a node (control.py), one json reply per command
+class ControlClient:
+    def __init__(self, path):
+        self.path = path
+        self.sock = None
+        self.file = None
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(self.path)
+        except OSError:
+            sock.close()
+            return False
+        self.sock, self.file = sock, sock.makefile("rb")
+        return True
+
+    def command(self, command):
+        if self.sock is None and not self.connect():
+            return None
+        try:
+            self.sock.sendall((command + "\n").encode())
+            line = self.file.readline()
+        except OSError:
+            line = b""
+        if not line:
+            self.close()
+            return None
+        return json.loads(line)
+
+    def close(self):
+        if self.sock is not None:
+            self.file.close()
+            self.sock.close()
+        self.sock = self.file = None
+
+
+# resident memory of a process in MB (0 once it is gone)
+def rss_mb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+# node ids split into count processes of (almost) the same size, in id order
+def split_hosts(ids, count):
+    size, extra = divmod(len(ids), count)
+    groups, start = [], 0
+    for index in range(count):
+        end = start + size + (index < extra)
+        groups.append(ids[start:end])
+        start = end
+    return [group for group in groups if group]
+
+
+# polls every node with status until check(status) holds for all of them, returns the last statuses
+def wait_for(processes, clients, check, deadline, what):
+    statuses = {}
+    while True:
+        for node, client in clients.items():
+            if node in statuses and check(statuses[node]):
+                continue
+            if processes[node].poll() is not None:
+                raise RuntimeError(f"node {node} exited with code {processes[node].returncode} while waiting for {what}")
+            status = client.command("status")
+            if status is not None:
+                statuses[node] = status
+        if len(statuses) == len(clients) and all(check(status) for status in statuses.values()):
+            return statuses
+        if time.monotonic() > deadline:
+            missing = sorted(node for node in clients if node not in statuses or not check(statuses[node]))
+            raise RuntimeError(f"timed out waiting for {what} on nodes {missing[:20]}")
+        time.sleep(POLL_INTERVAL)
+
+
+def stop_nodes(processes, clients, grace):
+    for client in clients.values():
+        client.command("quit")
+        client.close()
+    deadline = time.monotonic() + grace
+    for process in processes.values():
+        try:
+            process.wait(max(0.0, deadline - time.monotonic()))
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+    return {node: process.returncode for node, process in processes.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="start a cluster of task2 nodes, run one election and stop them")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--topology", help="topology file with every node (see topology.txt)")
+    source.add_argument("--nodes", type=int, help="generate a double ring topology of this many nodes")
+    parser.add_argument("--base-port", type=int, default=7000, help="--nodes: node i listens on base port + i")
+    parser.add_argument("--algorithm", choices=["cr", "hs", "floodmax"], default="cr")
+    parser.add_argument("--engine", choices=["threads", "asyncio"], default="threads")
+    parser.add_argument("--initiators", default="1",
+                        help="comma separated node ids that start the election, all, or none (the nodes run with "
+                             "--auto-elect, added unless given after --) (default: 1)")
+    parser.add_argument("--hosts", type=int, default=0,
+                        help="run the nodes in this many processes (default 0: one process per node)")
+    parser.add_argument("--timeout", type=float, default=60.0, help="seconds for startup and for the election")
+    parser.add_argument("--workdir", help="directory for the logs and control sockets (default: a new temporary one)")
+    parser.add_argument("--json", help="write the result to this file")
+    parser.add_argument("node_args", nargs=argparse.REMAINDER, help="after --: extra arguments for every node")
+    args = parser.parse_args()
+
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix="myle-"))
+    os.makedirs(workdir, exist_ok=True)
+    topology_file = args.topology and os.path.abspath(args.topology)
+    if args.nodes is not None:
+        topology_file = os.path.join(workdir, "topology.txt")
+        try:
+            write_double_ring(topology_file, args.nodes, args.base_port)
+        except ValueError as error:
+            parser.error(str(error))
+    try:
+        topology = read_topology_file(topology_file)
+    except (OSError, ValueError) as error:
+        parser.error(str(error))
+    if args.initiators in ("all", "none"):
+        initiators = sorted(topology) if args.initiators == "all" else []
+    else:
+        initiators = [int(node) for node in args.initiators.split(",")]
+    unknown = [node for node in initiators if node not in topology]
+    if unknown:
+        parser.error(f"initiators {unknown} are not in the topology")
+    node_args = args.node_args[1:] if args.node_args[:1] == ["--"] else args.node_args
+    if args.initiators == "none" and "--auto-elect" not in node_args:
+        node_args += ["--auto-elect"]  # nobody gets elect, the nodes start it themselves
+    if "--announce" in node_args and "--announce-key" not in node_args:
+        node_args += ["--announce-key", secrets.token_hex(16)]  # don't take announcements from another cluster
+    print(f"{len(topology)} nodes, work directory {workdir}")
+
+    # process name -> the command line arguments that select its node(s)
+    if args.hosts > 0:
+        groups = split_hosts(sorted(topology), args.hosts)
+        launches = {}
+        for group in groups:
+            group_initiators = [node for node in initiators if node in group]
+            launches[f"host_{group[0]}"] = ["--ids", format_ids(group), "--engine", "asyncio"] + (
+                ["--initiators", format_ids(group_initiators)] if group_initiators else [])
+        electing = [f"host_{group[0]}" for group in groups if set(group) & set(initiators)]
+    else:
+        launches = {node: ["--id", str(node), "--engine", args.engine] for node in topology}
+        electing = initiators
+
+    result = {"nodes": len(topology), "processes": len(launches), "algorithm": args.algorithm,
+              "engine": "asyncio" if args.hosts > 0 else args.engine, "workdir": workdir}
+    processes, clients = {}, {}
+    started = time.monotonic()
+    try:
+        for name, selection in launches.items():
+            control_path = os.path.join(workdir, f"node_{name}.sock")
+            with open(os.path.join(workdir, f"node_{name}.out"), "w") as out:
+                processes[name] = subprocess.Popen(
+                    [sys.executable, SCRIPT, "--topology", topology_file, "--no-prompt",
+                     "--control-socket", control_path, "--console", "none", "--algorithm", args.algorithm]
+                    + selection + node_args,
+                    cwd=workdir, stdin=subprocess.DEVNULL, stdout=out, stderr=subprocess.STDOUT)
+            clients[name] = ControlClient(control_path)
+
+        wait_for(processes, clients, lambda status: status["ready"], started + args.timeout, "ready")
+        ready = time.monotonic()
+        result["startup_seconds"] = ready - started
+        print(f"ready after {result['startup_seconds']:.2f} s")
+
+        for name in electing:
+            clients[name].command("elect")
+        # (-- --groups G: until every node knows the leaders of all G groups)
+        statuses = wait_for(processes, clients, lambda status: status["leader"] is not None
+                            and status.get("groups_elected", 1) >= status.get("groups", 1), ready + args.timeout, "the leader")
+        elected = time.monotonic()
+        # a host process reports the leaders of its nodes comma separated if they disagree
+        leaders = set().union(*(status["leader"].split(",") for status in statuses.values()))
+        digests = set().union(*(status["groups_digest"].split(",") for status in statuses.values() if "groups_digest" in status))
+        result["election_seconds"] = elected - ready
+        result["cold_start_seconds"] = elected - started  # first process started -> every node knows the leader
+        result["agreed"] = len(leaders) == 1 and len(digests) <= 1
+        result["leader"] = leaders.pop() if result["agreed"] else sorted(leaders)
+        uuids = {}
+        for name, status in statuses.items():
+            uuids.update(status["nodes"] if "nodes" in status else {status["node"]: status["uuid"]})
+        winner = [int(node) for node, node_uuid in uuids.items() if node_uuid == result["leader"]]
+        result["leader_node"] = winner[0] if winner else None
+        result["messages"] = sum(status["sent"] for status in statuses.values())
+        result["auto_started"] = sum(status.get("auto_started", 0) for status in statuses.values())  # --auto-elect
+        result["messages_per_second"] = result["messages"] / result["election_seconds"]
+        result["rss_mb"] = sum(rss_mb(process.pid) for process in processes.values())
+        print(f"leader {result['leader']} (node {result['leader_node']}) known on every node "
+              f"after {result['election_seconds'] * 1000:.1f} ms ({result['cold_start_seconds']:.2f} s from cold start)"
+              if result["agreed"]
+              else f"nodes disagree on the leader: {result['leader']}")
+        print(f"{result['messages']} messages ({result['messages_per_second']:.0f}/s), "
+              f"{len(processes)} processes using {result['rss_mb']:.1f} MB"
+              + (f", {result['auto_started']} node(s) started the election themselves" if result["auto_started"] else ""))
+    except RuntimeError as error:
+        result["error"] = str(error)
+        print(f"error: {error}")
+    finally:
+        stopping = time.monotonic()
+        result["exit_codes"] = stop_nodes(processes, clients, grace=5.0)
+        result["teardown_seconds"] = time.monotonic() - stopping
+
+    failed = {node: code for node, code in result["exit_codes"].items() if code != 0}
+    print(f"stopped {len(processes)} processes in {result['teardown_seconds']:.2f} s"
+          + (f", non-zero exit codes: {failed}" if failed else ""))
+    if args.json:
+        with open(args.json, "w") as out:
+            json.dump(result, out, indent=2)
+    sys.exit(0 if result.get("agreed") and not failed else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+# Per-node metrics for myleprocess.py: counters and latency histograms
+# served in the Prometheus text format, over a local HTTP endpoint (--metrics-port) or a Unix socket (--metrics-socket)
+#
+#   curl http://127.0.0.1:9101/metrics
+#   curl --unix-socket /tmp/node1.sock http://localhost/metrics
+
+import bisect
+import os
+import socketserver
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# histogram buckets (seconds)
+HOP_BUCKETS    = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.1)
+LEADER_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# name -> (type, help), in the order they are rendered
+METRICS = {
+    'myle_messages_received_total': ('counter', 'Messages received, by message kind'),
+    'myle_messages_sent_total':     ('counter', 'Messages sent, by message kind'),
+    'myle_messages_ignored_total':  ('counter', 'Messages dropped on purpose (old epoch, leader known, dominated candidate, ...)'),
+    'myle_messages_dropped_total':  ('counter', 'Messages that could not be delivered, by reason'),
+    'myle_messages_coalesced_total':('counter', 'Queued cr candidates dropped for a larger one behind them (--queue-policy coalesce)'),
+    'myle_bytes_received_total':    ('counter', 'Bytes read from peer connections (handshakes included)'),
+    'myle_bytes_sent_total':        ('counter', 'Bytes of messages sent'),
+    'myle_datagrams_sent_total':    ('counter', 'Leader announcement datagrams sent (--announce), by kind'),
+    'myle_datagrams_received_total':('counter', 'Signed leader announcement datagrams received (--announce), by kind'),
+    'myle_connections_total':       ('counter', 'Outgoing peer connections made, by transport (tcp, unix, shm)'),
+    'myle_peer_failures_total':     ('counter', 'Outgoing peer links lost and re-connected around (--successors)'),
+    'myle_retries_total':           ('counter', 'Retries of leader_election_logic because no outgoing connection was up'),
+    'myle_hop_seconds':             ('histogram', 'Time to process one received message (handle_message)'),
+    'myle_time_to_leader_seconds':  ('histogram', 'Time from taking part in an election (trigger or first message) to knowing the leader'),
+}
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1  # bucket "le" bound is inclusive
+        self.sum += value
+        self.count += 1
+
+
+# counters are keyed by (name, labels), labels is a tuple of (label, value) pairs
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {'myle_hop_seconds': Histogram(HOP_BUCKETS),
+                           'myle_time_to_leader_seconds': Histogram(LEADER_BUCKETS)}
+        self.info = {}     # labels of myle_node_info (node number, uuid, algorithm, ...)
+        self.gauges = {}   # name -> (help, function returning the current value)
+
+    def count(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, value):
+        with self.lock:
+            self.histograms[name].observe(value)
+
+    # a value that is read when the metrics are rendered (e.g. the current epoch)
+    def gauge(self, name, help_text, function):
+        self.gauges[name] = (help_text, function)
+
+    def value(self, name, **labels):
+        with self.lock:
+            return self.counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    # sum of a counter over all its labels
+    def total(self, name):
+        with self.lock:
+            return sum(value for (counter, _), value in self.counters.items() if counter == name)
+
+    # Prometheus text exposition format (version 0.0.4)
+    def render(self):
+        lines = []
+        if self.info:
+            lines += ['# HELP myle_node_info Node identity', '# TYPE myle_node_info gauge',
+                      f'myle_node_info{format_labels(self.info.items())} 1']
+        for name, (help_text, function) in self.gauges.items():
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} gauge', f'{name} {function()}']
+        with self.lock:
+            for name, (kind, help_text) in METRICS.items():
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+                if kind == 'histogram':
+                    histogram = self.histograms[name]
+                    cumulative = 0
+                    for bound, bucket_count in zip(histogram.buckets + ('+Inf',), histogram.counts):
+                        cumulative += bucket_count
+                        lines.append(f'{name}_bucket{{le="{bound}"}} {cumulative}')
+                    lines += [f'{name}_sum {histogram.sum}', f'{name}_count {histogram.count}']
+                    continue
+                values = [(labels, value) for (counter, labels), value in self.counters.items() if counter == name]
+                for labels, value in sorted(values) or [((), 0)]:
+                    lines.append(f'{name}{format_labels(labels)} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+def format_labels(labels):
+    labels = list(labels)
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+    return '{' + ','.join(f'{label}="{value}"' for (label, _), value in zip(labels, escaped)) + '}'
+
+
+# GET /metrics (any path works) -> the current metrics
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = self.server.metrics.render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # keep the node's console for election output
+
+    # client_address is '' on a Unix socket
+    def address_string(self):
+        return str(self.client_address)
+
+
+class UnixMetricsServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def start_server(server, metrics):
+    server.metrics = metrics
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+# HTTP on host:port (port 0 picks a free port, see server.server_address)
+def serve_metrics_http(metrics, host, port):
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    return start_server(server, metrics)
+
+# HTTP over a Unix socket at path (a stale socket file from an earlier run is replaced)
+def serve_metrics_unix(metrics, path):
+    if os.path.exists(path):
+        os.remove(path)
+    return start_server(UnixMetricsServer(path, MetricsHandler), metrics)
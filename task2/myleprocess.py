@@ -9,28 +9,149 @@
 
 import threading
 import time
+import random
 import uuid
 from socket import *
 import json
 import logging
 import os
 import argparse
+import asyncio
+import struct
+import queue
+import atexit
+import sys
+import copy
+import contextlib
+import hashlib
+import ipaddress
+from collections import deque, OrderedDict
+from metrics import Metrics, serve_metrics_http, serve_metrics_unix
+from control import serve_control_tcp, serve_control_unix
+from announce import ACK, ANNOUNCE, DATAGRAM_KIND_NAMES, ROLL, Announcer
+from outbound import POLICIES, SEND_QUEUE, AsyncPeerSender, PeerSender, coalescing_key
+from scheduler import Scheduler
+from statefile import FSYNC_POLICIES, StateFile
+from transports import (HELLO_TIMEOUT, SOCKET_DIR, TRANSPORTS, accept_shm, connect_link, listen_unix, open_link,
+                        remove_socket_files, socket_path, start_shm_server)
+
+
+# how much is logged (--console / --log-level): nothing, only the leader decision, or every message
+LOG_VERBOSITY = {'none': 0, 'leader': 1, 'messages': 2}
+LOG_BATCH     = 512  # records the background writer formats and writes in one go at most
+CONSOLE_ONLY  = {"Waiting", "Raw", "Incoming"}  # receive-path progress lines, never in the log file
+
+
+# Background log writer (--log-writer queue, the default)
+# log_message is called inside self.lock and once per outgoing socket, so printing there makes every hop wait
+# for the terminal / disk. In queue mode log_message only puts a small record on a queue; this thread formats
+# the lines and writes them to the console and the log file in batches (one write + flush per batch).
+# --log-writer sync prints and logs on the caller's thread like before.
+class LogWriter:
+    def __init__(self):
+        self.mode          = 'sync'
+        self.console_level = LOG_VERBOSITY['messages']
+        self.file_level    = LOG_VERBOSITY['messages']
+        self.level         = LOG_VERBOSITY['messages']  # max of the two, records above it are not even queued
+        self.records       = queue.SimpleQueue()
+        self.log_file      = None
+        self.trace_file    = None  # node_<N>_trace.jsonl with --trace
+        self.trace_lock    = threading.Lock()
+        self.thread        = None
+
+    def start(self, log_filename, mode, console_level, file_level, trace_filename=None, append=False):
+        self.mode = mode
+        self.console_level = console_level
+        self.file_level = file_level
+        self.level = max(console_level, file_level)
+        file_mode = 'a' if append else 'w'
+        if trace_filename:
+            self.trace_file = open(trace_filename, file_mode)
+        if mode == 'sync':
+            logging.basicConfig(filename=log_filename, level=logging.INFO, filemode=file_mode)
+            return
+        self.log_file = open(log_filename, file_mode)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        atexit.register(self.stop)
+
+    # writes what is still queued (at exit)
+    def stop(self):
+        if self.thread and self.thread.is_alive():
+            self.records.put(None)
+            self.thread.join(timeout=5)
+
+    def run(self):
+        while True:
+            batch = [self.records.get()]  # wait for the first record, then take whatever else is queued
+            try:
+                while len(batch) < LOG_BATCH:
+                    batch.append(self.records.get_nowait())
+            except queue.Empty:
+                pass
+            self.write(batch)
+            if None in batch:
+                return
+
+    # one trace event (dict), written as a json line to the trace file
+    def trace(self, event):
+        if self.mode == 'queue':
+            self.records.put(event)
+            return
+        with self.trace_lock:
+            self.trace_file.write(json.dumps(event) + "\n")
+            self.trace_file.flush()
+
+    def write(self, batch):
+        console, lines, events = [], [], []
+        for record in batch:
+            if record is None:
+                continue
+            if isinstance(record, dict):
+                events.append(json.dumps(record) + "\n")
+                continue
+            level, text = format_log_message(*record)
+            if text is None:
+                continue
+            if level <= self.console_level:
+                console.append(text + "\n")
+            if level <= self.file_level and record[0] not in CONSOLE_ONLY:
+                lines.append(f"INFO:root:[{text}\n")  # same lines logging.basicConfig writes in sync mode
+        try:
+            if console:
+                sys.stdout.write("".join(console))
+                sys.stdout.flush()
+            if lines:
+                self.log_file.write("".join(lines))
+                self.log_file.flush()
+            if events:
+                self.trace_file.write("".join(events))
+                self.trace_file.flush()
+        except (OSError, ValueError):
+            pass  # stdout / log file closed while exiting
+
+log_writer = LogWriter()
 
 
 # This function sets up the log file for a particular node
-def setup_log_for_node(node_number):
+# trace=True also writes the causal trace events to node_<N>_trace.jsonl
+# (keep: --state-dir, a restarted node goes on with its log instead of starting a new one)
+def setup_log_for_node(node_number, mode='sync', console_level=LOG_VERBOSITY['messages'], file_level=LOG_VERBOSITY['messages'],
+                       trace=False, keep=False):
     log_filename = f'node_{node_number}_log.txt'
 
     # Delete the log file if it exists (clears the file)
-    if os.path.isfile(log_filename):
+    if os.path.isfile(log_filename) and not keep:
         os.remove(log_filename)
 
-    logging.basicConfig(filename=log_filename, level=logging.INFO, filemode='w')
+    log_writer.start(log_filename, mode, console_level, file_level, f'node_{node_number}_trace.jsonl' if trace else None,
+                     append=keep)
     
 
 # Function to log messages received and sent
 '''
 @param message_type: "Received" or "Sent"
+    # (or CONSOLE_ONLY: "Waiting", "Raw" with msg = the messages of one read, "Incoming" with leader_id = our uuid)
 @param msg: Message object
 @param comparison: "greater", "less", or "" (for leader messages)
     # message.uuid was greater/less than/equal to local uuid
@@ -38,40 +159,344 @@ def setup_log_for_node(node_number):
 @param leader_id: UUID of the elected leader (for leader messages)
 '''
 def log_message(message_type, msg, comparison, state, leader_id=None):
+    limit = log_writer.console_level if message_type in CONSOLE_ONLY else log_writer.level
+    if (LOG_VERBOSITY['leader'] if message_type == "Leader" else LOG_VERBOSITY['messages']) > limit:
+        return
+    if log_writer.mode == 'queue':
+        # messages are not changed after they are logged, so the record can keep a reference
+        log_writer.records.put((message_type, msg, comparison, state, leader_id))
+        return
+    level, text = format_log_message(message_type, msg, comparison, state, leader_id)
+    if text is None:
+        return
+    if level <= log_writer.console_level:
+        print(text)
+    if level <= log_writer.file_level and message_type not in CONSOLE_ONLY:
+        logging.info(f"[{text}")
+
+# (verbosity level, text) of a log line, text is None for message types that are not logged
+def format_log_message(message_type, msg, comparison, state, leader_id=None):
     if message_type == "Received":
-        print(f"Received: uuid={msg.received_uuid}, flag={msg.flag}, {comparison}, {state}")
-        logging.info(f"[Received: uuid={msg.received_uuid}, flag={msg.flag}, {comparison}, {state}")
+        return LOG_VERBOSITY['messages'], f"Received: uuid={msg.received_uuid}, flag={msg.flag}{hs_details(msg)}, {comparison}, {state}"
     elif message_type == "Sent":
-        print(f"Sent: uuid={msg.received_uuid}, flag={msg.flag}")
-        logging.info(f"[Sent: uuid={msg.received_uuid}, flag={msg.flag}")
+        return LOG_VERBOSITY['messages'], f"Sent: uuid={msg.received_uuid}, flag={msg.flag}{hs_details(msg)}"
     elif message_type == "Ignored":
-        print(f"Ignored: uuid={msg.received_uuid}")
-        logging.info(f"[Ignored: uuid={msg.received_uuid}")
+        return LOG_VERBOSITY['messages'], f"Ignored: uuid={msg.received_uuid}"
     elif message_type == "Leader":
-        print(f"Leader is decided to {leader_id}")
-        logging.info(f"[Leader is decided to {leader_id}")
+        return LOG_VERBOSITY['leader'], f"Leader is decided to {leader_id}"
+    elif message_type == "Waiting":
+        return LOG_VERBOSITY['messages'], "Waiting to receive data..."
+    elif message_type == "Raw":
+        return LOG_VERBOSITY['messages'], f"Raw received: {len(msg)} message(s)"
+    elif message_type == "Incoming":
+        return LOG_VERBOSITY['messages'], f"[Node {leader_id}] Received message: uuid={msg.received_uuid}, flag={msg.flag}"
+    return LOG_VERBOSITY['messages'], None
+
+
+# Hirschberg-Sinclair message kinds (Message.kind), plain ring messages have no kind
+HS_PROBE   = 1  # candidate travelling out, phase k goes up to 2^k hops
+HS_REPLY   = 2  # probe survived 2^k hops, travels back to the candidate
+HS_ELECTED = 3  # leader announcement, travels around the ring once
+FLOODMAX   = 4  # FloodMax: largest uuid seen so far, one message per neighbour per round
+HEARTBEAT  = 5  # leader is alive, sent by the leader every --heartbeat-interval and forwarded around the ring
+LEADER_QUERY = 6  # --state-dir: a restarted node asks its peers for the leader (uuid = the leader it knew, flag 0)
+LEADER_INFO  = 7  # the answer on the same link: flag 1 - uuid is the leader of epoch, flag 0 - no leader known yet
+HS_KIND_NAMES = {HS_PROBE: "probe", HS_REPLY: "reply", HS_ELECTED: "elected", FLOODMAX: "floodmax", HEARTBEAT: "heartbeat",
+                 LEADER_QUERY: "query", LEADER_INFO: "info"}
+
+# kind label of a message in the metrics (ring messages have no kind)
+def message_kind_name(msg):
+    return "cr" if msg.kind is None else HS_KIND_NAMES.get(msg.kind, str(msg.kind))
+
+# trace id as it appears in trace events (16 hex digits)
+def trace_text(trace):
+    return None if trace is None else f"{trace:016x}"
+
+# extra text for log lines of Hirschberg-Sinclair / FloodMax messages (and the election group / epoch)
+def hs_details(msg):
+    epoch = f", epoch={msg.epoch}" if getattr(msg, "epoch", None) else ""
+    if getattr(msg, "group", None):
+        epoch = f", group={msg.group}{epoch}"
+    if getattr(msg, "kind", None) is None:
+        return epoch
+    if msg.kind == FLOODMAX:
+        return f", floodmax round={msg.round}{epoch}"
+    if msg.kind == HEARTBEAT:
+        return f", heartbeat seq={msg.seq}{epoch}"
+    if msg.kind in (LEADER_QUERY, LEADER_INFO):
+        return f", {HS_KIND_NAMES[msg.kind]}{epoch}"
+    return f", {HS_KIND_NAMES.get(msg.kind, msg.kind)} phase={msg.phase} hops={msg.hops}{epoch}"
+
+
+# optional message fields - only put on the wire when set (not None)
+# name -> (binary tag, value format)
+MESSAGE_FIELDS = {
+    'kind':  (1, struct.Struct("!B")),
+    'phase': (2, struct.Struct("!B")),
+    'hops':  (3, struct.Struct("!I")),
+    'round': (4, struct.Struct("!I")),
+    'epoch': (5, struct.Struct("!I")),
+    'seq':   (6, struct.Struct("!I")),
+    'trace': (7, struct.Struct("!Q")),  # --trace: id of the election trace the message belongs to
+    'hop':   (8, struct.Struct("!I")),  # --trace: hops since the trace started (causal depth)
+    'clock': (9, struct.Struct("!Q")),  # --trace: sender's Lamport timestamp of this send
+    'group': (10, struct.Struct("!I")), # --groups: election group (shard) of a cr message, None = group 0
+}
+FIELD_TAGS = {tag: (name, fmt) for name, (tag, fmt) in MESSAGE_FIELDS.items()}
+
+
+# wire formats
+# json:   {"received_uuid": "<uuid text>", "flag": 0}\n   (original protocol, always understood)
+# binary: magic | version | flag | ext length | 16 byte raw uuid | ext
+#         ext is a list of (tag, length, value) fields reserved for later additions (epoch, group id, ...)
+#         receivers skip tags they don't know, so new fields don't need a new version
+BINARY_MAGIC   = 0xB1  # first byte of every binary frame (a json frame always starts with '{')
+BINARY_VERSION = 1
+BINARY_HEADER  = struct.Struct("!BBBB16s")
+BINARY_FIELD   = struct.Struct("!BB")
+# batch (--groups): magic | version | count | epoch | count x (group, flag, 16 byte raw uuid)
+#         the cr messages of many groups that go over the same link after one received batch, in one frame
+BATCH_MAGIC    = 0xB2
+BATCH_HEADER   = struct.Struct("!BBHI")
+BATCH_ENTRY    = struct.Struct("!IB16s")
+BATCH_MESSAGES = 2048  # messages per batch frame at most (~43 KB, fits the FrameReader buffer)
+WIRE_FORMATS   = ["binary", "json"]  # formats this node can receive, preferred first
+
+# greeting the server sends on every accepted connection, so the connecting node knows it may use binary
+# old peers never send it -> the connecting node keeps talking json to them
+# the connecting node answers a greeting with an ack (chosen format + its uuid): both sides then know the
+# other one is alive and the server uses the same format when it sends back over the connection (HS)
+HANDSHAKE_TIMEOUT = 0.5  # seconds to wait for the greeting before falling back to json
+HANDSHAKE_ACK_PREFIX = b'{"ack"'
+# cr: the accepting node writes this back before it closes a connection because it knows the leader, so the
+# connecting node (watch_link) can tell that close from a crash (--successors)
+LEADER_ACK = b'\n'
+# the greeting also carries the server's uuid and its own peers, so a node can skip over a dead peer (leader failover)
+def handshake_greeting(node_uuid=None, peers=()):
+    return (json.dumps({'hello': 'myleprocess', 'formats': WIRE_FORMATS, 'uuid': str(node_uuid),
+                        'peers': [list(peer) for peer in peers]}) + "\n").encode()
+
+# greeting line -> dict ({} if there was none or it is not valid)
+def parse_greeting(greeting):
+    try:
+        hello = json.loads(greeting)
+    except (ValueError, TypeError):
+        return {}
+    return hello if isinstance(hello, dict) else {}
+
+def handshake_ack(wire_format, node_uuid):
+    return (json.dumps({'ack': 'myleprocess', 'format': wire_format, 'uuid': str(node_uuid)}) + "\n").encode()
+
+# --announce: seconds the leader collects acks before the roll, nodes that get no roll fall back after twice that
+ANNOUNCE_TIMEOUT = 0.05
+
+# reconnect delays: capped exponential backoff with jitter - connects as soon as the peer is listening,
+# without all nodes retrying in lockstep when they are started at the same time
+CONNECT_BACKOFF_INITIAL = 0.05  # seconds
+CONNECT_BACKOFF_MAX     = 2.0
+# --auto-elect: default window (seconds) the nodes' own election starts are spread over, and the random part of a
+# ranked start as a fraction of the window
+AUTO_ELECT_WINDOW = 0.5
+AUTO_ELECT_JITTER = 0.05
+# --state-dir: seconds a restarted node waits for its peers to name the leader before it joins like a new node
+REJOIN_TIMEOUT = 0.5
+SUCCESSORS     = 3     # default --successors: successors known per peer, k - 1 dead nodes in a row are skipped
+REPAIR_TIMEOUT = 0.25  # seconds to reach a successor when re-connecting around a dead peer
+
+def backoff_delay(attempt):
+    delay = min(CONNECT_BACKOFF_MAX, CONNECT_BACKOFF_INITIAL * 2 ** min(attempt, 16))
+    return random.uniform(delay / 2, delay)
+
+# picks the wire format for an outgoing connection from the greeting the peer sent (or None if it sent nothing)
+def negotiate_format(greeting, preferred):
+    try:
+        offered = json.loads(greeting)['formats']
+    except (ValueError, TypeError, KeyError):
+        return "json"
+    return preferred if preferred in offered else "json"
 
 
 # message class to hold incoming message data
 class Message:
 
     # message thread is initalized with ID
-    def __init__(self, received_uuid=None, flag=0):
+    # kind / phase / hops / round are only used by the Hirschberg-Sinclair and FloodMax modes (see MESSAGE_FIELDS)
+    # epoch / seq are only set with --heartbeat-interval (re-elections and heartbeats)
+    # trace / hop / clock are only set with --trace (causal tracing)
+    # group is only set with --groups (one election per group over the same connections)
+    def __init__(self, received_uuid=None, flag=0, kind=None, phase=None, hops=None, round=None, epoch=None, seq=None,
+                 trace=None, hop=None, clock=None, group=None):
         super().__init__()
         self.received_uuid = received_uuid # received from sender (client)
         self.flag          = flag          # flag to indicate if leader elected
+        self.kind          = kind          # HS_PROBE / HS_REPLY / HS_ELECTED / FLOODMAX (None for ring messages)
+        self.phase         = phase         # HS phase k
+        self.hops          = hops          # HS hops travelled so far
+        self.round         = round         # FloodMax round
+        self.epoch         = epoch         # election epoch, None = 0 (first election)
+        self.seq           = seq           # heartbeat number within the epoch
+        self.trace         = trace         # election trace id
+        self.hop           = hop           # hops since the trace started
+        self.clock         = clock         # Lamport timestamp of the send
+        self.group         = group         # election group, None = 0
+
+    # optional fields that are set on this message
+    def optional_fields(self):
+        return {name: getattr(self, name) for name in MESSAGE_FIELDS if getattr(self, name) is not None}
 
     # function that converts message object -> json string
     def msg_to_json(self):
-        return json.dumps({'received_uuid': str(self.received_uuid), 'flag': self.flag}) + "\n"
+        return json.dumps({'received_uuid': str(self.received_uuid), 'flag': self.flag, **self.optional_fields()}) + "\n"
     
     # function that converts json string -> message object
     @staticmethod
     def json_to_msg(data):
         msgDict = json.loads(data)
         received_uuid = uuid.UUID(msgDict['received_uuid'])
+        fields = {name: msgDict[name] for name in MESSAGE_FIELDS if name in msgDict}
+
+        return Message(received_uuid, msgDict['flag'], **fields)
+
+    # function that converts message object -> binary frame
+    def msg_to_bytes(self):
+        ext = b"".join(BINARY_FIELD.pack(MESSAGE_FIELDS[name][0], MESSAGE_FIELDS[name][1].size) + MESSAGE_FIELDS[name][1].pack(value)
+                       for name, value in self.optional_fields().items())
+        return BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, self.flag, len(ext), self.received_uuid.bytes) + ext
+
+    # function that converts binary frame -> message object
+    # offset allows decoding straight out of a larger receive buffer without copying the frame first
+    @staticmethod
+    def bytes_to_msg(data, offset=0):
+        magic, version, flag, ext_len, raw_uuid = BINARY_HEADER.unpack_from(data, offset)
+        if magic != BINARY_MAGIC or version != BINARY_VERSION:
+            raise ValueError(f"unsupported binary frame (magic={magic:#x}, version={version})")
+        message = Message(uuid.UUID(bytes=raw_uuid), flag)
+
+        # optional fields, tags we don't know are skipped
+        offset += BINARY_HEADER.size
+        end = offset + ext_len
+        while offset < end:
+            tag, length = BINARY_FIELD.unpack_from(data, offset)
+            offset += BINARY_FIELD.size
+            if tag in FIELD_TAGS:
+                name, fmt = FIELD_TAGS[tag]
+                setattr(message, name, fmt.unpack_from(data, offset)[0])
+            offset += length
+        return message
+
+    # a plain cr message of any group can go into a batch frame (no HS / trace fields)
+    def batchable(self):
+        return self.kind is None and self.trace is None
+
+    # function that converts (group, flag, raw uuid) entries of one epoch -> batch frame
+    @staticmethod
+    def entries_to_batch(epoch, entries):
+        return BATCH_HEADER.pack(BATCH_MAGIC, BINARY_VERSION, len(entries), epoch) + b"".join(BATCH_ENTRY.pack(*entry) for entry in entries)
+
+    # function that converts a batch frame -> message objects (same offset handling as bytes_to_msg)
+    @staticmethod
+    def batch_to_msgs(data, offset=0):
+        magic, version, count, epoch = BATCH_HEADER.unpack_from(data, offset)
+        if version != BINARY_VERSION:
+            raise ValueError(f"unsupported batch frame (version={version})")
+        offset += BATCH_HEADER.size
+        messages = []
+        for _ in range(count):
+            group, flag, raw_uuid = BATCH_ENTRY.unpack_from(data, offset)
+            messages.append(Message(uuid.UUID(bytes=raw_uuid), flag, epoch=epoch or None, group=group or None))
+            offset += BATCH_ENTRY.size
+        return messages
 
-        return Message(received_uuid, msgDict['flag'])
+    # encode for the given wire format ("json" or "binary")
+    def encode(self, wire_format="json"):
+        if wire_format == "binary":
+            return self.msg_to_bytes()
+        return self.msg_to_json().encode()
+
+
+# reads frames (json lines and binary frames, even mixed) from a stream connection
+# - data is received with recv_into() straight into one preallocated buffer that is reused for every read
+# - an incomplete frame at the end of a read stays in the buffer until the rest arrives
+#   (a frame split across recv() calls / TCP segments is not lost or corrupted)
+# - every read returns all complete messages it contains as one batch
+class FrameReader:
+    def __init__(self, size=65536):
+        self.buffer = bytearray(size)
+        self.view   = memoryview(self.buffer)
+        self.start  = 0  # first byte not parsed yet
+        self.end    = 0  # end of the received data
+        self.handshake = None  # last handshake ack seen on this connection (dict), taken by the node
+        self.last_read = 0     # bytes received by the last recv_from() / feed()
+        self.acks = 0          # empty lines (LEADER_ACK) seen on this connection
+
+    # receives from a socket, returns the batch of complete messages (None once the peer closed the connection)
+    def recv_from(self, connectionSocket):
+        self.make_room()
+        received = connectionSocket.recv_into(self.view[self.end:])
+        self.last_read = received
+        if received == 0:
+            return None
+        self.end += received
+        return self.frames()
+
+    # same as recv_from() for data that was already read elsewhere (asyncio StreamReader)
+    def feed(self, data):
+        self.last_read = len(data)
+        self.make_room(len(data))
+        self.buffer[self.end:self.end + len(data)] = data
+        self.end += len(data)
+        return self.frames()
+
+    # moves a leftover partial frame to the front, grows the buffer only if one frame doesn't fit
+    def make_room(self, needed=1):
+        if self.start == self.end:
+            self.start = self.end = 0
+        if len(self.buffer) - self.end >= needed:
+            return
+        pending = self.end - self.start
+        self.buffer[:pending] = self.view[self.start:self.end]
+        self.start, self.end = 0, pending
+        if len(self.buffer) - self.end < needed:
+            self.view.release()  # a bytearray can't be resized while a memoryview of it exists
+            self.buffer.extend(bytes(max(needed, len(self.buffer))))
+            self.view = memoryview(self.buffer)
+
+    # parses every complete frame between start and end
+    def frames(self):
+        messages = []
+        buffer, offset, end = self.buffer, self.start, self.end
+        while offset < end:
+            if buffer[offset] == BINARY_MAGIC:
+                if end - offset < BINARY_HEADER.size:
+                    break  # header not complete yet
+                frame_len = BINARY_HEADER.size + buffer[offset + 3]
+                if end - offset < frame_len:
+                    break  # optional fields not complete yet
+                messages.append(Message.bytes_to_msg(buffer, offset))
+                offset += frame_len
+            elif buffer[offset] == BATCH_MAGIC:
+                if end - offset < BATCH_HEADER.size:
+                    break
+                frame_len = BATCH_HEADER.size + BATCH_ENTRY.size * int.from_bytes(buffer[offset + 2:offset + 4], "big")
+                if end - offset < frame_len:
+                    break  # messages not complete yet
+                messages.extend(Message.batch_to_msgs(buffer, offset))
+                offset += frame_len
+            else:
+                newline = buffer.find(b"\n", offset, end)
+                if newline == -1:
+                    break  # json line not complete yet
+                if newline > offset:
+                    line = bytes(self.view[offset:newline])
+                    if line.startswith(HANDSHAKE_ACK_PREFIX):
+                        self.handshake = json.loads(line)
+                    else:
+                        messages.append(Message.json_to_msg(line))
+                else:
+                    self.acks += 1
+                offset = newline + 1
+        self.start = offset
+        return messages
 
 
 # function to read config.txt to retrieve (server & client) IP and PORT numbers
@@ -96,6 +521,128 @@ def read_config_file(node_number):
         return server_ip, int(server_port), client_ip, int(client_port)
 
 
+# the config<N>.txt files of the current directory (config1.txt, config2.txt, ...) as a topology like read_topology_file,
+# so a node started from its config file knows its successors' successors too (peers without a config file are left out)
+def read_config_topology():
+    configs = {}
+    while os.path.exists(f"config{len(configs) + 1}.txt"):
+        values = read_config_file(len(configs) + 1)
+        configs[len(configs) + 1] = [(values[i], values[i + 1]) for i in range(0, len(values), 2)]
+    ids = {addresses[0]: node_id for node_id, addresses in configs.items()}
+    return {node_id: (*addresses[0], [ids[peer] for peer in addresses[1:] if peer in ids])
+            for node_id, addresses in configs.items()}
+
+
+# topology file - describes any network, one line per node:
+#   <id>,<listen ip>,<listen port>,<ids of the nodes it connects / sends to, separated by spaces>
+# '#' starts a comment. Links are directed like in the config files (list both directions for an undirected link);
+# every node has to be reachable from every other node.
+# returns {id: (ip, port, [neighbour ids])}
+def read_topology_file(filename):
+    topology = {}
+    with open(filename, "r") as file:
+        for line in file:
+            line = line.split("#")[0].strip()
+            if not line:
+                continue
+            node_id, ip, port, *neighbours = [part.strip() for part in line.split(",")]
+            topology[int(node_id)] = (ip, int(port), [int(n) for n in " ".join(neighbours).split()])
+
+    for node_id, (_, _, neighbours) in topology.items():
+        for neighbour in neighbours:
+            if neighbour not in topology:
+                raise ValueError(f"{filename}: node {node_id} lists unknown neighbour {neighbour}")
+    return topology
+
+# hop distances from start along the links (reverse=True follows them backwards)
+def topology_distances(topology, start, reverse=False):
+    links = {node_id: [] for node_id in topology}
+    for node_id, (_, _, neighbours) in topology.items():
+        for neighbour in neighbours:
+            if reverse:
+                links[neighbour].append(node_id)
+            else:
+                links[node_id].append(neighbour)
+    distances = {start: 0}
+    queue = deque([start])
+    while queue:
+        current = queue.popleft()
+        for neighbour in links[current]:
+            if neighbour not in distances:
+                distances[neighbour] = distances[current] + 1
+                queue.append(neighbour)
+    return distances
+
+# number of FloodMax rounds needed: the diameter (exact up to 2000 nodes,
+# above that the upper bound ecc_out(v) + ecc_in(v) from one node, to keep it linear)
+def topology_diameter(topology):
+    if len(topology) <= 2000:
+        starts, bound = list(topology), False
+    else:
+        starts, bound = [next(iter(topology))], True
+    diameter = 0
+    for start in starts:
+        outgoing = topology_distances(topology, start)
+        if len(outgoing) != len(topology):
+            raise ValueError(f"topology is not strongly connected (node {start} can't reach every node)")
+        if bound:
+            incoming = topology_distances(topology, start, reverse=True)
+            if len(incoming) != len(topology):
+                raise ValueError(f"topology is not strongly connected (not every node reaches {start})")
+            return max(outgoing.values()) + max(incoming.values())
+        diameter = max(diameter, max(outgoing.values()))
+    return diameter
+
+# (ip, port) -> successor addresses of every node that node_id may have to connect past: its peers and the nodes
+# up to k - 2 hops behind them (k = --successors, so k - 1 dead nodes in a row can be skipped)
+def topology_successors(topology, node_id, k):
+    successors, frontier = {}, [node_id]
+    for _ in range(k - 1):
+        next_frontier = []
+        for current in frontier:
+            for peer in topology[current][2]:
+                address = topology[peer][:2]
+                if peer != node_id and address not in successors:
+                    successors[address] = [topology[successor][:2] for successor in topology[peer][2]]
+                    next_frontier.append(peer)
+        frontier = next_frontier
+    return successors
+
+# number of links that end at node_id (= FloodMax messages per round)
+def topology_in_degree(topology, node_id):
+    return sum(neighbours.count(node_id) for _, _, neighbours in topology.values())
+
+# x / y / n role of a node, so ring topologies written as a topology file behave like the config files
+def topology_node_type(topology, node_id):
+    if len(topology[node_id][2]) > 1:
+        return 'x'
+    if topology_in_degree(topology, node_id) > 1:
+        return 'y'
+    return 'n'
+
+
+# duplicate filtering for Chang-Roberts candidates (NodeState.redundant_candidate)
+# on the double ring a candidate legitimately passes x, y and the nodes between x and its own position twice
+# (once per branch it comes back through), so each (uuid, flag, epoch) is forwarded at most twice
+MAX_FORWARDS    = 2
+RECENT_MESSAGES = 1024  # (uuid, flag, epoch) entries remembered, oldest forgotten first
+
+
+# Chang-Roberts state of one election group (--groups): every group elects its own leader over the same connections,
+# group 0 is the NodeState itself (same fields). Our candidate differs per group (derived from our uuid), so the
+# leaders of the groups are spread over the nodes instead of all being the node with the largest uuid.
+class GroupState:
+    def __init__(self, group, candidate):
+        self.group = group
+        self.candidate = candidate          # our uuid in this group
+        self.leader_uuid = None
+        self.leader_flag = False
+        self.seen_own_uuid_count = 0
+        self.sent_own_uuid = False
+        self.max_forwarded = None
+        self.recent_messages = OrderedDict()
+
+
 # Shared state class for client & server thread
 # Note. client is the initiator of the election process (first transmission) (transmitter)
 #       server is the receiver of the election process (first reception) (receiver & subseq comms transmitter)
@@ -107,6 +654,17 @@ class NodeState:
         self.leader_flag = False            # election flag
 
         self.seen_own_uuid_count = 0        # number of times we've seen our own UUID
+        self.sent_own_uuid = False          # our own uuid is already travelling (sent at most once per election)
+        self.suppression = True             # drop dominated / duplicate candidates instead of forwarding them
+        self.max_forwarded = None           # largest candidate we forwarded (or sent) in this election
+        self.recent_messages = OrderedDict()  # (uuid, flag, epoch) -> times forwarded, bounded by RECENT_MESSAGES
+        self.group = 0                      # the fields above are group 0's election (GroupState for the others)
+        self.group_count = 1                # --groups: elections run over the same connections
+        self.groups = {}                    # group -> GroupState, made on the group's first message
+        self.groups_elected = 0             # groups other than 0 that know their leader in this epoch
+        self.batching = False               # --groups: cr messages sent while handling one received batch share frames
+        self.batches = {}                   # link -> (epoch, [(group, flag, raw uuid)]) not sent yet (send_batch)
+        self.batch_context = threading.local()  # batch scopes (batched_sends) the current thread is in
         # this is important because in a double ring, the outer ring's UUID will return to itself
         # before the inner ring can send its own UUID up to the outer ring node. (hence a lower UUID can beat a higher UUID due to delay)
 
@@ -115,12 +673,90 @@ class NodeState:
         # server needs to send subsequent messages to that socket
         #self.clientSocket = None  # client socket needs to be accessible to both functions since
         self.clientSockets = []    # list of client sockets for multiple connections
+        self.socket_formats = {}   # client socket -> wire format agreed with that peer ("json" or "binary")
+        self.wire_format = "binary" # preferred wire format, used when the peer supports it
+        self.inboundSockets = []    # accepted connections (messages can travel back over them, used by HS)
+
+        self.node_type = 'n'           # x, y or n (decides the ring neighbours in HS mode)
+        self.algorithm = 'cr'          # cr: Chang-Roberts (leader_election_logic), hs: Hirschberg-Sinclair
+        self.hs_started = False        # HS: we are a candidate
+        self.hs_phase = 0              # HS: current phase, probes go 2^phase hops
+        self.hs_replies = []           # HS: neighbours that replied in the current phase
+        self.hs_ring = []              # HS: our two ring neighbours, fixed once both are connected
+        self.hs_inbound = []           # HS: incoming links the peer spoke on (one that raced our startup drops its TCP link)
+        self.hs_early = []             # HS: (message, link) that arrived before the ring was complete
+        self.hs_wanted = False         # HS: asked to start before the ring was complete
+        self.hs_done = False           # HS: the announcement went on (the leader: came back), our links may close
 
+        self.flood_rounds = 0          # FloodMax: rounds to run (network diameter)
+        self.flood_in_degree = 0       # FloodMax: messages expected per round (incoming links)
+        self.flood_max = None          # FloodMax: largest uuid seen so far
+        self.flood_round = 0           # FloodMax: last round we sent
+        self.flood_received = {}       # FloodMax: round -> messages received for it
 
         # added list of peer nodes - for client connection
         self.peers = []               # list of (ip, port) tuples for peer nodes
         self.lock = threading.Lock()  # locking for thread safety
 
+        self.connect_timeout = None   # seconds before giving up on a peer (None: keep trying)
+        self.ready_peers = None       # connected peers needed before the node is ready (None: all)
+        self.connects_finished = 0    # outgoing connection attempts that succeeded or gave up
+        self.connect_cond = threading.Condition()  # signalled whenever one of them finishes
+
+        self.server_address = None     # (ip, port) we listen on
+        self.transport = 'auto'        # auto: AF_UNIX to peers on this host, shm: shared-memory rings, tcp: TCP only (transports.py)
+        self.socket_dir = SOCKET_DIR   # where the AF_UNIX listeners of the nodes on this host are
+        self.socket_files = []         # our listeners' socket files, removed on exit
+        self.ready = False             # outgoing connections are done (see report_ready), reported by the control socket
+        self.auto_elect = None         # --auto-elect: window (seconds) to start the election in once ready, None: [Enter] / elect
+        self.auto_order = 'ranked'     # ranked: larger uuids start first, random: uniform jitter (auto_elect_delay)
+        self.state_file = None         # --state-dir: StateFile with our uuid, epoch and leader (statefile.py)
+        self.rejoin_leader = None      # leader we knew before the restart (state file), confirmed by start_rejoin
+        self.rejoining = False         # LEADER_QUERY sent, waiting for the answers
+        self.rejoin_answers = {}       # link -> LEADER_INFO answer
+        self.rejoin_timer = None
+        self.link_uuids = {}           # link -> uuid of the peer (greeting on outgoing links, ack on accepted ones)
+        self.link_peers = {}           # outgoing link -> the peer's own peers (from its greeting)
+        self.link_addresses = {}       # outgoing link -> (ip, port) of the peer
+
+        self.successors = SUCCESSORS   # k: a cr node re-connects past up to k - 1 dead peers in a row (peer_down)
+        self.successor_map = {}        # (ip, port) -> successor addresses of that node (topology_successors)
+        self.repair_timeout = REPAIR_TIMEOUT
+
+        self.send_queue = SEND_QUEUE   # frames queued per outgoing link (0: sendall under the lock)
+        self.queue_policy = 'coalesce' # what a full / slow queue does (outbound.py)
+        self.senders = {}              # link -> PeerSender / AsyncPeerSender
+
+        self.heartbeat_interval = None # seconds between leader heartbeats (None: close connections after the election)
+        self.suspicion_timeout = None  # no heartbeat for this long -> leader is suspected dead
+        self.heartbeat_running = False
+        self.heartbeat_seq = 0         # last heartbeat sent (leader) / forwarded (everyone else)
+        self.last_heartbeat = 0.0      # time.monotonic() of the last heartbeat or epoch change
+        self.epoch = 0                 # current election epoch, messages from older epochs are dropped
+        self.holding = 0               # bypasses re-connecting around dead peers, incoming messages wait in held
+        self.held = []
+        self.initiate_after_bypass = False
+        self.announce_after_bypass = False
+        self.informed_links = set()    # outgoing links whose peer acked the leader (LEADER_ACK)
+        self.closed_peers = []         # (ip, port) of outgoing links closed after the election, reopened by start_epoch
+
+        self.scheduler = Scheduler()   # delayed work (schedule), one thread for all timers (scheduler.py)
+        self.retries = {}              # id(message) -> timer of its pending leader_election_logic retry
+
+        self.metrics = Metrics()       # counters / histograms, served with --metrics-port / --metrics-socket
+        self.election_started = None   # time.perf_counter() when we joined the current election (trigger or first message)
+
+        self.announcer = None          # --announce: UDP sockets for the leader announcement (announce.py)
+        self.announce_timeout = ANNOUNCE_TIMEOUT
+        self.acked = set()             # leader: uuids that acked our announcement in this epoch
+        self.announced = False         # the ring announcement went to our successors (or they acked) in this epoch
+
+        self.tracing = False                       # --trace: stamp trace / hop / clock on messages, write trace events
+        self.lamport = 0                           # Lamport clock
+        self.trace_id = None                       # trace id of the current election (ours, or the first one we received)
+        self.trace_lock = threading.Lock()
+        self.trace_context = threading.local()     # the event (receive / trigger) the current thread is handling
+
     # function to add peer nodes to the list (that client needs to connect to)
     def add_peer(self, ip, port):
         self.peers.append((ip, port))
@@ -129,8 +765,13 @@ class NodeState:
     # server() takes server_port and server_ip as arguments
     def server(self, server_ip, server_port):
         print("I am the Server---------- This is my ID:", self.local_node_uuid)
+        self.server_address = (server_ip, server_port)
+
+        # peers on this host connect to our socket files instead (transports.py), so they exist before TCP accepts
+        local_listeners = self.listen_local(server_ip, server_port)
 
         serverSocket = socket(AF_INET, SOCK_STREAM)
+        serverSocket.setsockopt(SOL_SOCKET, SO_REUSEADDR, 1)  # restart on the same port while old connections are in TIME_WAIT
         serverSocket.bind((server_ip, server_port))  # port server is using
         serverSocket.listen(5)                       # server is listening
 
@@ -138,160 +779,1183 @@ class NodeState:
             
         # function to handle each client connection in a separate thread
         # separated out our original server logic to handle each connection
-        def handle_client_connection(connectionSocket): # reads in current connection socket
+        def handle_client_connection(connectionSocket, shm=False): # reads in current connection socket
+            if shm:
+                # the connecting node sends its shared-memory rings first, they replace the socket from now on
+                try:
+                    connectionSocket = accept_shm(connectionSocket, HELLO_TIMEOUT)
+                except (OSError, ValueError):
+                    connectionSocket.close()
+                    return
+            # tell the connecting node which wire formats we understand
+            connectionSocket.sendall(handshake_greeting(self.local_node_uuid, self.peers))
+            # the connection also works backwards (HS replies / probes to our predecessor)
+            with self.lock:
+                self.inboundSockets.append(connectionSocket)
+                self.socket_formats[connectionSocket] = self.wire_format
+            self.read_connection(connectionSocket)
+
+        def accept_connections(listener, shm=False):
             while True:
-                print("Waiting to receive data...")
-                # receive message from incoming connection
-                sentence = connectionSocket.recv(1024).decode()
-                print(f"Raw received: {sentence}")
-                if not sentence:
-                    break  # no empty strings
-                # convert to message object - split by newline to handle stream of messages
-                for msg_str in sentence.strip().split('\n'):
-                    if msg_str:
-                        message = Message.json_to_msg(data=msg_str)
-                        print(f"[Node {self.local_node_uuid}] Received message: uuid={message.received_uuid}, flag={message.flag}")
-                        self.leader_election_logic(message) # call leader election process
-
-                        # If leader is elected, close connection and break
-                        if self.leader_flag:
-                            connectionSocket.close()
+                # accept connection until leader is elected
+                connectionSocket, addr = listener.accept()
+                if connectionSocket.family == AF_INET:
+                    connectionSocket.setsockopt(IPPROTO_TCP, TCP_NODELAY, 1)  # replies / forwards go out at once
+
+                # spawn a new thread to handle each client connection
+                threading.Thread(target=handle_client_connection, args=(connectionSocket, shm), daemon=True).start()
+
+        for listener, shm in local_listeners:
+            threading.Thread(target=accept_connections, args=(listener, shm), daemon=True).start()
+        accept_connections(serverSocket)
+
+    # AF_UNIX listeners for peers on this host: (socket, True for the shared-memory one)
+    def listen_local(self, server_ip, server_port):
+        if self.transport == 'tcp':
+            return []
+        listeners = []
+        for kind in ['sock', 'shm'] if self.transport == 'shm' else ['sock']:
+            path = socket_path(self.socket_dir, server_ip, server_port, kind)
+            listeners.append((listen_unix(path), kind == 'shm'))
+            self.socket_files.append(path)
+        atexit.register(remove_socket_files, self.socket_files)
+        return listeners
+
+    # reads messages from one connection until it closes or the leader is known
+    # used for accepted connections and (HS mode) for our own client connections
+    def read_connection(self, connectionSocket):
+        reader = FrameReader()  # keeps partial frames between reads
+        heard = False
+        try:
+            while True:
+                log_message("Waiting", None, "", "")
+                # receive the next batch of messages from the connection (json lines and/or binary frames)
+                messages = reader.recv_from(connectionSocket)
+                if messages is None:
+                    break  # connection closed
+                self.metrics.count('myle_bytes_received_total', reader.last_read)
+                self.take_handshake(reader, connectionSocket)
+                if not heard:
+                    heard = True
+                    self.hs_link_added(connectionSocket)
+                log_message("Raw", messages, "", "")
+                with self.batched_sends():  # --groups: our answers to this batch share frames
+                    for message in messages:
+                        if message.kind != HEARTBEAT:
+                            log_message("Incoming", message, "", "", self.local_node_uuid)
+                        self.handle_message(message, connectionSocket) # call leader election process
+
+                        # If leader is elected (in every group), close connection and break (heartbeat mode keeps the ring open)
+                        if self.election_over():
+                            self.ack_leader(connectionSocket)
                             return
-            connectionSocket.close()
+        except OSError:
+            pass  # connection was closed on our side
+        finally:
+            self.close_link(connectionSocket)
+            with self.lock:
+                if connectionSocket in self.inboundSockets:
+                    self.inboundSockets.remove(connectionSocket)
 
-        while True:
-            # accept connection until leader is elected
-            connectionSocket, addr = serverSocket.accept() 
+    # we stop reading a cr connection because we know the leader: tell the connecting node first (LEADER_ACK)
+    def ack_leader(self, link):
+        if self.algorithm == 'cr':
+            try:
+                link.sendall(LEADER_ACK)
+            except OSError:
+                pass
+
+    # cr with --successors > 1: outgoing links are watched and repaired (peer_down)
+    def watches_links(self):
+        return self.algorithm == 'cr' and self.successors > 1
+
+    # the connecting node acked our greeting: answer in the format it picked
+    def take_handshake(self, reader, link):
+        if reader.handshake is None:
+            return
+        ack, reader.handshake = reader.handshake, None
+        if ack.get('format') in WIRE_FORMATS:
+            self.socket_formats[link] = ack['format']
+        try:
+            self.link_uuids[link] = uuid.UUID(ack.get('uuid'))  # names the sender in trace events
+        except (ValueError, TypeError, AttributeError):
+            pass
+        print(f"Peer {ack.get('uuid')} connected using {ack.get('format')} messages")
+
+    # passes a message to the election algorithm it belongs to
+    # link is the connection the message arrived on (HS answers and forwards relative to it)
+    def handle_message(self, message: Message, link=None):
+        self.metrics.count('myle_messages_received_total', kind=message_kind_name(message))
+        self.process_message(message, link)
+
+    # handle_message() without counting it as received (messages held during a bypass go through here again)
+    def process_message(self, message: Message, link=None):
+        if message.kind in (LEADER_QUERY, LEADER_INFO):
+            self.rejoin_logic(message, link)  # about the current epoch, whichever ours is
+            return
+        epoch = message.epoch or 0
+        if epoch < self.epoch:
+            self.ignore_message(message)  # left over from an older election
+            return
+        if epoch > self.epoch:
+            self.start_epoch(epoch)  # somebody started a re-election, join it
+        with self.lock:
+            if self.holding:
+                self.held.append((message, link))
+                return
 
-            # spawn a new thread to handle each client connection
-            threading.Thread(target=handle_client_connection, args=(connectionSocket,), daemon=True).start()
+        started = time.perf_counter()
+        knew_leader = self.all_elected()
+        if self.election_started is None and message.kind != HEARTBEAT:
+            self.election_started = started
+        traced = self.tracing and message.kind != HEARTBEAT
+        if traced:
+            self.trace_receive(message, link)
+
+        try:
+            if message.kind == HEARTBEAT:
+                self.heartbeat_logic(message)
+            elif message.kind == FLOODMAX:
+                self.floodmax_logic(message)
+            elif message.kind is not None:
+                self.hs_election_logic(message, link)
+            else:
+                self.leader_election_logic(message)
+
+            finished = time.perf_counter()
+            self.metrics.observe('myle_hop_seconds', finished - started)
+            if not knew_leader and self.all_elected():
+                if self.election_started is not None:
+                    self.metrics.observe('myle_time_to_leader_seconds', finished - self.election_started)
+                if traced:
+                    self.trace_event('leader', leader=str(self.leader_uuid))
+        finally:
+            if traced:
+                self.trace_context.__dict__.clear()
+
+    # a message that is dropped on purpose (old epoch, leader already known, dominated candidate, ...)
+    def ignore_message(self, message: Message):
+        self.metrics.count('myle_messages_ignored_total')
+        log_message("Ignored", message, "", "")
+        if self.tracing:
+            self.trace_event('drop', message)
+
+    # Causal tracing (--trace)
+    # every traced event gets a Lamport timestamp (+1 per event, a receive jumps past the sender's clock) and is
+    # written to node_<N>_trace.jsonl. Messages carry the trace id, the hop count and the clock of their send, and
+    # every send / drop / leader event names its cause: the receive (or trigger) event the thread was handling.
+    # send -> receive (same clock on both sides) and cause -> event are the edges of the causal graph
+    # (tools/election_trace.py rebuilds it and finds the critical path to the leader).
+    def trace_event(self, event, message=None, peer=None, received_clock=0, **details):
+        with self.trace_lock:
+            self.lamport = max(self.lamport, received_clock) + 1
+            clock = self.lamport
+        record = {"time": time.time(), "node": str(self.local_node_uuid), "clock": clock, "event": event, "epoch": self.epoch}
+        cause = getattr(self.trace_context, 'clock', None)
+        if cause is not None and event != 'recv':
+            record["cause"] = cause
+        if message is not None:
+            record.update(uuid=str(message.received_uuid), flag=message.flag, kind=message_kind_name(message),
+                          trace=trace_text(message.trace), hop=message.hop)
+        if peer is not None:
+            record["peer"] = str(peer)
+        record.update(details)
+        log_writer.trace(record)
+        return clock
+
+    # trace id of the current election, a new one if we start it
+    def current_trace(self):
+        if self.trace_id is None:
+            self.trace_id = random.getrandbits(63) + 1
+        return self.trace_id
+
+    # a message arrived: receive event, and it becomes the cause of everything we send while handling it
+    def trace_receive(self, message: Message, link):
+        if message.trace and self.trace_id is None:
+            self.trace_id = message.trace  # join the election we were woken up by
+        clock = self.trace_event('recv', message, self.link_uuids.get(link), message.clock or 0, sent_clock=message.clock)
+        self.trace_context.clock = clock
+        self.trace_context.trace = message.trace or self.current_trace()
+        self.trace_context.hop = message.hop or 0
+
+    # stamps trace / hop / clock on a message right before it is encoded for one link
+    def trace_send(self, message: Message, link):
+        message.trace = getattr(self.trace_context, 'trace', None) or self.current_trace()
+        message.hop = getattr(self.trace_context, 'hop', 0) + 1
+        message.clock = self.trace_event('send', message, self.link_uuids.get(link))
 
     # close client sockets when no longer needed
     def close_client_sockets(self):
         for sock in self.clientSockets:
+            self.remember_closed(sock)
             try:
-                sock.close()
+                self.close_link(sock)
             except Exception as e:
                 print(f"Error closing client socket: {e}")
         self.clientSockets = []
+        self.socket_formats = {}
+
+    # outgoing links whose peer knows the leader as well (caller holds the lock)
+    def close_informed_links(self):
+        for link in [link for link in self.clientSockets if link in self.informed_links]:
+            self.clientSockets.remove(link)
+            self.remember_closed(link)
+            self.close_link(link)
+
+    # a newer epoch needs the ring again: start_epoch reconnects to the peers of the links closed after the last election
+    def remember_closed(self, link):
+        address = self.link_addresses.get(link)
+        if address is not None and address not in self.closed_peers:
+            self.closed_peers.append(address)
+
+    # closes a link once its queued frames are sent (outbound.py)
+    def close_link(self, link):
+        sender = self.senders.pop(link, None)
+        if sender is None:
+            link.close()
+        else:
+            sender.close()
+
+    # a dead link: drop whatever is still queued for it
+    def drop_link(self, link):
+        sender = self.senders.pop(link, None)
+        if sender is None:
+            link.close()
+        else:
+            sender.stop()
+
+    # the sender of a link, made on its first message
+    def sender(self, link):
+        sender = self.senders.get(link)
+        if sender is None:
+            sender = self.senders[link] = self.new_sender(link)
+        return sender
+
+    def new_sender(self, link):
+        return PeerSender(link, self.metrics, self.sender_failed, self.send_queue, self.queue_policy)
+
+    # a queued frame could not be sent (outbound.py, from the sender's thread / task)
+    def sender_failed(self, link, error):
+        self.metrics.count('myle_messages_dropped_total', reason='send_error')
+        print(f"Send to {self.link_uuids.get(link)} failed: {error}")
+        self.link_failed(link)
+
+    # the election is over on this node: without heartbeats the connections are not needed anymore,
+    # with heartbeats they stay open and the watchdog (heartbeat_tick) starts
+    def finish_election(self):
+        self.flush_batches()  # the last announcements go out before the links close
+        self.cancel_retries()
+        self.save_state()
+        if not self.heartbeat_interval:
+            if self.watches_links():
+                self.close_informed_links()  # the others once their peer acks (watch_link), or peer_down repairs them
+            else:
+                self.close_client_sockets()
+            return
+        self.last_heartbeat = time.monotonic()
+        if not self.heartbeat_running:
+            self.heartbeat_running = True
+            self.schedule(self.heartbeat_interval, self.heartbeat_tick)
+
+    # every heartbeat_interval: the leader sends a heartbeat, everybody else checks the last one is recent enough
+    def heartbeat_tick(self):
+        if self.leader_flag and self.leader_uuid == self.local_node_uuid:
+            with self.lock:
+                self.heartbeat_seq += 1
+                for outgoing_socket in list(self.clientSockets):
+                    self.send_node_message(Message(self.local_node_uuid, 1, HEARTBEAT, seq=self.heartbeat_seq), outgoing_socket)
+        elif time.monotonic() - self.last_heartbeat > self.suspicion_timeout:
+            self.last_heartbeat = time.monotonic()  # don't suspect again before the new election had its time
+            self.spawn(self.suspect_leader, self.epoch + 1)  # re-connects around the old leader
+        self.schedule(self.heartbeat_interval, self.heartbeat_tick)
+
+    # forwards each heartbeat once (the double ring delivers some of them twice)
+    def heartbeat_logic(self, message: Message):
+        with self.lock:
+            if (message.epoch or 0) != self.epoch or message.seq <= self.heartbeat_seq:
+                return
+            self.heartbeat_seq = message.seq
+            self.last_heartbeat = time.monotonic()
+            if message.received_uuid == self.local_node_uuid:
+                return  # our own heartbeat came around
+            if not self.leader_flag:
+                # the announcement got lost, the heartbeat tells us the leader as well
+                self.leader_flag, self.leader_uuid = True, message.received_uuid
+                log_message("Received", message, "", "Leader Elected")
+            for outgoing_socket in list(self.clientSockets):
+                self.send_node_message(message, outgoing_socket)
+
+    # no heartbeat within suspicion_timeout: start a new election (epoch: the one after the suspected leader's) without
+    # the leader. The epoch is taken when the watchdog fires, a message that arrives before we run may have moved us
+    # there already - one more would bypass the leader just elected in it
+    def suspect_leader(self, epoch):
+        print(f"No heartbeat from leader {self.leader_uuid} for {self.suspicion_timeout}s, starting election epoch {epoch}")
+        if not self.start_epoch(epoch):
+            return  # a message from that epoch got here first, we take part without initiating
+        if self.holding:
+            self.initiate_after_bypass = True  # bypass() starts it once the new connections are up
+        else:
+            self.manual_trigger_election()
+
+    # moves to a newer epoch: forget the old election, and re-connect around the old leader if it is our peer
+    # and to the peers we stopped sending to after the old election or that acked its leader (nodes that finished it
+    # closed their links, a node that restarted after losing a peer may not have seen its result)
+    # returns False if we are already in that epoch (or a newer one)
+    def start_epoch(self, epoch):
+        with self.lock:
+            if epoch <= self.epoch:
+                return False
+            print(f"Election epoch {epoch} (previous leader {self.leader_uuid})")
+            old_leader = self.leader_uuid
+            self.epoch = epoch
+            self.leader_uuid, self.leader_flag = None, False
+            self.seen_own_uuid_count = 0
+            self.sent_own_uuid = False
+            self.max_forwarded = None
+            self.groups, self.groups_elected = {}, 0
+            self.cancel_retries()
+            self.election_started = None
+            self.trace_id = None
+            self.heartbeat_seq = 0
+            self.last_heartbeat = time.monotonic()
+            self.acked, self.announced = set(), False
+            self.save_state()
+            dead_links = [link for link in self.clientSockets if old_leader is not None and self.link_uuids.get(link) == old_leader]
+            for link in dead_links:
+                self.clientSockets.remove(link)
+            if dead_links:
+                self.holding += 1
+            self.close_informed_links()  # their peers acked the old leader and stopped reading
+            self.informed_links = set()
+            closed, self.closed_peers = self.closed_peers, []
+            if closed:
+                self.holding += 1
+        if dead_links:
+            self.bypass(dead_links)
+        if closed:
+            self.reopen_links(closed)
+        return True
+
+    # connects to the successors of the peers behind dead_links instead (learned from their greetings),
+    # then processes the messages that arrived in the meantime
+    def bypass(self, dead_links):
+        for link in dead_links:
+            self.connect_around(link)
+            try:
+                self.drop_link(link)
+            except OSError:
+                pass
+        self.release_held()
+
+    # connects to the peers of links closed after an election again (one that is gone now: its successors),
+    # then processes the messages that arrived in the meantime
+    def reopen_links(self, addresses):
+        for ip, port in addresses:
+            print(f"Reconnecting to {ip}:{port} for epoch {self.epoch}")
+            self.connect_successors([(ip, port)], 0)
+        self.release_held()
+
+    # one dead link -> connections to the dead peer's successors
+    def connect_around(self, link):
+        print(f"Bypassing {self.link_uuids.get(link)}")
+        self.connect_successors(self.successors_of(self.link_addresses.get(link), link))
+
+    # a node's successors: from the topology / config files, else (direct peers only) from the node's greeting
+    def successors_of(self, address, link=None):
+        return self.successor_map.get(address) or self.link_peers.get(link, [])
+
+    # connects to peers in place of a dead node (never to ourselves); a peer that can't be reached within timeout is
+    # skipped the same way, up to successors - 1 dead nodes in a row. Returns True if any connection came up
+    def connect_successors(self, peers, skipped=1, timeout=None):
+        connected = False
+        for ip, port in peers:
+            if (ip, port) == self.server_address:
+                continue
+            print(f"Connecting to successor {ip}:{port}")
+            if self.core_client_logic(ip, port, timeout or self.repair_timeout):
+                connected = True
+            elif skipped < self.successors - 1:
+                connected = self.connect_successors(self.successors_of((ip, port)), skipped + 1, timeout) or connected
+        return connected
+
+    # an outgoing cr link is gone (the peer closed it without LEADER_ACK, or a send failed): connect to the peer's
+    # successors instead, and restart the election in the next epoch while we don't know the leader (its messages may
+    # have died with the peer; only a node that never saw an election, held or processed, just bypasses)
+    # or send the leader announcement again if we already know the leader (the peer may have died before forwarding it)
+    def peer_down(self, link):
+        with self.lock:
+            if link not in self.clientSockets:
+                return  # closed by us
+            if link in self.informed_links:
+                if self.all_elected():
+                    self.close_informed_links()  # else finish_election closes it
+                return
+            self.clientSockets.remove(link)
+            self.holding += 1
+            restart = not self.all_elected() and (self.election_started is not None or bool(self.held) or self.epoch > 0)
+            self.announce_after_bypass = self.announce_after_bypass or self.election_over()
+        print(f"Lost peer {self.link_uuids.get(link)} at {self.link_addresses.get(link)}")
+        self.metrics.count('myle_peer_failures_total')
+        if restart and self.start_epoch(self.epoch + 1):
+            print(f"Restarting the election in epoch {self.epoch}")
+            self.initiate_after_bypass = True
+        self.bypass([link])
+
+    # only LEADER_ACK (and LEADER_INFO, the answer to a rejoin query) comes back on an outgoing cr link:
+    # EOF or a reset without LEADER_ACK means the peer is gone
+    def watch_link(self, link):
+        reader = FrameReader()
+        try:
+            while True:
+                messages = reader.recv_from(link)
+                if messages is None:
+                    break
+                self.link_answered(link, reader, messages)
+        except OSError:
+            pass
+        if self.watches_links():
+            self.peer_down(link)
+
+    # what came back on an outgoing link (watch_link / watch_stream): the peer knows the leader if it acked or named it
+    def link_answered(self, link, reader, messages):
+        if reader.acks or any(message.kind == LEADER_INFO and message.flag == 1 for message in messages):
+            self.informed_links.add(link)
+        for message in messages:
+            if message.kind == LEADER_INFO:
+                self.handle_message(message, link)
+
+    # a send on link failed: peer_down, but not on this thread (the caller may hold self.lock)
+    def link_failed(self, link):
+        if self.watches_links() and link in self.clientSockets:
+            self.spawn(self.peer_down, link)
+
+    # the end of one bypass; the held messages go on once the last running bypass is done
+    def release_held(self):
+        with self.lock:
+            self.holding -= 1
+            if self.holding:
+                return
+            held, self.held = self.held, []
+        with self.batched_sends():
+            for message, link in held:
+                self.process_message(message, link)
+        with self.lock:
+            if self.holding:
+                return  # a held message started a newer epoch, its repair is still connecting and releases again
+        if self.initiate_after_bypass:
+            self.initiate_after_bypass = False
+            self.manual_trigger_election()
+        if self.announce_after_bypass:
+            self.announce_after_bypass = False
+            with self.batched_sends(), self.lock:
+                for outgoing_socket in [link for link in self.clientSockets if link not in self.informed_links]:
+                    for state in self.group_states():  # every group's leader (--groups)
+                        self.send_node_message(Message(state.leader_uuid, flag=1, group=state.group or None), outgoing_socket)
+                self.finish_election()
+
+    # run a function later (delayed work such as retries), returns a timer with cancel()
+    # the threaded engine uses the node's Scheduler (one thread for every timer, they must not block), the asyncio
+    # engine overrides this with the event loop
+    def schedule(self, delay, function, *args):
+        return self.scheduler.call_later(delay, function, *args)
+
+    # run work that may block for a while (connecting around a dead peer) outside the election code and the
+    # scheduler thread: its own thread here, a callback on the loop in AsyncNodeState (which never blocks)
+    def spawn(self, function, *args):
+        threading.Thread(target=function, args=args, daemon=True).start()
 
     # retry logic for leader election when no client socket is available
+    # (the retry count goes along with the message, so it gives up after max_retries)
     def retry_leader_election_logic(self, message, retry_count=0, max_retries=5, delay=1):
         if retry_count < max_retries:
             print(f"No outgoing client socket available, retrying in {delay} second(s)... (Attempt {retry_count+1}/{max_retries})")
-            threading.Timer(delay, self.leader_election_logic, args=(message,)).start()
+            self.metrics.count('myle_retries_total')
+            self.retries[id(message)] = self.schedule(delay, self.retry_election, message, retry_count + 1)
         else:
             print("Error: No outgoing client socket available in leader_election_logic after retries. Message dropped.")
+            self.metrics.count('myle_messages_dropped_total', reason='no_peer')
             log_message("Ignored", message, "", "")
 
 
+    # our uuid in group 0's election (GroupState.candidate for the other groups)
+    @property
+    def candidate(self):
+        return self.local_node_uuid
+
+    # the election state of a group, None for a group we don't run (--groups); made on the group's first message
+    def group_state(self, group):
+        if not group:
+            return self
+        if group >= self.group_count:
+            return None
+        state = self.groups.get(group)
+        if state is None:
+            state = self.groups.setdefault(group, GroupState(group, uuid.uuid5(self.local_node_uuid, str(group))))
+        return state
+
+    def group_states(self):
+        return [self.group_state(group) for group in range(self.group_count)]
+
+    # every group knows its leader
+    def all_elected(self):
+        return self.leader_flag and self.groups_elected >= self.group_count - 1
+
+    # the election is over and the connections are not needed anymore (readers stop reading, links close)
+    # HS: not before the announcement went on, a closed link would cut the ring in front of it
+    def election_over(self):
+        if self.algorithm == 'hs' and not self.hs_done:
+            return False
+        return self.all_elected() and not self.heartbeat_interval
+
+    # a group learned its leader (caller holds the lock), the election is over once every group did
+    def group_elected(self, state):
+        if state is not self:
+            self.groups_elected += 1
+        if self.all_elected():
+            self.finish_election()
+
+    # --groups: the cr messages this thread sends while it handles one received batch (or starts the election) are
+    # collected per link and go out as batch frames when it is done, instead of one frame per message
+    @contextlib.contextmanager
+    def batched_sends(self):
+        depth = getattr(self.batch_context, 'depth', 0)
+        self.batch_context.depth = depth + 1
+        try:
+            yield
+        finally:
+            self.batch_context.depth = depth
+            if depth == 0 and self.batches:
+                with self.lock:
+                    self.flush_batches()
+
+    # puts a message into the link's next batch frame (caller holds the lock), False if it has to go out on its own
+    def add_to_batch(self, message: Message, link):
+        if not self.batching or not getattr(self.batch_context, 'depth', 0) or self.socket_formats.get(link) != 'binary':
+            return False
+        batch = self.batches.get(link)
+        if not message.batchable() or (batch is not None and batch[0] != (message.epoch or 0)):
+            self.flush_batches([link])  # the messages before it go first
+            if not message.batchable():
+                return False
+            batch = None
+        if batch is None:
+            batch = self.batches[link] = (message.epoch or 0, [])
+        batch[1].append((message.group or 0, message.flag, message.received_uuid.bytes))
+        if len(batch[1]) >= BATCH_MESSAGES:
+            self.flush_batches([link])
+        return True
+
+    # sends the collected batch frames (of the given links, default all) - caller holds the lock
+    def flush_batches(self, links=None):
+        for link in list(self.batches) if links is None else links:
+            batch = self.batches.pop(link, None)
+            if batch is not None:
+                self.send_batch(link, *batch)
+
+    def send_batch(self, link, epoch, entries):
+        frame = Message.entries_to_batch(epoch, entries)
+        try:
+            if self.send_queue:
+                self.sender(link).put('cr', None, frame, len(entries))
+                return
+            self.write_frame(link, frame)
+            self.metrics.count('myle_messages_sent_total', len(entries), kind='cr')
+            self.metrics.count('myle_bytes_sent_total', len(frame))
+        except Exception as e:
+            self.metrics.count('myle_messages_dropped_total', len(entries), reason='send_error')
+            print(f"Sending {len(entries)} batched message(s) to {self.link_uuids.get(link)} failed: {e}")
+            self.link_failed(link)
+
+    def retry_election(self, message, retry_count):
+        self.retries.pop(id(message), None)
+        self.leader_election_logic(message, retry_count)
+
+    # the pending retries belong to an election that is over (leader known, or a newer epoch)
+    def cancel_retries(self):
+        retries, self.retries = self.retries, {}
+        for timer in list(retries.values()):
+            timer.cancel()
+
     # function that handles the leader election logic
     # based on the message received, it decides whether to forward, modify, or stop forwarding
-    def leader_election_logic(self, message: Message=None):
-        if self.leader_flag:
-            log_message("Ignored", message, "", "")
-            return  # if leader already elected, ignore further messages
+    # (--groups: every group runs it on its own state - the fields of NodeState for group 0, else a GroupState)
+    def leader_election_logic(self, message: Message=None, retry_count=0):
+        state = self.group_state(message.group or 0)
+        if state is None or state.leader_flag:
+            self.ignore_message(message)
+            return  # if leader already elected (or a group we don't run), ignore further messages
 
         if not self.clientSockets:
-            self.retry_leader_election_logic(message)
+            self.retry_leader_election_logic(message, retry_count)
             return
         
-        outgoing_sockets = self.clientSockets if len(self.clientSockets) > 1 else [self.clientSockets[0]]
+        # peers that acked the leader (LEADER_ACK) don't need anything from us anymore
+        outgoing_sockets = [link for link in self.clientSockets if link not in self.informed_links]
 
-        if not outgoing_sockets or outgoing_sockets[0] is None:
+        if outgoing_sockets and outgoing_sockets[0] is None:
             print("Error: destination_clientSocket is None in leader_election_logic")
             return
         
         # prevent race condition - due to multiple server() threads
         with self.lock:
+            # the epoch may have moved on since handle_message checked it (re-election in another thread)
+            if (message.epoch or 0) != self.epoch:
+                self.ignore_message(message)
+                return
+            if state is not self.group_state(state.group):
+                self.ignore_message(message)  # the state of a group from before that re-election
+                return
+
             # case: we are the leader - UUID has returned back to us
             if message.flag == 0:
-                if message.received_uuid == self.local_node_uuid: # leader election only happens if this occurs twice.
-                    self.seen_own_uuid_count += 1
-                    if self.seen_own_uuid_count == 2:
+                if message.received_uuid == state.candidate: # leader election only happens if this occurs twice.
+                    state.seen_own_uuid_count += 1
+                    if state.seen_own_uuid_count == 2:
                         # None -> leader uuid initalized
-                        print("Second time seeing own UUID. Declaring self as leader:", self.local_node_uuid)
-                        log_message("Leader", message, "equal", "", self.local_node_uuid)
-                        self.leader_uuid = self.local_node_uuid # we are the leader
+                        print("Second time seeing own UUID. Declaring self as leader:", state.candidate)
+                        log_message("Leader", message, "equal", "", state.candidate)
+                        state.leader_uuid = state.candidate # we are the leader
                         
-                        self.leader_flag = True
+                        state.leader_flag = True
+
+                        # --announce: one datagram to everyone, the ring only for the nodes that don't ack it
+                        if self.announcer:
+                            self.announce_leader()
+                            return
 
                         # send multiple
                         for outgoing_socket in outgoing_sockets:
-                            self.send_node_message(Message(self.local_node_uuid, flag=1), outgoing_socket)     # send updated message
+                            self.send_node_message(Message(state.candidate, flag=1, group=message.group), outgoing_socket)     # send updated message
 
-                        # election complete, end all socket connections
-                        self.close_client_sockets()
+                        # election complete, end all socket connections (or start heartbeats)
+                        self.group_elected(state)
 
-                    elif self.seen_own_uuid_count < 2:
+                    elif state.seen_own_uuid_count < 2:
                         # we've seen our own UUID once already, but we can drop it
                         log_message("Incoming UUID == Local UUID: Seen Once Before.Dropping Message", message, "", "")
                         return
 
                 # case: our node uuid < received uuid
                 # just pass message along (we're not the leader)
-                elif self.local_node_uuid < message.received_uuid:
+                elif state.candidate < message.received_uuid:
                     #print(f"(unmodified) Forwarding message along: {message.received_uuid}, with leader: {message.flag}")
                     log_message("Received", message, "greater", "Not Leader")
-                    
+                    if self.suppression and self.redundant_candidate(state, message):
+                        self.ignore_message(message)
+                        return
+                    if not self.suppression:
+                        state.max_forwarded = max(state.max_forwarded or message.received_uuid, message.received_uuid)  # --auto-elect
+
                     for outgoing_socket in outgoing_sockets:
                         self.send_node_message(message, outgoing_socket)     # send unmodified message
 
                 # case: our node uuid > received uuid
                 # we are a better candidate for leader, modify message
-                else: # message.received_uuid < self.local_node_uuid:
-                    #print(f"Modifying message to our uuid: {self.local_node_uuid}, with leader: 0")
+                else: # message.received_uuid < state.candidate:
+                    #print(f"Modifying message to our uuid: {state.candidate}, with leader: 0")
                     log_message("Received", message, "less", "Not Leader")
-                    self.leader_flag = False
+                    state.leader_flag = False
+                    # our uuid goes out only once per election - a second copy could come back around a short
+                    # loop and count as the second sighting (seen_own_uuid_count) before a larger uuid arrives
+                    if state.sent_own_uuid:
+                        return
+                    state.sent_own_uuid = True
+                    state.max_forwarded = max(state.max_forwarded or state.candidate, state.candidate)
                     for outgoing_socket in outgoing_sockets:
-                        self.send_node_message(Message(received_uuid=self.local_node_uuid, flag=0), outgoing_socket)     # send updated message
+                        self.send_node_message(Message(received_uuid=state.candidate, flag=0, group=message.group), outgoing_socket)     # send updated message
 
             # we just received the final Leader Message that was broadcasted
             elif message.flag == 1:
-                if message.received_uuid == self.local_node_uuid:
-                    self.leader_flag = True
-                    self.leader_uuid = message.received_uuid
-                    #print("Leader elected:", self.leader_uuid, "flag: ", message.flag)
-                    log_message("Leader", message, "", "", self.leader_uuid)
-                    self.close_client_sockets()
+                if message.received_uuid == state.candidate:
+                    state.leader_flag = True
+                    state.leader_uuid = message.received_uuid
+                    #print("Leader elected:", state.leader_uuid, "flag: ", message.flag)
+                    log_message("Leader", message, "", "", state.leader_uuid)
+                    self.group_elected(state)
                     return  # election complete, stop forwarding
                 else:
                     log_message("Received", message, "", "Leader Elected")
-                    self.leader_uuid = message.received_uuid
-                    self.leader_flag = True
+                    state.leader_uuid = message.received_uuid
+                    state.leader_flag = True
+                    self.announced = True  # we missed the datagrams (or run without them), the ring goes on from here
                     for outgoing_socket in outgoing_sockets:
                         self.send_node_message(message, outgoing_socket)
 
                     # After forwarding, stop processing further messages
-                    self.close_client_sockets()
+                    self.group_elected(state)
                     return
 
+    # --announce (leader, caller holds the lock): announce to the group, send the roll once the acks are in
+    def announce_leader(self):
+        self.acked = set()
+        self.send_datagram(ANNOUNCE)
+        self.schedule(self.announce_timeout, self.announce_roll, self.epoch)
+
+    def announce_roll(self, epoch):
+        if epoch != self.epoch or self.leader_uuid != self.local_node_uuid:
+            return  # a newer election started in the meantime
+        acked = set(self.acked)
+        print(f"Leader announcement acked by {len(acked)} node(s)")
+        self.send_datagram(ROLL, acked)
+        self.announce_fallback(epoch, acked)
+
+    # the ring announcement to the successors that didn't ack, then the election is over for us
+    def announce_fallback(self, epoch, acked):
+        with self.lock:
+            if epoch != self.epoch or self.announced or not self.leader_flag:
+                return
+            self.announced = True
+            acked = set(acked) | {self.leader_uuid}
+            for link in list(self.clientSockets):
+                if self.link_uuids.get(link) not in acked:
+                    self.send_node_message(Message(self.leader_uuid, flag=1), link)
+        self.finish_election()
+
+    def send_datagram(self, kind, uuids=(), address=None):
+        try:
+            size = self.announcer.send(kind, self.epoch, self.local_node_uuid, uuids, address)
+        except OSError as error:
+            print(f"Could not send the {DATAGRAM_KIND_NAMES[kind]} datagram: {error}")
+            return
+        self.metrics.count('myle_datagrams_sent_total', kind=DATAGRAM_KIND_NAMES[kind])
+        self.metrics.count('myle_bytes_sent_total', size)
+
+    # a signed datagram from the announcement group (ANNOUNCE / ROLL) or an ACK for our own announcement
+    def receive_datagram(self, datagram, address):
+        kind, epoch, sender, uuids = datagram
+        self.metrics.count('myle_datagrams_received_total', kind=DATAGRAM_KIND_NAMES.get(kind, kind))
+        if epoch < self.epoch or sender == self.local_node_uuid:
+            return  # older epoch, or our own datagram looped back
+        if kind == ACK:
+            with self.lock:
+                if epoch == self.epoch and self.leader_uuid == self.local_node_uuid:
+                    self.acked.add(sender)
+            return
+        if kind not in (ANNOUNCE, ROLL):
+            return
+        if epoch > self.epoch:
+            self.start_epoch(epoch)  # we missed the start of this election
+        self.learn_leader(sender, epoch)
+        if kind == ANNOUNCE:
+            self.send_datagram(ACK, address=address)
+            self.schedule(2 * self.announce_timeout, self.announce_fallback, epoch, ())  # in case the roll gets lost
+        else:
+            self.announce_fallback(epoch, uuids)
+
+    # the leader from a datagram (same log line / metrics as from the ring announcement)
+    def learn_leader(self, leader, epoch):
+        with self.lock:
+            if epoch != self.epoch or self.leader_flag:
+                return
+            self.leader_uuid, self.leader_flag = leader, True
+        log_message("Received", Message(leader, 1, epoch=epoch or None), "", "Leader Elected")
+        if self.election_started is not None:
+            self.metrics.observe('myle_time_to_leader_seconds', time.perf_counter() - self.election_started)
+        if self.tracing:
+            self.trace_event('leader', leader=str(leader), via='udp')
+
+    # starts reading datagrams (a thread here, the event loop in AsyncNodeState)
+    def start_announcer(self):
+        if self.announcer:
+            self.announcer.serve(self.receive_datagram)
+
+    # True if forwarding this candidate can't change the result (caller holds the lock):
+    #   dominated - we already forwarded a larger candidate, this one will be swallowed by it further on anyway
+    #   duplicate - this (uuid, flag, epoch) was already forwarded MAX_FORWARDS times
+    # the largest uuid is never dominated and still goes around both branches, so it is still seen twice by its owner
+    # state is the message's group (NodeState itself for group 0)
+    def redundant_candidate(self, state, message: Message):
+        if state.max_forwarded is not None and message.received_uuid < state.max_forwarded:
+            return True
+        key = (message.received_uuid, message.flag, message.epoch or 0)
+        forwarded = state.recent_messages.get(key, 0)
+        if forwarded >= MAX_FORWARDS:
+            return True
+        state.recent_messages[key] = forwarded + 1
+        state.recent_messages.move_to_end(key)
+        if len(state.recent_messages) > RECENT_MESSAGES:
+            state.recent_messages.popitem(last=False)
+        state.max_forwarded = message.received_uuid
+        return False
+
+    # Hirschberg-Sinclair (HS) election - O(n log n) messages on a bidirectional ring
+    # every candidate probes 1, 2, 4, ... hops in both directions; a probe that meets a larger uuid is swallowed,
+    # a probe that survives 2^k hops is answered with a reply. A candidate that gets replies from both sides
+    # starts the next phase; the candidate whose probe comes all the way around is the leader.
+    #
+    # the ring uses the double ring connections in both directions (TCP links are bidirectional):
+    #   x: its two peers     y: its two incoming connections     n: its peer + its incoming connection
+    # e.g. the example topology becomes the ring 1 - 2 - 4 - 5 - 3 - 1 (y's own link back to x is not used)
+    # the pair is fixed once complete: a neighbour that is done closes its link and leaves the live lists,
+    # the other side of the ring still has to be reached over the same pair
+    def hs_neighbours(self):
+        if len(self.hs_ring) < 2:
+            if self.node_type == 'x':
+                self.hs_ring = self.clientSockets[:2]
+            elif self.node_type == 'y':
+                self.hs_ring = self.hs_inbound[:2]
+            else:
+                self.hs_ring = self.clientSockets[:1] + self.hs_inbound[:1]
+        return self.hs_ring
+
+    # become a candidate: phase 0 probes to both neighbours
+    def hs_start(self):
+        with self.lock:
+            if self.hs_started or self.leader_flag:
+                return
+            if len(self.hs_neighbours()) < 2:
+                # a neighbour hasn't connected to us yet, hs_link_added starts us
+                print("HS: waiting for both ring neighbours to connect...")
+                self.hs_wanted = True
+                return
+            self.hs_started = True
+            self.hs_send_probes()
+
+    # a link joined (an incoming one once its peer spoke on it): once the ring is complete we start (if asked to)
+    # and handle the messages that came early
+    def hs_link_added(self, link=None):
+        if self.algorithm != 'hs':
+            return
+        with self.lock:
+            if link in self.inboundSockets and link not in self.hs_inbound:
+                self.hs_inbound.append(link)
+            if len(self.hs_neighbours()) < 2:
+                return
+            early, self.hs_early = self.hs_early, []
+            wanted, self.hs_wanted = self.hs_wanted, False
+        if wanted:
+            self.hs_start()
+        for message, link in early:
+            self.hs_election_logic(message, link)
+
+    # sends the probes of the current phase (caller holds the lock)
+    def hs_send_probes(self):
+        self.hs_replies = []
+        for link in self.hs_neighbours():
+            self.send_node_message(Message(self.local_node_uuid, 0, HS_PROBE, self.hs_phase, 1), link)
+
+    # handles one HS message that arrived on link
+    def hs_election_logic(self, message: Message, link):
+        with self.lock:
+            neighbours = self.hs_neighbours()
+            if len(neighbours) < 2:
+                self.hs_early.append((message, link))  # a neighbour hasn't connected yet (hs_link_added)
+                return
+            if link not in neighbours:
+                self.ignore_message(message)  # not a ring link (y -> x in the double ring)
+                return
+            # the neighbour on the other side - where a message travelling through us goes next
+            onward = neighbours[1] if link is neighbours[0] else neighbours[0]
+
+            if message.kind == HS_ELECTED:
+                if self.leader_flag:
+                    self.ignore_message(message)
+                    self.hs_done = True
+                    return  # the announcement went all the way around
+                log_message("Received", message, "", "Leader Elected")
+                self.leader_uuid = message.received_uuid
+                self.leader_flag = True
+                self.send_node_message(message, onward)
+                self.hs_done = True
+                return
+
+            if self.leader_flag:
+                self.ignore_message(message)
+                return
+
+            # a probe wakes up nodes that were not initiators, they become candidates too
+            if not self.hs_started:
+                self.hs_started = True
+                self.hs_send_probes()
+
+            if message.kind == HS_PROBE:
+                if message.received_uuid == self.local_node_uuid:
+                    # our probe came all the way around - nobody is larger
+                    log_message("Leader", message, "equal", "", self.local_node_uuid)
+                    self.leader_uuid = self.local_node_uuid
+                    self.leader_flag = True
+                    self.send_node_message(Message(self.local_node_uuid, 1, HS_ELECTED, self.hs_phase, 0), onward)
+                elif message.received_uuid < self.local_node_uuid:
+                    log_message("Received", message, "less", "Not Leader")  # swallow the smaller candidate
+                elif message.hops < 2 ** message.phase:
+                    log_message("Received", message, "greater", "Not Leader")
+                    self.send_node_message(Message(message.received_uuid, 0, HS_PROBE, message.phase, message.hops + 1), onward)
+                else:
+                    # probe travelled its full distance - send it back
+                    log_message("Received", message, "greater", "Not Leader")
+                    self.send_node_message(Message(message.received_uuid, 0, HS_REPLY, message.phase, message.hops), link)
+
+            elif message.kind == HS_REPLY:
+                if message.received_uuid != self.local_node_uuid:
+                    self.send_node_message(message, onward)  # pass the reply on towards its candidate
+                elif message.phase == self.hs_phase and link not in self.hs_replies:
+                    self.hs_replies.append(link)
+                    if len(self.hs_replies) == 2:
+                        # survived in both directions - double the distance
+                        self.hs_phase += 1
+                        self.hs_send_probes()
+
+    # FloodMax election - works on any strongly connected network (topology file)
+    # in every round each node sends the largest uuid it has seen to all its neighbours. A round is complete
+    # once a message for it arrived on every incoming link (this synchronises the asynchronous network).
+    # After diameter rounds every node has seen the global maximum - that is the leader, no announcement needed.
+    # messages: rounds * links, latency: diameter hops (not the number of nodes)
+    def floodmax_start(self):
+        with self.lock:
+            self.floodmax_begin()
+
+    # first round (caller holds the lock)
+    def floodmax_begin(self):
+        if self.flood_round > 0 or self.leader_flag:
+            return
+        self.flood_max = self.local_node_uuid
+        self.flood_round = 1
+        self.floodmax_send()
+        self.floodmax_advance()  # a node without incoming links has nothing to wait for
+
+    def floodmax_send(self):
+        for outgoing_socket in self.clientSockets:
+            self.send_node_message(Message(self.flood_max, 0, FLOODMAX, round=self.flood_round), outgoing_socket)
+
+    # moves on while the current round is complete, decides after the last round
+    def floodmax_advance(self):
+        while not self.leader_flag and self.flood_received.get(self.flood_round, 0) >= self.flood_in_degree:
+            self.flood_received.pop(self.flood_round, None)
+            if self.flood_round >= self.flood_rounds:
+                self.leader_uuid = self.flood_max
+                self.leader_flag = True
+                if self.flood_max == self.local_node_uuid:
+                    log_message("Leader", Message(self.flood_max, 1), "equal", "", self.local_node_uuid)
+                else:
+                    log_message("Received", Message(self.flood_max, 1), "", "Leader Elected")
+                return
+            self.flood_round += 1
+            self.floodmax_send()
+
+    def floodmax_logic(self, message: Message):
+        with self.lock:
+            if self.leader_flag:
+                self.ignore_message(message)
+                return
+            self.floodmax_begin()  # the first message wakes up nodes that were not initiators
+            comparison = "greater" if message.received_uuid > self.flood_max else "less"
+            log_message("Received", message, comparison, "Not Leader")
+            self.flood_max = max(self.flood_max, message.received_uuid)
+            self.flood_received[message.round] = self.flood_received.get(message.round, 0) + 1
+            self.floodmax_advance()
+
     # same implementation from task1
     # client connects to one peer (n or y node)
     def client_n_y_node(self, client_ip, client_port):
-        self.core_client_logic(client_ip, client_port)
+        self.reach_peer(client_ip, client_port)
+        self.report_ready()
     
     # handles multiple connections (x node)
+    # all peers are connected at the same time (one thread each), so startup takes as long as the
+    # slowest peer instead of the sum of all of them. Returns once ready_peers are connected or
+    # every attempt finished - the remaining attempts keep going in the background.
     def client_x_node(self):
         for ip, port in self.peers:
             print("current x node ip/port:", ip, port)
-            self.core_client_logic(ip, port)
+            threading.Thread(target=self.connect_peer, args=(ip, port), daemon=True).start()
+        needed = self.peers_needed()
+        with self.connect_cond:
+            self.connect_cond.wait_for(lambda: len(self.clientSockets) >= needed or self.connects_finished == len(self.peers))
+        self.report_ready()
+
+    # one outgoing connection attempt, counted for client_x_node
+    def connect_peer(self, client_ip, client_port):
+        try:
+            self.reach_peer(client_ip, client_port)
+        finally:
+            with self.connect_cond:
+                self.connects_finished += 1
+                self.connect_cond.notify_all()
+
+    # a peer that doesn't come up within --connect-timeout is skipped like a dead one (cr: its successors instead)
+    def reach_peer(self, client_ip, client_port):
+        if self.core_client_logic(client_ip, client_port):
+            return True
+        if not self.watches_links():
+            return False
+        return self.connect_successors(self.successors_of((client_ip, client_port)), 1, self.connect_timeout)
+
+    # number of connected peers that makes the node ready
+    def peers_needed(self):
+        if self.ready_peers is None:
+            return len(self.peers)
+        return min(self.ready_peers, len(self.peers))
+
+    def report_ready(self):
+        self.ready = True
+        print(f"Ready: {len(self.clientSockets)} of {len(self.peers)} peers connected")
+        if self.can_rejoin() and self.clientSockets:
+            self.start_rejoin()  # joins the election once the peers answered
+        elif self.auto_elect is not None or self.rejoin_leader is not None:
+            self.join_election()
+
+    # messages that came in before we were ready go on (create_node holds them, --auto-elect / --state-dir),
+    # --auto-elect schedules our own start unless we know the leader
+    def join_election(self):
+        self.release_held()
+        if self.auto_elect is not None and not self.all_elected():
+            self.schedule(self.auto_elect_delay(), self.auto_elect_start, self.epoch)
+
+    # --auto-elect: how long a ready node waits before it starts the election itself
+    # ranked: the larger the uuid, the sooner (plus a little jitter), so the largest node usually starts first (after
+    # about window / n) and its candidate reaches the others before their turn - they have forwarded a larger
+    # candidate by then and stay quiet. random: anywhere in the window, the order of the uuids doesn't matter
+    def auto_elect_delay(self):
+        if self.auto_order == 'random':
+            return random.uniform(0, self.auto_elect)
+        rank = self.local_node_uuid.int / (1 << 128)
+        return self.auto_elect * (1 - rank) + random.uniform(0, self.auto_elect * AUTO_ELECT_JITTER)
+
+    def auto_elect_start(self, epoch):
+        if epoch != self.epoch or self.all_elected():
+            return  # the leader is known, or a newer epoch started (the re-election has its own initiator)
+        self.manual_trigger_election(auto=True)
+
+    # --state-dir: the state file of this node; a saved uuid / epoch / leader replace the new ones
+    def open_state(self, path, fsync):
+        self.state_file = StateFile(path, fsync)
+        saved = self.state_file.load()
+        if saved is not None:
+            self.local_node_uuid, self.epoch, self.rejoin_leader = saved
+            print(f"Restored {path}: uuid {self.local_node_uuid}, epoch {self.epoch}, last leader {self.rejoin_leader}")
+        self.save_state()
+
+    # the current uuid / epoch / leader into the state file (the leader once it is known, None during an election)
+    def save_state(self):
+        if self.state_file is not None:
+            self.state_file.save(self.local_node_uuid, self.epoch, self.leader_uuid if self.leader_flag else None)
+
+    def close_state(self):
+        if self.state_file is not None:
+            self.state_file.close()
+
+    # a restarted cr node that knew a leader asks its peers instead of starting an election around the whole ring
+    def can_rejoin(self):
+        return self.rejoin_leader is not None and self.algorithm == 'cr' and self.group_count == 1
+
+    # one query round: LEADER_QUERY to every peer, the first one that knows the leader decides; incoming election
+    # messages are held until then, so they are judged by the epoch the peers tell us
+    def start_rejoin(self):
+        with self.lock:
+            self.rejoining = True
+            self.rejoin_answers = {}
+            for link in self.clientSockets:
+                self.send_node_message(Message(self.rejoin_leader, 0, LEADER_QUERY, epoch=self.epoch or None), link)
+        print(f"Asking {len(self.clientSockets)} peer(s) for the leader (last known {self.rejoin_leader}, epoch {self.epoch})")
+        self.rejoin_timer = self.schedule(REJOIN_TIMEOUT, self.finish_rejoin)
+
+    # LEADER_QUERY: answer on the link it came from; LEADER_INFO: a peer's answer to our query
+    def rejoin_logic(self, message: Message, link):
+        if message.kind == LEADER_QUERY:
+            with self.lock:
+                known = self.all_elected()
+                answer = Message(self.leader_uuid if known else self.local_node_uuid, int(known), LEADER_INFO,
+                                 epoch=self.epoch or None)
+                self.send_node_message(answer, link)
+            return
+        with self.lock:
+            if not self.rejoining:
+                return  # decided already
+            self.rejoin_answers[link] = message
+            if message.flag != 1 and len(self.rejoin_answers) < len(self.clientSockets):
+                return  # another peer may know the leader
+        self.finish_rejoin()
+
+    # the answers are in (or REJOIN_TIMEOUT): take the leader and epoch a peer named, or join like a new node
+    # in the peers' epoch (ours is from before the restart)
+    def finish_rejoin(self):
+        with self.lock:
+            if not self.rejoining:
+                return
+            self.rejoining = False
+            answers = list(self.rejoin_answers.values())
+            known = [answer for answer in answers if answer.flag == 1]
+            if known:
+                answer = max(known, key=lambda answer: answer.epoch or 0)
+                self.epoch = answer.epoch or 0
+                self.leader_uuid, self.leader_flag = answer.received_uuid, True
+                self.announced = True
+            elif answers:
+                self.epoch = max(answer.epoch or 0 for answer in answers)
+        if self.rejoin_timer is not None:
+            self.rejoin_timer.cancel()
+        if not answers:
+            result = 'timeout'
+        elif not known:
+            result = 'unknown'
+        else:
+            result = 'confirmed' if self.leader_uuid == self.rejoin_leader else 'changed'
+        self.metrics.count('myle_rejoins_total', result=result)
+        print(f"Rejoin: {result} ({len(answers)} answer(s)), epoch {self.epoch}, leader {self.leader_uuid if known else None}")
+        if known:
+            log_message("Received", Message(self.leader_uuid, 1, epoch=self.epoch or None), "", "Leader Elected")
+        self.save_state()
+        self.join_election()
+        # with heartbeats the links stay open; the ring was repaired around us while we were down, so there is no
+        # watchdog until we take part in an election again
+        if known and not self.heartbeat_interval:
+            with self.batched_sends(), self.lock:
+                self.finish_election()
+
+    # seconds left until the per-peer deadline (None: no deadline)
+    def connect_time_left(self, deadline):
+        return None if deadline is None else deadline - time.monotonic()
 
     # separated core client logic to be used by both client_n_y_node and client_x_node
-    def core_client_logic(self, client_ip, client_port):
-        curr_clientSocket = socket(AF_INET, SOCK_STREAM)
-        time.sleep(5)
-        connectionEstablished = False
-        while not connectionEstablished:
+    # connect_timeout overrides self.connect_timeout (bypass connections must not wait forever)
+    def core_client_logic(self, client_ip, client_port, connect_timeout=None):
+        # connect as soon as the peer is listening, backing off between attempts
+        connect_timeout = self.connect_timeout if connect_timeout is None else connect_timeout
+        deadline = None if connect_timeout is None else time.monotonic() + connect_timeout
+        attempt = 0
+        while True:
             try:
-                curr_clientSocket.connect((client_ip, client_port))
-                connectionEstablished = True
-            except ConnectionRefusedError:
-                print("Connection refused, retrying...")
-                time.sleep(1)  # Wait before retrying
+                # AF_UNIX / shared memory if the peer is on this host and listens there, TCP otherwise
+                curr_clientSocket, transport = connect_link(client_ip, client_port, self.transport, self.socket_dir,
+                                                            self.own_ip(), self.connect_time_left(deadline))
+                curr_clientSocket.settimeout(None)
+                break
+            except (OSError, ValueError):  # ValueError: deadline already passed (negative timeout)
+                delay = backoff_delay(attempt)
+                left = self.connect_time_left(deadline)
+                if left is not None and left <= delay:
+                    print(f"Gave up on {client_ip}:{client_port} after {connect_timeout}s")
+                    return None
+                print(f"Connection refused, retrying in {delay:.2f}s...")
+                time.sleep(delay)  # Wait before retrying
+                attempt += 1
+
+        # wait briefly for the peer's greeting to agree on a wire format (old peers don't send one -> json)
+        try:
+            greeting = self.receive_greeting(curr_clientSocket)
+            self.socket_formats[curr_clientSocket] = negotiate_format(greeting, self.wire_format)
+            if greeting:
+                curr_clientSocket.sendall(handshake_ack(self.socket_formats[curr_clientSocket], self.local_node_uuid))
+                self.remember_peer(curr_clientSocket, parse_greeting(greeting))
+        except OSError as error:
+            print(f"Lost {client_ip}:{client_port} during the handshake: {error}")
+            curr_clientSocket.close()
+            return None
+        self.metrics.count('myle_connections_total', transport=transport)
+        print(f"Connected to {client_ip}:{client_port} over {transport} using {self.socket_formats[curr_clientSocket]} messages")
 
         # Store the outgoing socket for later use
-        self.clientSockets.append(curr_clientSocket)
+        self.link_addresses[curr_clientSocket] = (client_ip, client_port)
+        with self.connect_cond:
+            self.clientSockets.append(curr_clientSocket)
+        self.hs_link_added()
+
+        # HS messages also come back over our own connection (from the peer's side of the ring)
+        if self.algorithm == 'hs':
+            threading.Thread(target=self.read_connection, args=(curr_clientSocket,), daemon=True).start()
+        elif self.watches_links() or self.can_rejoin():
+            threading.Thread(target=self.watch_link, args=(curr_clientSocket,), daemon=True).start()
+        return curr_clientSocket
 
         '''
         # Send the initial election message using the outgoing socket
@@ -303,72 +1967,859 @@ class NodeState:
             print("Not Sending Initial Message...on this node....")
         '''
         
+    # our listen address, a peer with the same address runs on this host (transports.py)
+    def own_ip(self):
+        return self.server_address[0] if self.server_address else None
+
+    # keeps the peer's uuid and peers from its greeting (for re-connecting around it if it dies)
+    def remember_peer(self, link, hello):
+        try:
+            self.link_uuids[link] = uuid.UUID(hello['uuid'])
+        except (KeyError, ValueError, TypeError):
+            pass
+        self.link_peers[link] = [tuple(peer) for peer in hello.get('peers', [])]
+
+    # reads the greeting line the peer's server sends right after accepting (None if nothing arrives in time)
+    # only the greeting itself is consumed (peeked first), messages sent right after it stay in the socket
+    def receive_greeting(self, curr_clientSocket):
+        curr_clientSocket.settimeout(HANDSHAKE_TIMEOUT)
+        try:
+            while True:
+                data = curr_clientSocket.recv(1024, MSG_PEEK)
+                if not data:
+                    return None
+                newline = data.find(b"\n")
+                if newline != -1:
+                    return curr_clientSocket.recv(newline + 1)
+                if len(data) >= 1024:
+                    return None  # not a greeting
+                time.sleep(0.01)  # rest of the line not here yet
+        except timeout:
+            return None
+        finally:
+            curr_clientSocket.settimeout(None)
+
     # Helper function to send messages to a specified socket
     def send_node_message(self, message: Message, current_Socket=None):
         try:
-            log_message("Sent", message, "", "")
-            current_Socket.sendall(message.msg_to_json().encode()) # sendall is more reliable
+            if self.epoch:
+                message.epoch = self.epoch
+            if message.kind != HEARTBEAT:
+                log_message("Sent", message, "", "")
+                if self.tracing:
+                    self.trace_send(message, current_Socket)
+            if self.add_to_batch(message, current_Socket):
+                return  # goes out with the batch frame (--groups)
+            frame = message.encode(self.socket_formats.get(current_Socket, "json"))
+            if self.send_queue:
+                # the peer's sender sends it now, or queues it if the peer is behind (never waits for the peer)
+                self.sender(current_Socket).put(message_kind_name(message), coalescing_key(message), frame)
+                return
+            current_Socket.sendall(frame) # sendall is more reliable
+            self.count_sent(message, frame)
         except Exception as e:
+            self.metrics.count('myle_messages_dropped_total', reason='send_error')
             log_message("ClientSocket send error:", message, "", "", e)
+            self.link_failed(current_Socket)
+
+    def count_sent(self, message: Message, frame):
+        self.metrics.count('myle_messages_sent_total', kind=message_kind_name(message))
+        self.metrics.count('myle_bytes_sent_total', len(frame))
+
+    # a frame straight to the link, without a sender (--send-queue 0)
+    def write_frame(self, link, frame):
+        link.sendall(frame)
 
     # initiate election manually 
     # Separation of responsibility: from original core_client_logic implementation
-    def manual_trigger_election(self):
-        message = Message(received_uuid=self.local_node_uuid, flag=0)
+    # (auto: --auto-elect started it, groups that already take part in the election are skipped)
+    def manual_trigger_election(self, auto=False):
+        if self.election_started is None:
+            self.election_started = time.perf_counter()
+        if not self.tracing:
+            self.initiate_election(auto)
+            return
+        self.trace_context.trace = self.current_trace()
+        self.trace_context.hop = 0
+        self.trace_context.clock = self.trace_event('trigger', trace=trace_text(self.trace_context.trace))
+        try:
+            self.initiate_election(auto)
+        finally:
+            self.trace_context.__dict__.clear()
+
+    # starts the election of the selected algorithm on this node
+    # auto: initiator suppression - a cr group that already forwarded a candidate (a larger one, a smaller one made us
+    # send our own) doesn't start, its election is running and our candidate couldn't win or is already out
+    def initiate_election(self, auto=False):
+        if self.algorithm == 'hs':
+            self.hs_start()
+            return
+        if self.algorithm == 'floodmax':
+            self.floodmax_start()
+            return
         if not self.clientSockets:
             print("No client sockets available to send the election message.")
             return
-        for clientSocket in self.clientSockets:
-            log_message("Sent", message, "", "")
-            self.send_node_message(message, clientSocket)
-            
+        # one candidate per group (--groups), all of them in the same batch frames
+        with self.batched_sends(), self.lock:
+            for state in self.group_states():
+                if state.sent_own_uuid:
+                    continue  # already a candidate in this election
+                if auto:
+                    if state.max_forwarded is not None or state.leader_flag:
+                        self.metrics.count('myle_auto_elect_total', result='suppressed')
+                        continue
+                    self.metrics.count('myle_auto_elect_total', result='started')
+                state.sent_own_uuid = True
+                state.max_forwarded = max(state.max_forwarded or state.candidate, state.candidate)
+                message = Message(received_uuid=state.candidate, flag=0, group=state.group or None)
+                for clientSocket in self.clientSockets:
+                    self.send_node_message(message, clientSocket) # logs the "Sent" line
+
+    # answer to the control socket's status command (control.py)
+    # (leader is group 0's, --groups adds how many groups know their leader and, once all of them do, a digest of
+    # the leaders so nodes can be compared without listing thousands of uuids)
+    def control_status(self):
+        status = {'node': self.metrics.info.get('node'), 'uuid': str(self.local_node_uuid), 'ready': self.ready,
+                  'peers': len(self.clientSockets), 'leader': str(self.leader_uuid) if self.leader_flag else None,
+                  'epoch': self.epoch, 'algorithm': self.algorithm, 'sent': self.metrics.total('myle_messages_sent_total'),
+                  'groups': self.group_count, 'groups_elected': self.groups_elected + int(self.leader_flag),
+                  'auto_started': self.metrics.value('myle_auto_elect_total', result='started')}
+        if self.group_count > 1 and self.all_elected():
+            states = [self] + sorted(list(self.groups.values()), key=lambda state: state.group)
+            status['groups_led'] = sum(state.leader_uuid == state.candidate for state in states)
+            status['groups_digest'] = hashlib.sha1(b''.join(state.leader_uuid.bytes for state in states)).hexdigest()[:16]
+        return status
+
+    # runs function where the election code runs (control socket thread -> election)
+    def run_soon(self, function, *args):
+        function(*args)
+
+    # control socket quit: write the queued log lines, then exit without waiting for the connection threads
+    # (os._exit skips flushing stdout, which is a file when the launcher started us)
+    def shutdown(self):
+        log_writer.stop()
+        sys.stdout.flush()
+        self.close_state()
+        remove_socket_files(self.socket_files)
+        os._exit(0)
+
+
+# asyncio version of NodeState
+# one event loop handles the server, every accepted connection, the outgoing peer connections and retries,
+# instead of one thread per accepted connection + one Timer thread per retry.
+# leader_election_logic() is shared with the threaded version - only the I/O parts are overridden.
+# clientSockets holds asyncio StreamWriters instead of sockets.
+class AsyncNodeState(NodeState):
+    def __init__(self):
+        super().__init__()
+        self.loop = None         # event loop the node runs on (set in run())
+        self.local_nodes = None  # (ip, port) -> node hosted in the same process (NodeHost), reached over a LocalLink
+        self.local_servers = []  # AF_UNIX / shared-memory servers next to the TCP one (transports.py)
+
+    # retries / delayed work are callbacks on the event loop, no extra thread per retry
+    def schedule(self, delay, function, *args):
+        return self.loop.call_later(delay, function, *args)
+
+    # nothing on the loop blocks (bypass connects with coroutines), so it only has to wait for the current callback
+    def spawn(self, function, *args):
+        self.loop.call_soon(function, *args)
+
+    # the control socket runs in its own thread, the election code only on the loop
+    def run_soon(self, function, *args):
+        self.loop.call_soon_threadsafe(function, *args)
+
+    def start_announcer(self):
+        if self.announcer:
+            self.announcer.attach(self.loop, self.receive_datagram)
+
+    # asyncio server - every connection is a coroutine on the same loop
+    async def server(self, server_ip, server_port):
+        print("I am the Server---------- This is my ID:", self.local_node_uuid)
+        self.server_address = (server_ip, server_port)
+        for listener, shm in self.listen_local(server_ip, server_port):
+            if shm:
+                self.local_servers.append(await start_shm_server(self.handle_client_connection, listener))
+            else:
+                self.local_servers.append(await asyncio.start_unix_server(self.handle_client_connection, sock=listener))
+        serverSocket = await asyncio.start_server(self.handle_client_connection, server_ip, server_port)
+        print("The server is ready to receive")
+        return serverSocket
+
+    # same as the threaded handle_client_connection, one coroutine per connection
+    async def handle_client_connection(self, reader, writer):
+        writer.write(handshake_greeting(self.local_node_uuid, self.peers))
+        self.inboundSockets.append(writer)
+        self.socket_formats[writer] = self.wire_format
+        await self.read_connection(reader, writer)
+
+    # reads messages from one connection until it closes or the leader is known
+    async def read_connection(self, reader, writer):
+        frame_reader = FrameReader()
+        heard = False
+        # (reads until a message came like the threaded version: a connection opened after the election is a rejoin query)
+        while True:
+            log_message("Waiting", None, "", "")
+            try:
+                data = await reader.read(65536)
+            except OSError:
+                break
+            if not data:
+                break  # connection closed
+            messages = frame_reader.feed(data)
+            self.metrics.count('myle_bytes_received_total', len(data))
+            self.take_handshake(frame_reader, writer)
+            if not heard:
+                heard = True
+                self.hs_link_added(writer)
+            log_message("Raw", messages, "", "")
+            over = False
+            with self.batched_sends():
+                for message in messages:
+                    if message.kind != HEARTBEAT:
+                        log_message("Incoming", message, "", "", self.local_node_uuid)
+                    self.handle_message(message, writer) # call leader election process
+
+                    # If leader is elected (in every group), close connection (heartbeat mode keeps the ring open)
+                    if self.election_over():
+                        over = True
+                        break
+            if over:
+                break
+        if self.election_over():
+            self.ack_leader(writer)
+        self.close_link(writer)
+        if writer in self.inboundSockets:
+            self.inboundSockets.remove(writer)
+
+    # close client connections (StreamWriters) when no longer needed
+    def close_client_sockets(self):
+        for writer in self.clientSockets:
+            self.remember_closed(writer)
+            try:
+                self.close_link(writer)
+            except Exception as e:
+                print(f"Error closing client socket: {e}")
+        self.clientSockets = []
+        self.socket_formats = {}
+
+    async def client_n_y_node(self, client_ip, client_port):
+        await self.reach_peer(client_ip, client_port)
+        self.report_ready()
+
+    # one task per peer, same readiness rule as the threaded version
+    async def client_x_node(self):
+        pending = set()
+        for ip, port in self.peers:
+            print("current x node ip/port:", ip, port)
+            pending.add(self.loop.create_task(self.reach_peer(ip, port)))
+        needed = self.peers_needed()
+        while pending and len(self.clientSockets) < needed:
+            _, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        self.report_ready()
+
+    async def reach_peer(self, client_ip, client_port):
+        if await self.core_client_logic(client_ip, client_port):
+            return True
+        if not self.watches_links():
+            return False
+        return await self.connect_successors(self.successors_of((client_ip, client_port)), 1, self.connect_timeout)
+
+    # same backoff and per-peer deadline as the threaded version, but sleeping does not block the loop
+    async def core_client_logic(self, client_ip, client_port, connect_timeout=None):
+        if self.local_nodes and (client_ip, client_port) in self.local_nodes:
+            return self.connect_local(self.local_nodes[(client_ip, client_port)])
+        connect_timeout = self.connect_timeout if connect_timeout is None else connect_timeout
+        deadline = None if connect_timeout is None else time.monotonic() + connect_timeout
+        attempt = 0
+        while True:
+            try:
+                reader, writer, transport = await asyncio.wait_for(
+                    open_link(client_ip, client_port, self.transport, self.socket_dir, self.own_ip()),
+                    self.connect_time_left(deadline))
+                break
+            except (OSError, asyncio.TimeoutError):
+                delay = backoff_delay(attempt)
+                left = self.connect_time_left(deadline)
+                if left is not None and left <= delay:
+                    print(f"Gave up on {client_ip}:{client_port} after {connect_timeout}s")
+                    return None
+                print(f"Connection refused, retrying in {delay:.2f}s...")
+                await asyncio.sleep(delay)  # Wait before retrying
+                attempt += 1
+
+        # agree on a wire format from the peer's greeting (no greeting in time -> json)
+        try:
+            greeting = await asyncio.wait_for(reader.readline(), HANDSHAKE_TIMEOUT)
+        except asyncio.TimeoutError:
+            greeting = None
+        except OSError as error:
+            print(f"Lost {client_ip}:{client_port} during the handshake: {error}")
+            writer.close()
+            return None
+        self.socket_formats[writer] = negotiate_format(greeting, self.wire_format)
+        if greeting:
+            writer.write(handshake_ack(self.socket_formats[writer], self.local_node_uuid))
+            self.remember_peer(writer, parse_greeting(greeting))
+        self.metrics.count('myle_connections_total', transport=transport)
+        print(f"Connected to {client_ip}:{client_port} over {transport} using {self.socket_formats[writer]} messages")
+
+        # Store the outgoing stream for later use
+        self.link_addresses[writer] = (client_ip, client_port)
+        self.clientSockets.append(writer)
+        self.hs_link_added()
+
+        # HS messages also come back over our own connection
+        if self.algorithm == 'hs':
+            self.loop.create_task(self.read_connection(reader, writer))
+        elif self.watches_links() or self.can_rejoin():
+            self.loop.create_task(self.watch_stream(reader, writer))
+        return writer
+
+    # watch_link for a stream
+    async def watch_stream(self, reader, writer):
+        frame_reader = FrameReader()
+        try:
+            while True:
+                data = await reader.read(4096)
+                if not data:
+                    break
+                self.link_answered(writer, frame_reader, frame_reader.feed(data))
+        except OSError:
+            pass
+        if self.watches_links():
+            self.peer_down(writer)
+
+    def write_frame(self, writer, frame):
+        writer.write(frame)
+
+    def new_sender(self, link):
+        return AsyncPeerSender(link, self.metrics, self.sender_failed, self.send_queue, self.queue_policy)
+
+    # ack_leader on a stream (write() only buffers, the loop sends it before the close)
+    def ack_leader(self, writer):
+        if self.algorithm == 'cr':
+            writer.write(LEADER_ACK)
+
+    # in-memory connection to a node in the same process: no socket and no handshake,
+    # both ends learn each other's uuid (and our end the peer's peers) directly
+    def connect_local(self, peer):
+        link, back = LocalLink(peer), LocalLink(self)
+        link.reverse, back.reverse = back, link
+        self.link_uuids[link] = peer.local_node_uuid
+        self.link_peers[link] = list(peer.peers)
+        self.link_addresses[link] = peer.server_address
+        peer.inboundSockets.append(back)
+        peer.link_uuids[back] = self.local_node_uuid
+        print(f"Connected to {peer.server_address[0]}:{peer.server_address[1]} in memory")
+        self.clientSockets.append(link)
+        peer.hs_link_added(back)
+        self.hs_link_added()
+        return link
+
+    # a message handed over by LocalLink.send (the same rules as read_connection, without the bytes)
+    def receive_local(self, message: Message, link):
+        if self.election_over() and message.kind != LEADER_QUERY:
+            return  # a socket reader would have stopped reading by now (after answering a rejoin query)
+        self.handle_message(message, link)
+
+    # bypass() needs to await the new connections - run it as a task, messages are held until it is done
+    def bypass(self, dead_links):
+        self.loop.create_task(self.bypass_async(dead_links))
+
+    async def bypass_async(self, dead_links):
+        for link in dead_links:
+            print(f"Bypassing {self.link_uuids.get(link)}")
+            await self.connect_successors(self.successors_of(self.link_addresses.get(link), link))
+            self.drop_link(link)
+        self.release_held()
+
+    def reopen_links(self, addresses):
+        self.loop.create_task(self.reopen_links_async(addresses))
+
+    async def reopen_links_async(self, addresses):
+        for ip, port in addresses:
+            print(f"Reconnecting to {ip}:{port} for epoch {self.epoch}")
+            await self.connect_successors([(ip, port)], 0)
+        self.release_held()
+
+    # the threaded connect_successors with awaited connects
+    async def connect_successors(self, peers, skipped=1, timeout=None):
+        connected = False
+        for ip, port in peers:
+            if (ip, port) == self.server_address:
+                continue
+            print(f"Connecting to successor {ip}:{port}")
+            if await self.core_client_logic(ip, port, timeout or self.repair_timeout):
+                connected = True
+            elif skipped < self.successors - 1:
+                connected = await self.connect_successors(self.successors_of((ip, port)), skipped + 1, timeout) or connected
+        return connected
+
+    # write() only buffers the data, the loop flushes it in the background
+    # co-hosted peers get a copy of the message object instead of a frame (the sender keeps changing its message)
+    def send_node_message(self, message: Message, current_Socket=None):
+        try:
+            if self.epoch:
+                message.epoch = self.epoch
+            if message.kind != HEARTBEAT:
+                log_message("Sent", message, "", "")
+                if self.tracing:
+                    self.trace_send(message, current_Socket)
+            if isinstance(current_Socket, LocalLink):
+                current_Socket.send(copy.copy(message))
+                self.metrics.count('myle_messages_sent_total', kind=message_kind_name(message))
+                return
+            if self.add_to_batch(message, current_Socket):
+                return
+            frame = message.encode(self.socket_formats.get(current_Socket, "json"))
+            if self.send_queue:
+                self.sender(current_Socket).put(message_kind_name(message), coalescing_key(message), frame)
+                return
+            current_Socket.write(frame)
+            self.count_sent(message, frame)
+        except Exception as e:
+            self.metrics.count('myle_messages_dropped_total', reason='send_error')
+            log_message("ClientSocket send error:", message, "", "", e)
+            self.link_failed(current_Socket)
+
+    # runs the whole node: server, outgoing connections, then the [Enter] prompt
+    async def run(self, server_ip, server_port, client_ip, client_port, prompt=True):
+        self.loop = asyncio.get_running_loop()
+        self.start_announcer()
+        serverSocket = await self.server(server_ip, server_port)
+
+        # outgoing connections retry with backoff until the peers are listening
+        if self.node_type == 'x':
+            await self.client_x_node()
+        else:
+            await self.client_n_y_node(client_ip, client_port)
+
+        # input() blocks, so it runs in the loop's executor while the loop keeps serving connections
+        if prompt:
+            user_input = await self.loop.run_in_executor(None, input, "Press [Enter] to initiate the election on this node, or type 'no' to skip: ")
+            if user_input.strip().lower() != 'no':
+                self.manual_trigger_election()
+
+        # keep serving (same as server_thread.join())
+        async with serverSocket:
+            await serverSocket.serve_forever()
+
+
+# one direction of an in-memory connection between two nodes of the same NodeHost, used where a StreamWriter would be
+# messages are delivered by a callback on the shared loop (never recursively, a ring would recurse all the way round)
+class LocalLink:
+    def __init__(self, node):
+        self.node = node      # receiving end
+        self.reverse = None   # the link the receiving end answers on
+        self.closed = False
+
+    def send(self, message: Message):
+        if self.closed:
+            raise ConnectionResetError("local link is closed")
+        self.node.loop.call_soon(self.node.receive_local, message, self.reverse)
+
+    # like closing a socket, both directions stop
+    def close(self):
+        self.closed = self.reverse.closed = True
+
+
+# several nodes of one topology in a single process (--ids) on one event loop
+# links between them are LocalLinks, links to nodes in other processes stay TCP connections (every node still listens)
+class NodeHost:
+    def __init__(self, nodes, initiators):
+        self.nodes = nodes            # node id -> AsyncNodeState
+        self.initiators = initiators  # node ids the election is started on ([Enter] / control socket elect)
+        self.loop = None
+        local_nodes = {}
+        for node in nodes.values():
+            node.local_nodes = local_nodes
+            local_nodes[node.server_address] = node
+
+    async def run(self, prompt=True):
+        self.loop = asyncio.get_running_loop()
+        servers = []
+        for node in self.nodes.values():
+            node.loop = self.loop
+            node.start_announcer()
+            servers.append(await node.server(*node.server_address))  # every server is up before anyone connects
+        await asyncio.gather(*(node.client_x_node() if node.node_type == 'x' else node.client_n_y_node(*node.peers[0])
+                               for node in self.nodes.values()))
+        print(f"Ready: {len(self.nodes)} nodes")
+
+        if prompt:
+            user_input = await self.loop.run_in_executor(None, input, f"Press [Enter] to initiate the election on node(s) {format_ids(self.initiators)}, or type 'no' to skip: ")
+            if user_input.strip().lower() != 'no':
+                self.manual_trigger_election()
+        await asyncio.gather(*(server.serve_forever() for server in servers))
+
+    def manual_trigger_election(self):
+        for node_id in self.initiators:
+            self.nodes[node_id].manual_trigger_election()
+
+    # the control socket's status over all hosted nodes: ready / leader once every node is ready / knows it
+    # (nodes that disagree show up as a comma separated leader list)
+    def control_status(self):
+        statuses = [node.control_status() for node in self.nodes.values()]
+        leaders = {status['leader'] for status in statuses}
+        return {'nodes': {status['node']: status['uuid'] for status in statuses},
+                'ready': all(status['ready'] for status in statuses),
+                'peers': sum(status['peers'] for status in statuses),
+                'leader': None if None in leaders else ','.join(sorted(leaders)),
+                'epoch': max(status['epoch'] for status in statuses),
+                'algorithm': statuses[0]['algorithm'],
+                'sent': sum(status['sent'] for status in statuses),
+                'groups': statuses[0]['groups'],
+                'groups_elected': min(status['groups_elected'] for status in statuses),
+                'auto_started': sum(status['auto_started'] for status in statuses),
+                **({'groups_digest': ','.join(sorted({status['groups_digest'] for status in statuses}))}
+                   if all('groups_digest' in status for status in statuses) else {})}
+
+    def run_soon(self, function, *args):
+        self.loop.call_soon_threadsafe(function, *args)
+
+    def shutdown(self):
+        log_writer.stop()
+        sys.stdout.flush()
+        for node in self.nodes.values():
+            node.close_state()
+            remove_socket_files(node.socket_files)
+        os._exit(0)
+
+
+# node ids from "1-50,60" or "all"
+def parse_ids(text, topology):
+    if text == 'all':
+        return sorted(topology)
+    ids = []
+    for part in text.split(','):
+        first, _, last = part.partition('-')
+        ids += range(int(first), int(last or first) + 1)
+    unknown = [node_id for node_id in ids if node_id not in topology]
+    if unknown:
+        raise ValueError(f'nodes {format_ids(unknown)} are not in the topology')
+    return sorted(set(ids))
+
+# the other way round, [1, 2, 3, 7] -> "1-3,7"
+def format_ids(ids):
+    ranges = []
+    for node_id in sorted(ids):
+        if ranges and ranges[-1][1] == node_id - 1:
+            ranges[-1][1] = node_id
+        else:
+            ranges.append([node_id, node_id])
+    return ','.join(str(first) if first == last else f'{first}-{last}' for first, last in ranges)
+
+
+# argparse type for node numbers
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"{value} is not a positive node number")
+    return number
+
+
+# NodeState for one node with the options from the command line (node number / uuid go into the metrics info)
+def create_node(args, node_number, node_type, server_address, peers):
+    node = AsyncNodeState() if args.engine == 'asyncio' or args.ids is not None else NodeState()
+    node.node_type = node_type
+    node.algorithm = args.algorithm
+    node.wire_format = args.wire
+    node.connect_timeout = args.connect_timeout
+    node.ready_peers = args.ready_peers
+    node.suppression = not args.no_suppression
+    node.tracing = args.trace
+    node.heartbeat_interval = args.heartbeat_interval
+    node.suspicion_timeout = args.suspicion_timeout or (3 * args.heartbeat_interval if args.heartbeat_interval else None)
+    node.server_address = server_address
+    node.transport = args.transport
+    node.socket_dir = args.socket_dir
+    node.successors = args.successors
+    node.repair_timeout = args.repair_timeout
+    node.send_queue = args.send_queue
+    node.queue_policy = args.queue_policy
+    node.group_count = args.groups
+    node.batching = args.groups > 1 and not args.no_batch
+    node.auto_elect = args.auto_elect
+    node.auto_order = args.auto_order
+    if args.state_dir:
+        node.open_state(os.path.join(args.state_dir, f'node_{node_number}.state'), args.state_fsync)
+    if args.auto_elect is not None or node.rejoin_leader is not None:
+        node.holding = 1  # until report_ready / the rejoin: without peers a candidate would wait a whole retry delay
+    if args.announce:
+        node.announcer = Announcer(*args.announce, args.announce_key.encode(), server_address[0])
+        node.announce_timeout = args.announce_timeout
+
+    # Add outgoing peers to the client peer list
+    for peer_ip, peer_port in peers:
+        node.add_peer(peer_ip, peer_port)
+
+    node.metrics.info = {'node': node_number, 'type': node_type, 'uuid': node.local_node_uuid,
+                         'algorithm': args.algorithm, 'engine': args.engine}
+    node.metrics.gauge('myle_epoch', 'Current election epoch', lambda: node.epoch)
+    node.metrics.gauge('myle_leader_known', '1 once this node knows the leader', lambda: int(node.leader_flag))
+    node.metrics.gauge('myle_connected_peers', 'Outgoing peer connections', lambda: len(node.clientSockets))
+    return node
+
+
+# --ids: all the selected nodes of the topology in this process (NodeHost)
+def run_host(parser, args, topology, rounds):
+    try:
+        ids = parse_ids(args.ids, topology)
+        initiators = parse_ids(args.initiators, topology) if args.initiators else ids[:1]
+    except ValueError as error:
+        parser.error(str(error))
+    if not set(initiators) <= set(ids):
+        parser.error('--initiators have to be hosted nodes (--ids)')
+
+    # one log file for the process, the lines of all hosted nodes are mixed
+    setup_log_for_node(f'host_{ids[0]}', args.log_writer, LOG_VERBOSITY[args.console], LOG_VERBOSITY[args.log_level], args.trace,
+                       keep=args.state_dir is not None)
+    nodes = {}
+    for node_id in ids:
+        server_ip, server_port, neighbours = topology[node_id]
+        try:
+            node = create_node(args, node_id, topology_node_type(topology, node_id), (server_ip, server_port),
+                               [topology[neighbour][:2] for neighbour in neighbours])
+        except OSError as error:
+            parser.error(f'announcement sockets: {error}')
+        node.flood_rounds = rounds
+        node.flood_in_degree = topology_in_degree(topology, node_id)
+        node.successor_map = topology_successors(topology, node_id, args.successors)
+        nodes[node_id] = node
+    host = NodeHost(nodes, initiators)
+    print(f"Hosting nodes {format_ids(ids)} of {args.topology} ({len(ids)} of {len(topology)})")
+
+    try:
+        if args.control_port is not None:
+            control_server = serve_control_tcp(host, '127.0.0.1', args.control_port)
+            print(f"Control: 127.0.0.1:{control_server.server_address[1]}")
+        if args.control_socket:
+            serve_control_unix(host, args.control_socket)
+            print(f"Control: unix socket {args.control_socket}")
+    except OSError as error:
+        parser.error(f'control socket: {error}')
+    asyncio.run(host.run(prompt=not args.no_prompt and args.auto_elect is None))
 
 
 def main():
 
     # Parse command-line arguments for customized node type and config file
     parser = argparse.ArgumentParser(description='Start the node process')
-    parser.add_argument('node_type', choices=['x', 'y', 'n'], help='Node type: x, y, or n')
-    parser.add_argument('node_number', type=int, choices=range(1, 6), help='Node number (1 to 5)')
+    parser.add_argument('node_type', nargs='?', choices=['x', 'y', 'n'], help='Node type: x, y, or n')
+    parser.add_argument('node_number', nargs='?', type=positive_int, help='Node number (1 to 5 in the example topology) - selects config<number>.txt')
+    parser.add_argument('--topology', help='topology file describing the whole network (instead of node type / config<number>.txt)')
+    parser.add_argument('--id', type=positive_int, help='this node\'s id in the --topology file')
+    parser.add_argument('--engine', choices=['threads', 'asyncio'], default='threads',
+                        help='threads: one thread per connection (default), asyncio: single event loop')
+    parser.add_argument('--wire', choices=['binary', 'json'], default='binary',
+                        help='preferred message format, binary is only used with peers that announce support for it')
+    parser.add_argument('--transport', choices=TRANSPORTS, default='auto',
+                        help='auto: peers on this host are reached over AF_UNIX sockets, others over TCP (default), '
+                             'shm: shared-memory ring buffers to peers on this host that use shm as well, tcp: TCP only '
+                             '(see transports.py)')
+    parser.add_argument('--socket-dir', default=SOCKET_DIR,
+                        help=f'directory of the AF_UNIX listeners of the nodes on this host (default {SOCKET_DIR})')
+    parser.add_argument('--uuid', type=uuid.UUID, help='use this UUID instead of a random one (benchmarks)')
+    parser.add_argument('--connect-timeout', type=float,
+                        help='give up on a peer that is not reachable after this many seconds (default: keep trying)')
+    parser.add_argument('--successors', type=positive_int, default=SUCCESSORS,
+                        help='cr: a node that loses a peer connects to the peer\'s successors instead, skipping up to '
+                             f'this many - 1 dead nodes in a row (default {SUCCESSORS}, 1 = no repair)')
+    parser.add_argument('--repair-timeout', type=float, default=REPAIR_TIMEOUT,
+                        help=f'seconds to reach a successor when connecting around a dead node (default {REPAIR_TIMEOUT})')
+    parser.add_argument('--send-queue', type=int, default=SEND_QUEUE,
+                        help=f'frames queued per peer that is behind (default {SEND_QUEUE}); 0 sends with a blocking '
+                             'sendall from the election code like before, so one stuck peer stops the node')
+    parser.add_argument('--queue-policy', choices=POLICIES, default='coalesce',
+                        help='a slow peer\'s queue: coalesce drops queued cr candidates once a larger one is queued '
+                             '(default), drop-oldest drops the oldest frame of a full queue, block waits for room '
+                             '(see outbound.py)')
+    parser.add_argument('--groups', type=int, default=1,
+                        help='elect a leader for each of this many groups (shards) over the same connections; the '
+                             'elections run at the same time and their messages share batch frames (cr only, default 1)')
+    parser.add_argument('--no-batch', action='store_true',
+                        help='--groups: send every group message in its own frame, for comparing')
+    parser.add_argument('--ready-peers', type=positive_int,
+                        help='show the prompt once this many peers are connected (default: all of them)')
+    parser.add_argument('--no-suppression', action='store_true',
+                        help='forward every candidate like the original code (cr), for comparing message counts')
+    parser.add_argument('--heartbeat-interval', type=float,
+                        help='keep the connections open after the election, the leader sends a heartbeat every this many seconds '
+                             'and a new election starts when they stop (cr only)')
+    parser.add_argument('--suspicion-timeout', type=float,
+                        help='seconds without a heartbeat before the leader is considered dead (default: 3 heartbeat intervals)')
+    parser.add_argument('--log-writer', choices=['queue', 'sync'], default='queue',
+                        help='queue: a background thread writes the console / log file lines in batches (default), '
+                             'sync: print and log on the election thread')
+    parser.add_argument('--console', choices=list(LOG_VERBOSITY), default='messages',
+                        help='message lines echoed to the console: every message (default), only the leader, or none')
+    parser.add_argument('--log-level', choices=list(LOG_VERBOSITY), default='messages',
+                        help='message lines written to node_<N>_log.txt: every message (default), only the leader, or none')
+    parser.add_argument('--metrics-port', type=int,
+                        help='serve counters / latency histograms in the Prometheus text format on http://<metrics-host>:<port>/metrics')
+    parser.add_argument('--metrics-host', default='127.0.0.1', help='address for --metrics-port (default 127.0.0.1)')
+    parser.add_argument('--metrics-socket', help='serve the same metrics over HTTP on this Unix socket path')
+    parser.add_argument('--trace', action='store_true',
+                        help='carry a trace id, hop count and Lamport clock in every message and write causal trace events '
+                             'to node_<N>_trace.jsonl (see tools/election_trace.py)')
+    parser.add_argument('--control-port', type=int,
+                        help='accept status / elect / quit commands on 127.0.0.1:<port> (see control.py and launcher.py)')
+    parser.add_argument('--control-socket', help='accept the same commands on this Unix socket path')
+    parser.add_argument('--no-prompt', action='store_true',
+                        help='don\'t ask whether to start the election (it is started over the control socket instead)')
+    parser.add_argument('--auto-elect', type=float, nargs='?', const=AUTO_ELECT_WINDOW, metavar='SECONDS',
+                        help='no prompt: every node starts the election itself within SECONDS of being ready (default '
+                             f'{AUTO_ELECT_WINDOW}), unless it already forwarded a candidate (cr)')
+    parser.add_argument('--auto-order', choices=['ranked', 'random'], default='ranked',
+                        help='--auto-elect: ranked - larger uuids start first, so the others usually stay quiet (default), '
+                             'random - uniform jitter over the window')
+    parser.add_argument('--state-dir',
+                        help='keep this node\'s uuid, epoch and last leader in DIR/node_<N>.state across restarts; a '
+                             'restarted cr node asks its peers for the leader instead of waiting for a new election')
+    parser.add_argument('--state-fsync', choices=FSYNC_POLICIES, default='always',
+                        help='--state-dir: fsync every record (always, default), at most once a second (interval), '
+                             'or leave it to the OS (never)')
+    parser.add_argument('--announce', metavar='ADDR:PORT',
+                        help='the leader announces itself with one signed UDP datagram to this multicast group / broadcast '
+                             'address, the ring announcement only goes to nodes that don\'t ack it (cr only, see announce.py)')
+    parser.add_argument('--announce-key', default='myle',
+                        help='shared secret the announcement datagrams are signed with (default: myle)')
+    parser.add_argument('--announce-timeout', type=float, default=ANNOUNCE_TIMEOUT,
+                        help=f'seconds the leader waits for acks before the ring fallback (default {ANNOUNCE_TIMEOUT})')
+    parser.add_argument('--ids',
+                        help='run several nodes of the --topology file in this process, e.g. 1-100 or all (asyncio engine, '
+                             'messages between them are handed over in memory, other nodes are reached over the --transport)')
+    parser.add_argument('--initiators',
+                        help='--ids: nodes that start the election on [Enter] / the control socket\'s elect (default: the first one)')
+    parser.add_argument('--algorithm', choices=['cr', 'hs', 'floodmax'], default='cr',
+                        help='cr: Chang-Roberts around the ring (default), hs: Hirschberg-Sinclair O(n log n) over both directions, '
+                             'floodmax: FloodMax for any network (use with --topology)')
     args = parser.parse_args()
 
+    if args.initiators and args.ids is None:
+        parser.error('--initiators only works with --ids (single nodes are started with [Enter] / elect)')
+    if args.ids is not None:
+        if not args.topology or args.id is not None:
+            parser.error('--ids needs --topology (instead of --id)')
+        if args.uuid or args.metrics_port is not None or args.metrics_socket:
+            parser.error('--uuid and the metrics endpoints are per node, they don\'t work with --ids')
+    if args.topology:
+        if args.id is None and args.ids is None:
+            parser.error('--topology needs --id')
+        try:
+            topology = read_topology_file(args.topology)
+            rounds = topology_diameter(topology)
+        except (OSError, ValueError) as error:
+            parser.error(str(error))
+        if args.ids is None:
+            if args.id not in topology:
+                parser.error(f'node {args.id} is not in {args.topology}')
+            args.node_number = args.id
+            args.node_type = topology_node_type(topology, args.id)
+            server_ip, server_port, neighbours = topology[args.id]
+            peers = [topology[neighbour][:2] for neighbour in neighbours]
+    elif args.node_type is None or args.node_number is None:
+        parser.error('give node_type and node_number, or --topology FILE --id N')
+    if args.algorithm == 'floodmax' and not args.topology:
+        parser.error('--algorithm floodmax needs --topology (it has to know the network diameter)')
+    if args.heartbeat_interval and args.algorithm != 'cr':
+        parser.error('--heartbeat-interval only works with --algorithm cr')
+    if args.groups < 1:
+        parser.error('--groups needs at least 1 group')
+    if args.auto_elect is not None and args.auto_elect < 0:
+        parser.error('--auto-elect needs a window of 0 seconds or more')
+    if args.groups > 1 and (args.algorithm != 'cr' or args.heartbeat_interval or args.announce):
+        parser.error('--groups only works with --algorithm cr, without --heartbeat-interval and --announce')
+    if args.announce:
+        if args.algorithm != 'cr':
+            parser.error('--announce only works with --algorithm cr')
+        group, _, port = args.announce.rpartition(':')
+        try:
+            args.announce = (str(ipaddress.ip_address(group)), int(port))
+        except ValueError:
+            parser.error(f'--announce {args.announce}: expected ADDR:PORT, e.g. 239.255.77.77:5099')
+
+    if args.ids is not None:
+        run_host(parser, args, topology, rounds)
+        return
+
     # Setup log file for the specific node
-    setup_log_for_node(args.node_number)
+    setup_log_for_node(args.node_number, args.log_writer, LOG_VERBOSITY[args.console], LOG_VERBOSITY[args.log_level], args.trace,
+                       keep=args.state_dir is not None)
 
-    # Read configuration from the respective config file
-    config_values = read_config_file(args.node_number)
+    if not args.topology:
+        # Read configuration from the respective config file
+        config_values = read_config_file(args.node_number)
 
-    # Unpack config values
-    if len(config_values) == 4:
-        # unpack for n and y nodes
-        server_ip, server_port, client_ip, client_port = config_values
-        additional_client_ip, additional_client_port = None, None
-    elif len(config_values) == 6:
-        # unpack for x nodes
-        server_ip, server_port, client_ip, client_port, additional_client_ip, additional_client_port = config_values
+        # Unpack config values
+        if len(config_values) == 4:
+            # unpack for n and y nodes
+            server_ip, server_port, client_ip, client_port = config_values
+            peers = [(client_ip, client_port)]
+        elif len(config_values) == 6:
+            # unpack for x nodes
+            server_ip, server_port, client_ip, client_port, additional_client_ip, additional_client_port = config_values
+            peers = [(client_ip, client_port), (additional_client_ip, additional_client_port)]
 
     # print functions to identify node config on run
     print(f"Node {args.node_number} ({args.node_type}) Configuration:")
     print(f"  Server IP: {server_ip}, Server Port: {server_port}")
+    client_ip, client_port = peers[0] if peers else (None, None)
     print(f"  Client IP: {client_ip}, Client Port: {client_port}")
-    if additional_client_ip:
+    for additional_client_ip, additional_client_port in peers[1:]:
         print(f"  Additional Peer IP: {additional_client_ip}, Port: {additional_client_port}")
 
-    # Create shared state for this node
-    sharedState = NodeState()
+    # Create shared state for this node (asyncio engine: everything runs on one event loop)
+    try:
+        sharedState = create_node(args, args.node_number, args.node_type, (server_ip, server_port), peers)
+    except OSError as error:
+        parser.error(f'announcement sockets: {error}')
+    if args.uuid:
+        sharedState.local_node_uuid = args.uuid
+        sharedState.metrics.info['uuid'] = args.uuid
+        sharedState.save_state()
+    if args.topology:
+        sharedState.flood_rounds = rounds
+        sharedState.flood_in_degree = topology_in_degree(topology, args.id)
+        sharedState.successor_map = topology_successors(topology, args.id, args.successors)
+    else:
+        config_topology = read_config_topology()
+        if args.node_number in config_topology:
+            sharedState.successor_map = topology_successors(config_topology, args.node_number, args.successors)
 
-    # Add outgoing peers to the client peer list
-    sharedState.add_peer(client_ip, client_port)
-    if additional_client_ip:
-        sharedState.add_peer(additional_client_ip, additional_client_port)
+    # optional metrics endpoints (they only read the counters, election code never waits for them)
+    try:
+        if args.metrics_port is not None:
+            metrics_server = serve_metrics_http(sharedState.metrics, args.metrics_host, args.metrics_port)
+            print(f"Metrics: http://{args.metrics_host}:{metrics_server.server_address[1]}/metrics")
+        if args.metrics_socket:
+            serve_metrics_unix(sharedState.metrics, args.metrics_socket)
+            print(f"Metrics: unix socket {args.metrics_socket}")
+    except OSError as error:
+        parser.error(f'metrics endpoint: {error}')
+    try:
+        if args.control_port is not None:
+            control_server = serve_control_tcp(sharedState, '127.0.0.1', args.control_port)
+            print(f"Control: 127.0.0.1:{control_server.server_address[1]}")
+        if args.control_socket:
+            serve_control_unix(sharedState, args.control_socket)
+            print(f"Control: unix socket {args.control_socket}")
+    except OSError as error:
+        parser.error(f'control socket: {error}')
+
+    if args.engine == 'asyncio':
+        asyncio.run(sharedState.run(server_ip, server_port, client_ip, client_port,
+                                    prompt=not args.no_prompt and args.auto_elect is None))
+        return
+
+    sharedState.start_announcer()
 
     # Start the server thread (always runs)
     server_thread = threading.Thread(target=sharedState.server, args=(server_ip, server_port))
     server_thread.start()
 
-    # Delay to ensure server is up before client starts
-    time.sleep(20)
-    
+    # no fixed delay: the client retries with backoff until its peers are listening
     # Determine which specialized client function to run
     if args.node_type == 'x':
         client_thread = threading.Thread(target=sharedState.client_x_node)
@@ -378,10 +2829,11 @@ def main():
     client_thread.start()
     client_thread.join()
 
-    # Decide who should inititate the election
-    user_input = input("Press [Enter] to initiate the election on this node, or type 'no' to skip: ").strip().lower()
-    if user_input != 'no':
-        sharedState.manual_trigger_election()
+    # Decide who should inititate the election (--auto-elect: every node on its own, nobody at the keyboard)
+    if not args.no_prompt and args.auto_elect is None:
+        user_input = input("Press [Enter] to initiate the election on this node, or type 'no' to skip: ").strip().lower()
+        if user_input != 'no':
+            sharedState.manual_trigger_election()
 
     # Wait for server thread (keeps running)
     server_thread.join()
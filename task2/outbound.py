@@ -0,0 +1,231 @@
+# Per-peer outbound queues for myleprocess.py (--send-queue, --queue-policy)
+#
+# The election code runs under NodeState.lock and used to sendall() every message itself, so one peer that stopped
+# reading blocked the node: no other connection was served until that peer's socket buffer had room again.
+# Now the election code only hands the frame to the peer's sender:
+#   - if nothing is queued for the peer and the socket takes the frame without waiting, it is sent right away
+#     (the usual case: no thread switch, same latency as before)
+#   - otherwise it is queued, and a thread (threads engine) / task (asyncio engine) of that peer writes the queue
+#     out in batches, one sendall / write per batch
+# What happens to a message for a slow peer (--queue-policy):
+#   coalesce     (default) a queued cr candidate is dropped as soon as a larger candidate of the same epoch and
+#                group (--groups) is queued behind it - it can't win once the larger one passed the same link. Equal
+#                candidates are kept (the second sighting of the own uuid decides cr). If the queue is still full the
+#                oldest frame is dropped. Batch frames (--groups) are never coalesced.
+#   drop-oldest  a full queue drops its oldest frame
+#   block        a full queue makes the election code wait for room (backpressure; the asyncio engine can't wait,
+#                its queue keeps growing instead)
+# Announcements (flag=1), heartbeats and HS / FloodMax messages are never coalesced, only dropped from a full queue.
+
+import asyncio
+import collections
+import socket
+import threading
+
+POLICIES   = ['coalesce', 'drop-oldest', 'block']
+SEND_QUEUE = 1024  # default --send-queue: frames queued per peer
+
+
+# what a frame can be coalesced by: ((epoch, group), candidate uuid) for a cr candidate, None for anything else
+def coalescing_key(message):
+    if message.kind is None and message.flag == 0:
+        return ((message.epoch or 0, message.group or 0), message.received_uuid)
+    return None
+
+
+# the frames waiting for one peer and the --queue-policy (shared by both senders)
+class OutboundQueue:
+    def __init__(self, size, policy, metrics):
+        self.size = size
+        self.policy = policy
+        self.metrics = metrics
+        self.entries = collections.deque()  # (message kind name, coalescing key, frame, messages in the frame)
+
+    def full(self):
+        return len(self.entries) >= self.size
+
+    def add(self, kind, key, frame, count=1):
+        if key is not None and self.policy == 'coalesce' and self.entries:
+            self.coalesce(key)
+        if self.full() and self.policy != 'block':
+            dropped = self.entries.popleft()
+            self.metrics.count('myle_messages_dropped_total', dropped[3], reason='queue_full')
+        self.entries.append((kind, key, frame, count))
+
+    # drops the queued candidates of key's election (epoch and group) that are smaller than key's candidate
+    def coalesce(self, key):
+        election, candidate = key
+        kept = [entry for entry in self.entries
+                if entry[1] is None or entry[1][0] != election or entry[1][1] >= candidate]
+        if len(kept) < len(self.entries):
+            self.metrics.count('myle_messages_coalesced_total', len(self.entries) - len(kept))
+            self.entries = collections.deque(kept)
+
+    def take(self):
+        batch, self.entries = self.entries, collections.deque()
+        return batch
+
+
+# count > 1: a batch frame (myleprocess.py --groups)
+def count_sent(metrics, kind, frame, count=1):
+    metrics.count('myle_messages_sent_total', count, kind=kind)
+    metrics.count('myle_bytes_sent_total', len(frame))
+
+
+# threads engine: one per outgoing socket (or ShmLink), the thread only starts once the peer falls behind
+class PeerSender:
+    def __init__(self, link, metrics, failed, size=SEND_QUEUE, policy='coalesce'):
+        self.link = link
+        self.metrics = metrics
+        self.failed = failed         # failed(link, error): a send from the thread failed, the sender is stopped
+        self.queue = OutboundQueue(size, policy, metrics)
+        self.cond = threading.Condition()
+        self.rest = b''              # the part of a frame the socket didn't take, goes out before the queue
+        self.sending = False         # the thread is in sendall (a frame sent directly now would overtake it)
+        self.closing = False         # close the link once everything is sent
+        self.stopped = False
+        self.thread = None
+
+    # called by the election code (which may hold the node lock): never waits, except for policy block
+    def put(self, kind, key, frame, count=1):
+        with self.cond:
+            if self.stopped or self.closing:
+                raise ConnectionResetError("peer sender is stopped")
+            if not self.sending and not self.rest and not self.queue.entries:
+                sent = self.send_now(frame)
+                if sent:
+                    count_sent(self.metrics, kind, frame, count)
+                    if sent < len(frame):
+                        self.rest = frame[sent:]
+                        self.wake()
+                    return
+            while self.queue.policy == 'block' and self.queue.full() and not self.stopped:
+                self.cond.wait()
+            if self.stopped:
+                raise ConnectionResetError("peer sender is stopped")
+            self.queue.add(kind, key, frame, count)
+            self.wake()
+
+    # as much of frame as the socket takes without waiting
+    def send_now(self, frame):
+        try:
+            return self.link.send(frame, socket.MSG_DONTWAIT)
+        except BlockingIOError:
+            return 0
+
+    # caller holds self.cond
+    def wake(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+        self.cond.notify_all()
+
+    def run(self):
+        while True:
+            with self.cond:
+                while not (self.rest or self.queue.entries or self.closing or self.stopped):
+                    self.cond.wait()
+                if self.stopped:
+                    return
+                if not (self.rest or self.queue.entries):
+                    break  # closing, everything is out
+                rest, self.rest = self.rest, b''
+                batch = self.queue.take()
+                self.sending = True
+                self.cond.notify_all()  # room for a put waiting on a full queue (block)
+            try:
+                self.link.sendall(rest + b''.join(entry[2] for entry in batch))
+            except OSError as error:
+                with self.cond:
+                    self.stopped, self.sending = True, False
+                    self.cond.notify_all()
+                self.failed(self.link, error)
+                return
+            for kind, _, frame, count in batch:
+                count_sent(self.metrics, kind, frame, count)
+            with self.cond:
+                self.sending = False
+        self.link.close()
+
+    # close the link after the queued frames (e.g. the leader announcement) are sent
+    def close(self):
+        with self.cond:
+            if self.thread is None and not self.rest and not self.queue.entries:
+                self.stopped = True
+                self.link.close()
+                return
+            self.closing = True
+            self.wake()
+
+    # the peer is gone: drop the queue and close the link now
+    def stop(self):
+        with self.cond:
+            self.stopped = True
+            self.queue.take()
+            self.cond.notify_all()
+        self.link.close()
+
+
+# bytes a writer has not handed to the kernel yet (a StreamWriter's transport, or a ShmStream itself)
+def write_buffer_size(writer):
+    return getattr(writer, 'transport', writer).get_write_buffer_size()
+
+# asyncio engine: write() never blocks the loop, but a slow peer's transport buffer used to grow without a limit.
+# Frames for a peer whose buffer is not empty are queued (and coalesced) until a task has drained it
+class AsyncPeerSender:
+    def __init__(self, writer, metrics, failed, size=SEND_QUEUE, policy='coalesce'):
+        self.writer = writer
+        self.metrics = metrics
+        self.failed = failed
+        self.queue = OutboundQueue(size, policy, metrics)
+        self.draining = None         # the task waiting for the peer to take the buffered bytes
+        self.closing = False
+        self.stopped = False
+        transport = getattr(writer, 'transport', None)
+        if transport is not None:
+            transport.set_write_buffer_limits(high=0)  # drain() returns once the buffer is empty
+
+    def put(self, kind, key, frame, count=1):
+        if self.stopped or self.closing:
+            raise ConnectionResetError("peer sender is stopped")
+        if self.draining is None:
+            self.writer.write(frame)
+            count_sent(self.metrics, kind, frame, count)
+            if write_buffer_size(self.writer):
+                self.draining = asyncio.get_running_loop().create_task(self.drain())
+            return
+        self.queue.add(kind, key, frame, count)
+
+    async def drain(self):
+        try:
+            while True:
+                await self.writer.drain()
+                if not self.queue.entries:
+                    break
+                batch = self.queue.take()
+                self.writer.write(b''.join(entry[2] for entry in batch))
+                for kind, _, frame, count in batch:
+                    count_sent(self.metrics, kind, frame, count)
+        except (OSError, RuntimeError) as error:
+            self.stopped = True
+            self.queue.take()
+            self.failed(self.writer, error)
+            return
+        finally:
+            self.draining = None
+        if self.closing:
+            self.writer.close()
+
+    def close(self):
+        if self.draining is None:
+            self.stopped = True
+            self.writer.close()
+        else:
+            self.closing = True
+
+    def stop(self):
+        self.stopped = True
+        self.queue.take()
+        if self.draining is not None:
+            self.draining.cancel()
+        self.writer.close()
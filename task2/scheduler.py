@@ -0,0 +1,107 @@
+# Delayed work of a threaded myleprocess.py node (NodeState.schedule): retries, heartbeats, announcement timeouts,
+# HS restarts
+#
+# Every delay used to be a threading.Timer, i.e. one thread per pending timer - a node that kept retrying (a flapping
+# peer) kept starting threads. Now every node has one Scheduler: a heap of pending timers ordered by deadline and one
+# thread (started with the first timer) that sleeps until the earliest deadline and runs what is due.
+#   - call_later() is O(log n) and never starts a thread, so 100k pending timers still use one thread
+#   - cancel() only marks the timer (O(1)); cancelled timers are skipped when they come up, and the heap is rebuilt
+#     without them once they are the majority, so cancelled timers don't pile up
+#   - callbacks run one after the other on the scheduler thread and must not block: work that waits for the network
+#     (connecting around a dead peer) is started on its own thread by the caller (NodeState.spawn)
+# The asyncio engine doesn't use this, its loop.call_later has the same cancel() interface.
+
+import heapq
+import itertools
+import threading
+import time
+import traceback
+
+
+# a pending call, returned by call_later()
+class TimerHandle:
+    __slots__ = ('scheduler', 'deadline', 'function', 'args', 'cancelled')
+
+    def __init__(self, scheduler, deadline, function, args):
+        self.scheduler = scheduler
+        self.deadline = deadline      # time.monotonic() it is due
+        self.function = function
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        self.scheduler.cancel(self)
+
+
+class Scheduler:
+    def __init__(self, name='scheduler'):
+        self.name = name
+        self.heap = []                 # (deadline, sequence number, TimerHandle), the number keeps equal deadlines in order
+        self.counter = itertools.count()
+        self.cond = threading.Condition()
+        self.cancelled = 0             # cancelled timers still in the heap
+        self.thread = None
+        self.stopped = False
+
+    # runs function(*args) on the scheduler thread in delay seconds
+    def call_later(self, delay, function, *args):
+        handle = TimerHandle(self, time.monotonic() + max(0.0, delay), function, args)
+        with self.cond:
+            if self.stopped:
+                raise RuntimeError("scheduler is stopped")
+            heapq.heappush(self.heap, (handle.deadline, next(self.counter), handle))
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name=self.name, daemon=True)
+                self.thread.start()
+            elif self.heap[0][2] is handle:
+                self.cond.notify()  # the new timer is the next one, the thread sleeps too long
+        return handle
+
+    def cancel(self, handle):
+        with self.cond:
+            if handle.cancelled or handle.function is None:
+                return  # already cancelled or already run
+            handle.cancelled = True
+            handle.function = handle.args = None  # don't keep what it refers to alive
+            self.cancelled += 1
+            if self.cancelled > 64 and self.cancelled > len(self.heap) // 2:
+                self.heap = [entry for entry in self.heap if not entry[2].cancelled]
+                heapq.heapify(self.heap)
+                self.cancelled = 0
+
+    # timers that are still going to run
+    def pending(self):
+        with self.cond:
+            return len(self.heap) - self.cancelled
+
+    def run(self):
+        while True:
+            with self.cond:
+                while True:
+                    if self.stopped:
+                        return
+                    while self.heap and self.heap[0][2].cancelled:
+                        heapq.heappop(self.heap)
+                        self.cancelled -= 1
+                    if not self.heap:
+                        self.cond.wait()
+                        continue
+                    wait = self.heap[0][0] - time.monotonic()
+                    if wait <= 0:
+                        break
+                    self.cond.wait(wait)
+                handle = heapq.heappop(self.heap)[2]
+                function, args = handle.function, handle.args
+                handle.function = handle.args = None  # marks it as run (cancel() does nothing now)
+            try:
+                function(*args)
+            except Exception:
+                traceback.print_exc()  # one failing callback must not stop the others
+
+    # drops every pending timer and ends the thread
+    def stop(self):
+        with self.cond:
+            self.stopped = True
+            self.heap = []
+            self.cancelled = 0
+            self.cond.notify()
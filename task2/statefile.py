@@ -0,0 +1,134 @@
+# What a myleprocess.py node remembers across restarts (--state-dir): its uuid, the current epoch and the last
+# leader it knew, so a restarted node keeps its identity and can ask its peers for the leader (rejoin) instead of
+# waiting for a new election
+#
+# One append-only file per node (node_<N>.state), a fixed-size record per change:
+#   magic | version | flags (1: leader known) | epoch | node uuid | leader uuid (zeros if none) | crc32 of the rest
+# The last complete record with a valid checksum wins, so a record torn by a crash only loses that one change
+# (the file is cut back to the last good record before anything new is appended). Once the file holds
+# COMPACT_RECORDS records it is rewritten with only the newest one (temporary file + rename).
+#
+# --state-fsync decides when a record is on disk:
+#   always    fsync after every record (a crash loses nothing that was saved)
+#   interval  fsync at most once per FSYNC_INTERVAL seconds and on close (a crash loses the last second)
+#   never     leave it to the OS (a crash of the machine can lose anything not written back yet)
+
+import os
+import struct
+import time
+import uuid
+import zlib
+
+STATE_RECORD  = struct.Struct('!BBBQ16s16s')
+STATE_CRC     = struct.Struct('!I')
+RECORD_SIZE   = STATE_RECORD.size + STATE_CRC.size  # 47 bytes
+STATE_MAGIC   = 0xB3
+STATE_VERSION = 1
+LEADER_KNOWN  = 1
+COMPACT_RECORDS = 4096
+FSYNC_INTERVAL  = 1.0
+FSYNC_POLICIES  = ['always', 'interval', 'never']
+
+
+def encode_record(node_uuid, epoch, leader):
+    record = STATE_RECORD.pack(STATE_MAGIC, STATE_VERSION, LEADER_KNOWN if leader is not None else 0, epoch,
+                               node_uuid.bytes, leader.bytes if leader is not None else bytes(16))
+    return record + STATE_CRC.pack(zlib.crc32(record))
+
+# (node uuid, epoch, leader or None), None for a torn / foreign record
+def decode_record(data):
+    if len(data) < RECORD_SIZE:
+        return None
+    record = data[:STATE_RECORD.size]
+    if STATE_CRC.unpack_from(data, STATE_RECORD.size)[0] != zlib.crc32(record):
+        return None
+    magic, version, flags, epoch, node_bytes, leader_bytes = STATE_RECORD.unpack(record)
+    if magic != STATE_MAGIC or version != STATE_VERSION:
+        return None
+    return uuid.UUID(bytes=node_bytes), epoch, uuid.UUID(bytes=leader_bytes) if flags & LEADER_KNOWN else None
+
+
+class StateFile:
+    def __init__(self, path, fsync='always'):
+        self.path = path
+        self.fsync = fsync
+        self.file = None
+        self.records = 0       # records in the file
+        self.dirty = False     # written but not fsynced yet (interval)
+        self.last_sync = 0.0
+
+    # the newest saved state (node uuid, epoch, leader or None), None for a new / empty file
+    # opens the file for appending, after the last good record
+    def load(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        self.file = open(self.path, 'a+b')
+        self.file.seek(0)
+        data = self.file.read()
+        state, good = None, 0
+        while good + RECORD_SIZE <= len(data):
+            record = decode_record(data[good:good + RECORD_SIZE])
+            if record is None:
+                break
+            state, good = record, good + RECORD_SIZE
+        if good < len(data):
+            print(f"State file {self.path}: dropping {len(data) - good} bytes after the last good record")
+            self.file.truncate(good)
+            self.sync()
+        self.records = good // RECORD_SIZE
+        return state
+
+    def save(self, node_uuid, epoch, leader):
+        if self.records >= COMPACT_RECORDS:
+            self.compact(node_uuid, epoch, leader)
+            return
+        self.file.write(encode_record(node_uuid, epoch, leader))
+        self.file.flush()
+        self.records += 1
+        self.dirty = True
+        if self.fsync == 'always' or (self.fsync == 'interval' and time.monotonic() - self.last_sync >= FSYNC_INTERVAL):
+            self.sync()
+
+    # only the newest record: written next to the file, then renamed over it (a crash leaves the old or the new one)
+    def compact(self, node_uuid, epoch, leader):
+        temporary = self.path + '.tmp'
+        with open(temporary, 'wb') as out:
+            out.write(encode_record(node_uuid, epoch, leader))
+            out.flush()
+            if self.fsync != 'never':
+                os.fsync(out.fileno())
+        os.replace(temporary, self.path)
+        self.file.close()
+        self.file = open(self.path, 'a+b')
+        self.records = 1
+        self.dirty = False
+        if self.fsync != 'never':
+            sync_directory(self.path)
+
+    def sync(self):
+        if self.fsync != 'never':
+            os.fsync(self.file.fileno())
+            self.last_sync = time.monotonic()
+        self.dirty = False
+
+    def close(self):
+        if self.file is None:
+            return
+        if self.dirty:
+            self.sync()
+        self.file.close()
+        self.file = None
+
+
+# makes a rename in the directory durable
+def sync_directory(path):
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass  # not every file system can fsync a directory
+    finally:
+        os.close(fd)
@@ -0,0 +1,472 @@
+# Transports for the links between myleprocess.py nodes (--transport)
+#   auto   peers on the same host (loopback address or our own listen address) are reached over an AF_UNIX stream
+#          socket, the others over TCP (default)
+#   shm    like auto, but the bytes of a local link go through two shared-memory ring buffers (one per direction);
+#          the unix socket only carries the ring's file descriptor once and then a wake-up byte when the reader sleeps
+#   tcp    every link is a TCP connection, no socket files (how the nodes always worked)
+#
+# Every node (unless --transport tcp) listens on TCP and on <socket dir>/myle-<ip>-<port>.sock (with --transport shm
+# also on .shm), so peers with any --transport can reach it: shm is used when both ends want it, a peer without
+# socket files (other host, older node, --transport tcp) is reached over TCP. The links look like the ones they replace: ShmLink has the socket methods the threaded engine uses
+# (sendall / recv / recv_into / settimeout / close), ShmStream is a StreamWriter + StreamReader for the asyncio engine,
+# so the handshake, FrameReader and the election code don't know which transport a link uses.
+#
+# Ring buffer (single reader, single writer): head and tail count the bytes read / written so far, the data lives at
+# position % capacity. The writer only moves tail, the reader only moves head. Before sleeping the reader sets
+# waiting and looks at the ring once more; a writer that sees waiting sends the wake-up byte. Python has no memory
+# fences, so in theory a wake-up can still be missed - a sleeping reader looks at the ring every SHM_RECHECK anyway.
+
+import asyncio
+import ipaddress
+import mmap
+import os
+import socket
+import struct
+import tempfile
+import threading
+import time
+
+TRANSPORTS = ['auto', 'shm', 'tcp']
+SOCKET_DIR = os.path.join(tempfile.gettempdir(), 'myle')  # default --socket-dir
+
+SHM_CAPACITY = 256 * 1024  # bytes per direction
+SHM_HEADER   = 64          # head, tail, waiting (8 bytes each), rest unused
+SHM_SIZE     = 2 * (SHM_HEADER + SHM_CAPACITY)
+SHM_HELLO    = b'MYLS1'    # sent with the ring's file descriptor
+SHM_RECHECK  = 0.1         # seconds a reader sleeps at most without a wake-up byte
+SHM_FULL_WAIT = 0.0005     # writer waiting for room in a full ring
+HELLO_TIMEOUT = 2.0        # seconds an accepted shm connection has to send its ring
+
+
+# the peer runs on this host (own_ip: the address we listen on)
+def is_local(ip, own_ip=None):
+    if ip == own_ip or ip == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(ip).is_loopback
+    except ValueError:
+        return False  # a host name
+
+def socket_path(directory, ip, port, kind='sock'):
+    return os.path.join(directory, f'myle-{ip}-{port}.{kind}')
+
+
+# listening AF_UNIX socket at path (a stale socket file from a node that died is replaced)
+def listen_unix(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if os.path.exists(path):
+        os.remove(path)
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(path)
+    listener.listen(socket.SOMAXCONN)
+    return listener
+
+def remove_socket_files(paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+# one direction of a link, inside the shared memory
+class ShmRing:
+    def __init__(self, memory, offset, capacity=SHM_CAPACITY):
+        self.index = memoryview(memory)[offset:offset + 24].cast('Q')  # head, tail, waiting: aligned 8 byte words
+        self.data = memoryview(memory)[offset + SHM_HEADER:offset + SHM_HEADER + capacity]
+        self.capacity = capacity
+
+    @property
+    def waiting(self):
+        return self.index[2]
+
+    @waiting.setter
+    def waiting(self, value):
+        self.index[2] = value
+
+    # copies as much of data as fits, returns the number of bytes written
+    def write(self, data):
+        head, tail = self.index[0], self.index[1]
+        size = min(len(data), self.capacity - (tail - head))
+        if size <= 0:
+            return 0
+        start = tail % self.capacity
+        first = min(size, self.capacity - start)
+        self.data[start:start + first] = data[:first]
+        if size > first:
+            self.data[:size - first] = data[first:size]
+        self.index[1] = tail + size
+        return size
+
+    # up to size bytes (b'' if the ring is empty), consumed unless peek
+    def read(self, size, peek=False):
+        head, tail = self.index[0], self.index[1]
+        size = min(size, tail - head)
+        if size <= 0:
+            return b''
+        start = head % self.capacity
+        first = min(size, self.capacity - start)
+        data = bytes(self.data[start:start + first])
+        if size > first:
+            data += bytes(self.data[:size - first])
+        if not peek:
+            self.index[0] = head + size
+        return data
+
+    def read_into(self, view):
+        head, tail = self.index[0], self.index[1]
+        size = min(len(view), tail - head)
+        if size <= 0:
+            return 0
+        start = head % self.capacity
+        first = min(size, self.capacity - start)
+        view[:first] = self.data[start:start + first]
+        if size > first:
+            view[first:size] = self.data[:size - first]
+        self.index[0] = head + size
+        return size
+
+
+# a shared-memory link, usable where the threaded engine uses a socket
+# ring 0 goes from the connecting node to the listening one, ring 1 back
+class ShmLink:
+    def __init__(self, sock, memory, connecting):
+        self.sock = sock        # unix socket: wake-up bytes, EOF once the other side closed
+        self.memory = memory
+        rings = ShmRing(memory, 0), ShmRing(memory, SHM_HEADER + SHM_CAPACITY)
+        self.outbound, self.inbound = rings if connecting else rings[::-1]
+        self.timeout = None
+        self.closed = False
+        self.peer_closed = False
+        self.send_lock = threading.Lock()  # one writer per ring
+        if sock.gettimeout() is None:
+            # threaded engine: a sleeping reader's recv() gives up after SHM_RECHECK on its own (one syscall, no select)
+            seconds = int(SHM_RECHECK)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVTIMEO,
+                            struct.pack('@ll', seconds, int((SHM_RECHECK - seconds) * 1e6)))
+
+    # wakes the reader if it went to sleep on an empty ring
+    def wake(self):
+        index = self.outbound.index
+        if index[2]:
+            index[2] = 0
+            self.sock.send(b'\x01')
+
+    def sendall(self, data):
+        with self.send_lock:
+            if self.closed:
+                raise ConnectionResetError("shared-memory link is closed")
+            written = self.outbound.write(data)
+            self.wake()
+            if written == len(data):
+                return  # the usual case, the frame fitted
+            data = memoryview(data)[written:]
+            while True:
+                time.sleep(SHM_FULL_WAIT)  # ring full, the reader is behind
+                if self.closed:
+                    raise ConnectionResetError("shared-memory link is closed")
+                written = self.outbound.write(data)
+                data = data[written:]
+                self.wake()
+                if not data:
+                    return
+
+    # socket.send with MSG_DONTWAIT: as much of data as fits in the ring right now
+    def send(self, data, flags=0):
+        with self.send_lock:
+            if self.closed:
+                raise ConnectionResetError("shared-memory link is closed")
+            written = self.outbound.write(data)
+            if written:
+                self.wake()
+            return written
+
+    def recv(self, size, flags=0):
+        return self.wait_for_data(lambda: self.inbound.read(size, peek=bool(flags & socket.MSG_PEEK)))
+
+    def recv_into(self, view, nbytes=0, flags=0):
+        if nbytes:
+            view = memoryview(view)[:nbytes]
+        return self.inbound.read_into(view) or self.wait_for_data(lambda: self.inbound.read_into(view))
+
+    # read() as soon as it returns something, sleeping on the wake-up socket in between
+    def wait_for_data(self, read):
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        while True:
+            data = read()
+            if data or self.peer_closed or self.closed:
+                return data
+            self.inbound.waiting = 1
+            data = read()  # the writer may have missed the flag
+            if data:
+                self.inbound.waiting = 0
+                return data
+            if deadline is not None and time.monotonic() >= deadline:
+                self.inbound.waiting = 0
+                raise socket.timeout("timed out")
+            try:
+                woken = self.sock.recv(4096)
+            except BlockingIOError:
+                woken = None  # SHM_RECHECK passed without a wake-up byte
+            except OSError:
+                return read()  # closed on our side meanwhile
+            self.inbound.waiting = 0
+            if woken == b'':
+                self.peer_closed = True
+
+    def settimeout(self, value):
+        self.timeout = value
+
+    # like closing a socket: both directions stop, the other side reads EOF
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)  # wakes a reader sleeping in recv
+        except OSError:
+            pass
+        self.sock.close()
+
+
+# file descriptor of size bytes of memory that can be passed to another process
+def anonymous_memory(size):
+    if hasattr(os, 'memfd_create'):
+        fd = os.memfd_create('myle-link')
+    else:
+        fd, path = tempfile.mkstemp(prefix='myle-link-')
+        os.unlink(path)
+    os.ftruncate(fd, size)
+    return fd
+
+# connecting side: new rings, their descriptor goes to the listener with SHM_HELLO
+def offer_shm(sock):
+    fd = anonymous_memory(SHM_SIZE)
+    try:
+        memory = mmap.mmap(fd, SHM_SIZE)
+        socket.send_fds(sock, [SHM_HELLO], [fd])
+    finally:
+        os.close(fd)
+    return ShmLink(sock, memory, connecting=True)
+
+# listening side: maps the rings the connecting node sent (ValueError if it sent something else)
+def accept_shm(conn, timeout=None):
+    conn.settimeout(timeout)
+    try:
+        hello, fds, _, _ = socket.recv_fds(conn, len(SHM_HELLO), 1)
+    finally:
+        conn.settimeout(None)
+    if hello != SHM_HELLO or not fds:
+        for fd in fds:
+            os.close(fd)
+        raise ValueError("not a shared-memory link")
+    try:
+        if os.fstat(fds[0]).st_size != SHM_SIZE:
+            raise ValueError("shared-memory link of the wrong size")
+        memory = mmap.mmap(fds[0], SHM_SIZE)
+    finally:
+        os.close(fds[0])
+    return ShmLink(conn, memory, connecting=False)
+
+
+# threaded engine: connection to a peer over the best transport it offers, returns (link, transport name)
+# raises OSError like socket.create_connection when nothing accepts
+def connect_link(ip, port, transport='auto', directory=SOCKET_DIR, own_ip=None, timeout=None):
+    local = transport != 'tcp' and is_local(ip, own_ip)
+    link = local and connect_local(ip, port, transport, directory, timeout)
+    if link:
+        return link
+    sock = socket.create_connection((ip, port), timeout=timeout)
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)  # like asyncio: small frames go out at once
+    if local:
+        # a node makes its socket files before it listens on TCP: if they are there now, we raced its startup
+        link = connect_local(ip, port, transport, directory, timeout)
+        if link:
+            sock.close()
+            return link
+    return sock, 'tcp'
+
+# (link, transport name) over the peer's socket files, None if it has none (or only stale ones)
+def connect_local(ip, port, transport, directory, timeout):
+    for kind in ['shm', 'sock'] if transport == 'shm' else ['sock']:
+        path = socket_path(directory, ip, port, kind)
+        if not os.path.exists(path):
+            continue
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.settimeout(timeout)
+            sock.connect(path)
+            sock.settimeout(None)
+            if kind == 'shm':
+                return offer_shm(sock), 'shm'
+            return sock, 'unix'
+        except OSError:
+            sock.close()
+    return None
+
+
+# asyncio engine: a ShmLink as a (StreamReader, writer) pair
+# the wake-up socket is a reader on the loop; everything in the ring is fed to the StreamReader
+class ShmStream:
+    def __init__(self, loop, link):
+        self.loop = loop
+        self.link = link
+        self.reader = asyncio.StreamReader()
+        self.pending = bytearray()  # written while the outbound ring was full
+        self.flushing = None
+        link.sock.setblocking(False)
+        loop.add_reader(link.sock, self.wake)
+        self.recheck = loop.call_later(SHM_RECHECK, self.tick)
+        self.pump()
+
+    def wake(self):
+        try:
+            data = self.link.sock.recv(4096)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b''
+        self.pump()
+        if not data:
+            self.stop()
+            self.reader.feed_eof()
+
+    def tick(self):
+        self.pump()
+        self.recheck = self.loop.call_later(SHM_RECHECK, self.tick)
+
+    # moves everything in the inbound ring to the StreamReader, then marks the ring as waiting
+    def pump(self):
+        ring = self.link.inbound
+        ring.waiting = 0
+        data = ring.read(ring.capacity)
+        while data:
+            self.reader.feed_data(data)
+            data = ring.read(ring.capacity)
+        ring.waiting = 1
+        data = ring.read(ring.capacity)  # the writer may have missed the flag
+        if data:
+            self.reader.feed_data(data)
+
+    def write(self, data):
+        if self.link.closed:
+            raise ConnectionResetError("shared-memory link is closed")
+        if self.pending:
+            self.pending += data
+            return
+        written = self.link.outbound.write(data)
+        self.notify()
+        if written < len(data):
+            self.pending += data[written:]
+            self.flushing = self.loop.call_later(SHM_FULL_WAIT, self.flush)
+
+    def flush(self):
+        self.flushing = None
+        if self.link.closed:
+            return
+        written = self.link.outbound.write(self.pending)
+        del self.pending[:written]
+        self.notify()
+        if self.pending:
+            self.flushing = self.loop.call_later(SHM_FULL_WAIT, self.flush)
+
+    # StreamWriter.drain(): returns once everything written is in the ring
+    async def drain(self):
+        while self.pending:
+            if self.link.closed:
+                raise ConnectionResetError("shared-memory link is closed")
+            await asyncio.sleep(SHM_FULL_WAIT)
+
+    def get_write_buffer_size(self):
+        return len(self.pending)
+
+    def notify(self):
+        try:
+            self.link.wake()
+        except BlockingIOError:
+            pass  # the reader has wake-up bytes it didn't read yet
+        except OSError as error:
+            raise ConnectionResetError(f"shared-memory link: {error}") from error
+
+    def stop(self):
+        if self.recheck is not None:
+            self.recheck.cancel()
+            self.recheck = None
+            self.loop.remove_reader(self.link.sock)
+
+    def close(self):
+        self.stop()
+        if self.flushing is not None:
+            self.flushing.cancel()
+        self.link.close()
+
+    def is_closing(self):
+        return self.link.closed
+
+
+# asyncio engine: the same as connect_link, returns (reader, writer, transport name)
+async def open_link(ip, port, transport='auto', directory=SOCKET_DIR, own_ip=None):
+    local = transport != 'tcp' and is_local(ip, own_ip)
+    link = local and await open_local(ip, port, transport, directory)
+    if link:
+        return link
+    reader, writer = await asyncio.open_connection(ip, port)
+    if local:
+        link = await open_local(ip, port, transport, directory)
+        if link:
+            writer.close()
+            return link
+    return reader, writer, 'tcp'
+
+async def open_local(ip, port, transport, directory):
+    loop = asyncio.get_running_loop()
+    for kind in ['shm', 'sock'] if transport == 'shm' else ['sock']:
+        path = socket_path(directory, ip, port, kind)
+        if not os.path.exists(path):
+            continue
+        try:
+            if kind == 'sock':
+                reader, writer = await asyncio.open_unix_connection(path)
+                return reader, writer, 'unix'
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.setblocking(False)
+            try:
+                await loop.sock_connect(sock, path)
+                stream = ShmStream(loop, offer_shm(sock))
+            except OSError:
+                sock.close()
+                raise
+            return stream.reader, stream, 'shm'
+        except OSError:
+            continue
+    return None
+
+
+# asyncio engine: serves shm links on listener (listen_unix), callback(reader, writer) like asyncio.start_unix_server
+# returns the accept task (cancel it to stop)
+async def start_shm_server(callback, listener):
+    loop = asyncio.get_running_loop()
+    listener.setblocking(False)
+
+    async def accept_one(conn):
+        readable = loop.create_future()
+        loop.add_reader(conn, lambda: readable.done() or readable.set_result(None))
+        try:
+            await asyncio.wait_for(readable, HELLO_TIMEOUT)
+            link = accept_shm(conn)
+        except (OSError, ValueError, asyncio.TimeoutError):
+            link = None
+        finally:
+            loop.remove_reader(conn)
+        if link is None:
+            conn.close()
+            return
+        stream = ShmStream(loop, link)
+        await callback(stream.reader, stream)
+
+    async def accept_loop():
+        while True:
+            conn, _ = await loop.sock_accept(listener)
+            loop.create_task(accept_one(conn))
+
+    return loop.create_task(accept_loop())
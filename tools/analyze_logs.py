@@ -0,0 +1,291 @@
+# Offline analyzer for the node logs of a run: merges them into one timeline and counts the messages
+#
+# Reads
+#   text logs         node_<N>_log*.txt (task2) and log<N>.txt (task1), the "INFO:root:[Sent: uuid=..., flag=0" lines
+#   structured logs   node_<N>_trace.jsonl (task2 --trace), json events with wall time and Lamport clock
+# (directories are searched recursively; when a node has both, its trace file is used)
+# every path argument is one run: its own nodes, epochs and leaders
+#
+# Reports
+#   - messages per node and per phase: candidate (flag 0) and announcement (flag 1), received / sent / ignored
+#   - messages per kind (cr, probe, reply, elected, floodmax)
+#   - redundant forwards: candidate sends of a uuid that did not win its epoch (a perfect run only moves the winner)
+#   - optionally the merged timeline (--timeline FILE)
+#
+# Memory stays bounded for multi-gigabyte logs, nothing is kept per line:
+#   - counting only: text logs are read in BLOCK sized pieces, one regex findall per block and a Counter of the
+#     distinct lines (both run in C), trace logs line by line
+#   - --timeline: every file is streamed line by line and merged with heapq.merge
+# counts are added up in chunks of CHUNK records (numpy bincount when numpy is installed, a Counter otherwise).
+# Text logs have no timestamps: they are merged by line position, trace files by wall time.
+#
+# usage: python3 tools/analyze_logs.py task2/ task1/
+#        python3 tools/analyze_logs.py run1/ --timeline run1_timeline.txt --json run1_report.json
+
+import argparse
+import heapq
+import json
+import os
+import re
+import sys
+from collections import Counter
+
+try:
+    import numpy
+except ImportError:  # optional, the Counter fallback gives the same numbers
+    numpy = None
+
+CHUNK = 65536
+BLOCK = 4 * 1024 * 1024  # bytes of a text log counted at once
+
+EVENTS = ["recv", "sent", "ignored", "leader"]
+EVENT_CODES = {name: code for code, name in enumerate(EVENTS)}
+PHASES = ["candidate", "announcement", "-"]  # flag 0, flag 1, no flag (ignored lines of the text format)
+TRACE_EVENTS = {"recv": "recv", "send": "sent", "drop": "ignored", "leader": "leader"}
+
+TEXT_LINE = re.compile(r"(?:INFO:root:)?\[?(Received|Sent|Ignored): uuid=([0-9a-f-]+)(?:, flag=(\d+))?(.*)")
+LEADER_LINE = re.compile(r"(?:INFO:root:)?\[?Leader is decided to ([0-9a-f-]+)")
+TEXT_EVENTS = {"Received": "recv", "Sent": "sent", "Ignored": "ignored"}
+BLOCK_LINES = re.compile(r"^(?:INFO:root:)?\[?(?:(Received|Sent|Ignored): uuid=([0-9a-f-]+)(?:, flag=(\d+))?([^\n]*)"
+                         r"|Leader is decided to ([0-9a-f-]+))", re.MULTILINE)
+EPOCH = re.compile(r"epoch=(\d+)")
+KINDS = ("probe", "reply", "elected", "floodmax", "heartbeat")
+FILE_NAMES = [(re.compile(r"node_(\d+)_trace\.jsonl$"), "trace"),
+              (re.compile(r"node_(\d+)_log\w*\.txt$"), "text"),
+              (re.compile(r"log(\d+)\.txt$"), "text")]
+
+
+# {node name: (path, format, run)} for every log found under paths
+# node names get the run as prefix when there is more than one run
+def find_logs(paths):
+    found = {}
+    for run, path in enumerate(paths):
+        if os.path.isdir(path):
+            candidates = [os.path.join(root, name) for root, _, names in os.walk(path) for name in sorted(names)]
+        else:
+            candidates = [path]
+        for candidate in sorted(candidates):
+            for pattern, log_format in FILE_NAMES:
+                match = pattern.search(os.path.basename(candidate))
+                if match:
+                    # task1 and task2 logs in the same run directory get different names
+                    name = f"node{match.group(1)}" if pattern.pattern.startswith("log") else f"node_{match.group(1)}"
+                    if len(paths) > 1:
+                        name = f"{path.rstrip('/')}:{name}"
+                    if name not in found or (log_format == "trace" and found[name][1] == "text"):
+                        found[name] = (candidate, log_format, run)
+                    break
+    return found
+
+
+# record: (sort key, node, event, uuid, flag, kind, (run, epoch))
+def text_record(key, node, run, event, candidate, flag, details):
+    epoch = EPOCH.search(details)
+    kind = next((name for name in KINDS if name in details), "cr")
+    return (key, node, TEXT_EVENTS[event], candidate, None if flag in (None, "") else int(flag), kind,
+            (run, int(epoch.group(1)) if epoch else 0))
+
+def read_text_log(path, node, run):
+    with open(path, errors="replace") as log_file:
+        for position, line in enumerate(log_file):
+            match = TEXT_LINE.match(line)
+            if match:
+                yield text_record(position, node, run, *match.groups())
+                continue
+            match = LEADER_LINE.match(line)
+            if match:
+                yield (position, node, "leader", match.group(1), 1, "cr", (run, 0))
+
+# (record, number of lines) for every distinct line of a text log, counted a block at a time
+def count_text_log(path, node, run):
+    with open(path, errors="replace") as log_file:
+        rest = ""
+        while True:
+            data = log_file.read(BLOCK)
+            if not data and not rest:
+                return
+            block = rest + data
+            cut = block.rfind("\n") + 1 if data else len(block)  # the last line may continue in the next block
+            block, rest = block[:cut], block[cut:]
+            for (event, candidate, flag, details, leader), lines in Counter(BLOCK_LINES.findall(block)).items():
+                if leader:
+                    yield (None, node, "leader", leader, 1, "cr", (run, 0)), lines
+                else:
+                    yield text_record(None, node, run, event, candidate, flag, details), lines
+
+
+def read_trace_log(path, node, run):
+    with open(path, errors="replace") as trace_file:
+        for line in trace_file:
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue  # cut off when the node was killed
+            name = TRACE_EVENTS.get(event.get("event"))
+            if name is None:
+                continue  # trigger
+            candidate = event.get("leader") if name == "leader" else event.get("uuid")
+            yield ((event["time"], event["clock"]), node, name, candidate, 1 if name == "leader" else event.get("flag"),
+                   event.get("kind", "cr"), (run, event.get("epoch", 0)))
+
+
+# counts per (node, event, phase), per (kind, event) and candidate sends per (epoch, uuid)
+class Aggregator:
+    def __init__(self, use_numpy=True):
+        self.use_numpy = use_numpy and numpy is not None
+        self.nodes, self.kinds, self.candidates = {}, {}, {}  # name -> index
+        self.by_node = Counter()        # (node index, event code, phase code) -> messages
+        self.by_kind = Counter()        # (kind index, event code) -> messages
+        self.candidate_sends = Counter()  # candidate index -> sends with flag 0
+        self.leaders = {}               # (run, epoch) -> leader uuid
+        self.records = 0
+        self.pending = []
+
+    def index(self, table, key):
+        value = table.get(key)
+        if value is None:
+            value = table[key] = len(table)
+        return value
+
+    # lines: how many times the record occurs
+    def add(self, record, lines=1):
+        _, node, event, candidate, flag, kind, epoch = record
+        if event == "leader" or (event == "recv" and flag == 1):
+            self.leaders.setdefault(epoch, candidate)
+        self.pending.append((self.index(self.nodes, node), EVENT_CODES[event],
+                             2 if flag is None else min(flag, 1), self.index(self.kinds, kind),
+                             self.index(self.candidates, (epoch, candidate)) if event == "sent" and flag == 0 else -1,
+                             lines))
+        if len(self.pending) >= CHUNK:
+            self.flush()
+
+    # counts one chunk of records
+    def flush(self):
+        if not self.pending:
+            return
+        if self.use_numpy:
+            self.flush_numpy()
+        else:
+            for node, event, phase, kind, candidate, lines in self.pending:
+                self.records += lines
+                self.by_node[(node, event, phase)] += lines
+                self.by_kind[(kind, event)] += lines
+                if candidate >= 0:
+                    self.candidate_sends[candidate] += lines
+        self.pending = []
+
+    def flush_numpy(self):
+        columns = numpy.array(self.pending, dtype=numpy.int64)
+        node, event, phase, kind, candidate, lines = columns.T
+        self.records += int(lines.sum())
+        for counter, keys, shape in [(self.by_node, (node * len(EVENTS) + event) * len(PHASES) + phase,
+                                      (len(self.nodes), len(EVENTS), len(PHASES))),
+                                     (self.by_kind, kind * len(EVENTS) + event, (len(self.kinds), len(EVENTS)))]:
+            counts = numpy.bincount(keys, weights=lines, minlength=int(numpy.prod(shape))).reshape(shape)
+            for key in zip(*numpy.nonzero(counts)):
+                counter[tuple(int(k) for k in key)] += int(counts[key])
+        sent = candidate >= 0
+        sends = numpy.bincount(candidate[sent], weights=lines[sent], minlength=len(self.candidates))
+        for index in numpy.nonzero(sends)[0]:
+            self.candidate_sends[int(index)] += int(sends[index])
+
+    def report(self):
+        self.flush()
+        node_names = sorted(self.nodes, key=lambda name: (len(name), name))
+        per_node = {}
+        for name in node_names:
+            index = self.nodes[name]
+            per_node[name] = {f"{event}_{phase}": self.by_node[(index, e, p)]
+                              for e, event in enumerate(EVENTS) for p, phase in enumerate(PHASES)
+                              if self.by_node[(index, e, p)]}
+        per_kind = {kind: {event: self.by_kind[(index, e)] for e, event in enumerate(EVENTS) if self.by_kind[(index, e)]}
+                    for kind, index in self.kinds.items()}
+        winner_sends, redundant = 0, 0
+        for (epoch, candidate), index in self.candidates.items():
+            if self.leaders.get(epoch) == candidate:
+                winner_sends += self.candidate_sends[index]
+            else:
+                redundant += self.candidate_sends[index]
+        return {
+            "records": self.records,
+            "leaders": [{"run": run, "epoch": epoch, "leader": leader} for (run, epoch), leader in sorted(self.leaders.items())],
+            "per_node": per_node,
+            "per_kind": per_kind,
+            "candidate_sends": winner_sends + redundant,
+            "winner_sends": winner_sends,
+            "redundant_forwards": redundant,
+            "aggregation": "numpy" if self.use_numpy else "counter",
+        }
+
+
+def print_report(report, logs):
+    print(f"{report['records']} records from {len(logs)} logs ({report['aggregation']})")
+    for leader in report["leaders"]:
+        print(f"run {leader['run']} epoch {leader['epoch']}: leader {leader['leader']}")
+    columns = [("recv", "candidate"), ("sent", "candidate"), ("recv", "announcement"), ("sent", "announcement")]
+    width = max([10] + [len(node) for node in report["per_node"]])
+    print(f"{'node':{width}s} {'cand recv':>9s} {'cand sent':>9s} {'ann recv':>9s} {'ann sent':>9s} {'ignored':>8s} {'leader':>6s}")
+    totals = Counter()
+    for node, counts in report["per_node"].items():
+        row = [counts.get(f"{event}_{phase}", 0) for event, phase in columns]
+        ignored = sum(value for key, value in counts.items() if key.startswith("ignored"))
+        leader = sum(value for key, value in counts.items() if key.startswith("leader"))
+        totals.update(dict(zip(range(6), row + [ignored, leader])))
+        print(f"{node:{width}s} " + " ".join(f"{value:9d}" for value in row) + f" {ignored:8d} {leader:6d}")
+    print(f"{'total':{width}s} " + " ".join(f"{totals[i]:9d}" for i in range(4)) + f" {totals[4]:8d} {totals[5]:6d}")
+    print("per kind: " + ", ".join(f"{kind} sent {counts.get('sent', 0)}" for kind, counts in report["per_kind"].items()))
+    print(f"candidate sends {report['candidate_sends']}: winner {report['winner_sends']}, "
+          f"redundant forwards (losing candidates) {report['redundant_forwards']}")
+
+
+# merges all logs into one timeline (and counts every record on the way)
+def write_timeline(logs, aggregator, filename):
+    streams = [read_trace_log(path, node, run) if log_format == "trace" else read_text_log(path, node, run)
+               for node, (path, log_format, run) in sorted(logs.items())]
+    # text logs sort by line position, trace logs by time (mixed runs are only ordered within each kind)
+    merged = heapq.merge(*streams, key=lambda record: record[0] if isinstance(record[0], tuple) else (record[0], 0))
+    timeline = sys.stdout if filename == "-" else open(filename, "w")
+    try:
+        for record in merged:
+            aggregator.add(record)
+            key, node, event, candidate, flag, kind, epoch = record
+            when = f"{key[0]:.6f}" if isinstance(key, tuple) else f"#{key}"
+            timeline.write(f"{when} {node} {event} uuid={candidate} flag={flag} {kind} epoch={epoch[1]}\n")
+    finally:
+        if timeline is not sys.stdout:
+            timeline.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="merge node logs into one timeline and count messages")
+    parser.add_argument("paths", nargs="+", help="log files or run directories")
+    parser.add_argument("--timeline", help="write the merged timeline to this file ('-' for stdout)")
+    parser.add_argument("--json", help="write the report to this file")
+    parser.add_argument("--no-numpy", action="store_true", help="count with the pure Python fallback")
+    args = parser.parse_args()
+
+    logs = find_logs(args.paths)
+    if not logs:
+        parser.error("no node logs found")
+    aggregator = Aggregator(use_numpy=not args.no_numpy)
+    if args.timeline:
+        write_timeline(logs, aggregator, args.timeline)
+    else:
+        # the order doesn't matter for the counts
+        for node, (path, log_format, run) in sorted(logs.items()):
+            if log_format == "trace":
+                for record in read_trace_log(path, node, run):
+                    aggregator.add(record)
+            else:
+                for record, lines in count_text_log(path, node, run):
+                    aggregator.add(record, lines)
+
+    report = aggregator.report()
+    print_report(report, logs)
+    if args.json:
+        with open(args.json, "w") as out:
+            json.dump(report, out, indent=2)
+
+
+if __name__ == "__main__":
+    main()
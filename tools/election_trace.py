@@ -0,0 +1,175 @@
+# Rebuilds the causal graph of an election from the trace files of task2 nodes started with --trace
+# (node_<N>_trace.jsonl) and finds the critical path that decided when the leader was known.
+#
+# Events (one json object per line): trigger, recv, send, drop, leader - each with the node's uuid and Lamport clock.
+# Edges of the graph:
+#   send -> recv   the receive names the sender (peer) and the sender's clock (sent_clock)
+#   cause -> event a send / drop / leader event names the receive or trigger event its node was handling
+# The critical path of a leader event is the chain of these edges back to a trigger; its length in time is the
+# latency of that node learning the leader, and every step shows where the time went (on the wire or in a node).
+# Times are wall clock times of the nodes, so paths across machines include their clock offsets.
+#
+# usage: python3 tools/election_trace.py task2/            (all node_*_trace.jsonl in the directory)
+#        python3 tools/election_trace.py node_1_trace.jsonl node_2_trace.jsonl --all --dot election.dot
+
+import argparse
+import glob
+import json
+import os
+from collections import Counter, defaultdict
+
+
+# reads trace events from files / directories, returns (events, {node uuid: name})
+def load_events(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += sorted(glob.glob(os.path.join(path, "node_*_trace.jsonl")))
+        else:
+            files.append(path)
+    events, names = [], {}
+    for filename in files:
+        name = os.path.basename(filename).replace("_trace.jsonl", "")
+        with open(filename) as trace_file:
+            for line in trace_file:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    continue  # a line cut off when the node was killed
+                names.setdefault(event["node"], name)
+                events.append(event)
+    return events, names
+
+
+# links every event to its predecessor: recv -> matching send, send / drop / leader -> cause
+# returns {(node, clock): event}, {(node, clock): predecessor key} and the number of receives without a send
+def build_graph(events):
+    by_key = {(event["node"], event["clock"]): event for event in events}
+    sends = {}
+    unnamed_sends = defaultdict(list)  # sends to a peer whose uuid we don't know, by clock
+    for event in events:
+        if event["event"] == "send":
+            if "peer" in event:
+                sends[(event["node"], event["peer"], event["clock"])] = event
+            unnamed_sends[event["clock"]].append(event)
+
+    parent, unmatched = {}, 0
+    for key, event in by_key.items():
+        if event["event"] == "recv":
+            send = None
+            if event.get("peer") is not None:
+                send = sends.get((event["peer"], event["node"], event.get("sent_clock")))
+                if send is None:
+                    send = by_key.get((event["peer"], event.get("sent_clock")))
+            if send is None:
+                # sender unknown (no handshake): same clock, message and trace
+                candidates = [s for s in unnamed_sends.get(event.get("sent_clock"), [])
+                              if (s.get("uuid"), s.get("flag"), s.get("kind"), s.get("trace")) ==
+                                 (event.get("uuid"), event.get("flag"), event.get("kind"), event.get("trace"))]
+                send = candidates[0] if len(candidates) == 1 else None
+            if send is None:
+                unmatched += 1
+            else:
+                parent[key] = (send["node"], send["clock"])
+        elif "cause" in event:
+            parent[key] = (event["node"], event["cause"])
+    return by_key, parent, unmatched
+
+
+# chain of events from the start of the election (trigger) to key
+def critical_path(by_key, parent, key):
+    path = [by_key[key]]
+    seen = {key}
+    while key in parent and parent[key] in by_key and parent[key] not in seen:
+        key = parent[key]
+        seen.add(key)
+        path.append(by_key[key])
+    path.reverse()
+    return path
+
+
+def describe(event, names):
+    text = f"{names.get(event['node'], event['node'][:8]):>8s} {event['event']:7s}"
+    if "uuid" in event:
+        text += f" uuid={event['uuid'][:8]} flag={event['flag']} {event['kind']} hop={event.get('hop')}"
+    if "leader" in event:
+        text += f" leader={event['leader'][:8]}"
+    if "peer" in event:
+        text += f" {'to' if event['event'] == 'send' else 'from'} {names.get(event['peer'], event['peer'][:8])}"
+    return text
+
+
+def print_path(path, names):
+    start = path[0]["time"]
+    hops = sum(1 for event in path if event["event"] == "recv")
+    print(f"  critical path: {hops} hops, {(path[-1]['time'] - start) * 1000:.2f} ms")
+    previous = start
+    for event in path:
+        step = (event["time"] - previous) * 1000
+        where = "wire" if event["event"] == "recv" else "node"
+        print(f"    +{(event['time'] - start) * 1000:8.2f} ms ({where} {step:6.2f})  {describe(event, names)}")
+        previous = event["time"]
+
+
+# Graphviz file of the causal graph, critical path edges in red
+def write_dot(filename, by_key, parent, names, critical):
+    def node_id(key):
+        return f'"{names.get(key[0], key[0][:8])}:{key[1]}"'
+    with open(filename, "w") as dot:
+        dot.write("digraph election {\n  rankdir=LR;\n")
+        for key, event in by_key.items():
+            dot.write(f'  {node_id(key)} [label="{describe(event, names).strip()}\\nclock {key[1]}"];\n')
+        for key, before in parent.items():
+            if before in by_key:
+                colour = ' [color=red, penwidth=2]' if (before, key) in critical else ''
+                dot.write(f"  {node_id(before)} -> {node_id(key)}{colour};\n")
+        dot.write("}\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="causal graph and critical path of a traced election")
+    parser.add_argument("paths", nargs="+", help="trace files, or directories with node_*_trace.jsonl")
+    parser.add_argument("--all", action="store_true", help="critical path of every leader event, not just the last one")
+    parser.add_argument("--dot", help="write the causal graph as a Graphviz file")
+    parser.add_argument("--json", help="write the critical paths to this file")
+    args = parser.parse_args()
+
+    events, names = load_events(args.paths)
+    if not events:
+        parser.error("no trace events found")
+    by_key, parent, unmatched = build_graph(events)
+
+    kinds = Counter(event["event"] for event in events)
+    traces = Counter(event["trace"] for event in events if event["event"] == "send")
+    print(f"{len(events)} events from {len(names)} nodes: "
+          + ", ".join(f"{kind} {count}" for kind, count in sorted(kinds.items())))
+    print(f"message edges {kinds['recv'] - unmatched}, receives without a matching send {unmatched}")
+    print("traces (messages sent): " + ", ".join(f"{trace} {count}" for trace, count in traces.most_common()))
+
+    critical, results = set(), []
+    by_epoch = defaultdict(list)
+    for event in events:
+        if event["event"] == "leader":
+            by_epoch[event.get("epoch", 0)].append(event)
+    for epoch, leaders in sorted(by_epoch.items()):
+        leaders.sort(key=lambda event: event["time"])
+        print(f"epoch {epoch}: leader {leaders[-1]['leader']}, known on {len(leaders)} nodes")
+        for leader in (leaders if args.all else leaders[-1:]):
+            path = critical_path(by_key, parent, (leader["node"], leader["clock"]))
+            print(f" {names.get(leader['node'], leader['node'])} knows the leader:")
+            print_path(path, names)
+            critical.update(((a["node"], a["clock"]), (b["node"], b["clock"])) for a, b in zip(path, path[1:]))
+            results.append({"epoch": epoch, "node": leader["node"], "path": path})
+
+    if args.dot:
+        write_dot(args.dot, by_key, parent, names, critical)
+    if args.json:
+        with open(args.json, "w") as out:
+            json.dump(results, out, indent=2)
+
+
+if __name__ == "__main__":
+    main()